@@ -1,6 +1,7 @@
 from flask import Flask, redirect, url_for
 from .config import Config
 from .extensions import db, login_manager
+from .commands import register_commands
 from .routes.auth import auth_bp
 from .routes.home import home_bp
 from .routes.employees import funcionarios_bp
@@ -11,20 +12,35 @@ from .routes.salarios import salarios_bp
 from .routes.kpi import kpi_bp
 from .routes.milestones import milestones_bp
 from .routes.jornadas import jornadas_bp
+from .routes.exportacoes import exportacoes_bp
+from .routes.admin import admin_bp
+from .routes.metricas import metricas_bp
+from .utils.conexoes import binds_com_opcoes, instrumentar_engine, opcoes_engine
+from .utils.metricas import iniciar_metricas
+from .utils.perfilamento import iniciar_perfilamento
+from .utils.replica import iniciar_replica
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    opcoes = app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', opcoes_engine(app.config))
+    app.config['SQLALCHEMY_BINDS'] = binds_com_opcoes(app.config.get('SQLALCHEMY_BINDS', {}), opcoes)
 
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            instrumentar_engine(engine)
+        iniciar_perfilamento(app, db.engines.values())
+        iniciar_metricas(app, db.engines)
+    iniciar_replica(app)
     login_manager.init_app(app)
 
-    from .models import User
+    from .utils.usuarios import carregar_usuario
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return carregar_usuario(int(user_id))
 
     # Registrar blueprints
     app.register_blueprint(auth_bp)
@@ -37,9 +53,14 @@ def create_app():
     app.register_blueprint(kpi_bp)
     app.register_blueprint(milestones_bp)
     app.register_blueprint(jornadas_bp)
+    app.register_blueprint(exportacoes_bp)
+    app.register_blueprint(admin_bp)
+    app.register_blueprint(metricas_bp)
 
     login_manager.login_view = "auth.login"
 
+    register_commands(app)
+
     # Adicione esta rota:
     @app.route("/")
     def index():
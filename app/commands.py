@@ -0,0 +1,169 @@
+# app/commands.py
+"""
+Comandos de manutenção do banco registrados no 'flask' CLI.
+
+    flask schema upgrade   -> cria tabelas novas dos models e aplica migrations/*.sql pendentes
+    flask schema status    -> lista as migrações aplicadas e pendentes
+    flask perf semear      -> popula um banco vazio com massa sintética (ex.: 2000 funcionários)
+    flask perf verificar-rotas -> confere o número de queries de cada tela de listagem
+    flask perf explicar    -> roda EXPLAIN nas queries das rotas e aponta Seq Scans
+"""
+import os
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import User
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+schema_cli = AppGroup('schema', help='Migrações SQL versionadas da pasta migrations/.')
+perf_cli = AppGroup('perf', help='Massa de dados e orçamento de queries das telas.')
+
+
+def _arquivos_migracao():
+    return sorted(f for f in os.listdir(MIGRATIONS_DIR) if f.endswith('.sql'))
+
+
+def _garantir_tabela_controle():
+    db.session.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        " nome VARCHAR(200) PRIMARY KEY,"
+        " aplicada_em TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+    ))
+    db.session.commit()
+
+
+def _migracoes_aplicadas():
+    return {row[0] for row in db.session.execute(text("SELECT nome FROM schema_migrations"))}
+
+
+def _executar_script(sql):
+    """Executa um arquivo .sql inteiro (com vários comandos) numa transação."""
+    if db.engine.dialect.name == 'sqlite':
+        raw = db.engine.raw_connection()
+        try:
+            raw.executescript(sql)
+            raw.commit()
+        finally:
+            raw.close()
+        return
+
+    # Cursor do driver sem parâmetros: '%' no SQL (LIKE, RAISE NOTICE) não é placeholder.
+    with db.engine.begin() as conn:
+        conn.connection.cursor().execute(sql)
+
+
+@schema_cli.command('upgrade')
+def upgrade():
+    """Cria as tabelas que faltam e aplica as migrações pendentes em ordem."""
+    # Só o primário: a réplica recebe o schema pela replicação.
+    db.create_all(bind_key=None)
+    _garantir_tabela_controle()
+    aplicadas = _migracoes_aplicadas()
+
+    pendentes = [f for f in _arquivos_migracao() if f not in aplicadas]
+    if not pendentes:
+        click.echo('Nenhuma migração pendente.')
+        return
+
+    for nome in pendentes:
+        with open(os.path.join(MIGRATIONS_DIR, nome), encoding='utf-8') as arquivo:
+            _executar_script(arquivo.read())
+        db.session.execute(text("INSERT INTO schema_migrations (nome) VALUES (:nome)"), {'nome': nome})
+        db.session.commit()
+        click.echo(f'Aplicada: {nome}')
+
+
+@schema_cli.command('status')
+def status():
+    """Mostra quais migrações já foram aplicadas."""
+    _garantir_tabela_controle()
+    aplicadas = _migracoes_aplicadas()
+    for nome in _arquivos_migracao():
+        click.echo(f"[{'x' if nome in aplicadas else ' '}] {nome}")
+
+
+@perf_cli.command('semear')
+@click.option('--funcionarios', default=2000, show_default=True, help='Quantidade de funcionários gerados.')
+@click.option('--times', default=20, show_default=True, help='Quantidade de times gerados.')
+def semear(funcionarios, times):
+    """Popula um banco vazio com dados sintéticos para medir as telas com volume."""
+    from app.utils.dados_sinteticos import semear as semear_dados
+
+    if db.session.query(User.id).first() is not None:
+        raise click.ClickException('O banco já tem usuários; use uma base vazia para a massa sintética.')
+    total = semear_dados(funcionarios=funcionarios, times=times)
+    click.echo(f'{total} funcionários sintéticos criados.')
+
+
+@perf_cli.command('verificar-rotas')
+@click.option('--usuario', type=int, help='Id do usuário logado nas requisições (padrão: o primeiro).')
+def verificar_rotas(usuario):
+    """Confere o número de queries de cada tela de listagem contra o orçamento."""
+    from flask import current_app
+    from app.utils.orcamento_rotas import medir_rotas
+
+    usuario = usuario or db.session.query(User.id).order_by(User.id).limit(1).scalar()
+    if usuario is None:
+        raise click.ClickException('Nenhum usuário no banco; rode \'flask perf semear\' antes.')
+
+    falhas = []
+    for endpoint, url, status_code, total, limite in medir_rotas(current_app._get_current_object(), usuario):
+        if url is None:
+            click.echo(f'[--] {endpoint}: sem dados para montar a URL')
+            continue
+        ok = status_code == 200 and total <= limite
+        click.echo(f"[{'ok' if ok else 'ERRO'}] {url} ({status_code}): {total} queries (limite {limite})")
+        if not ok:
+            falhas.append(endpoint)
+
+    if falhas:
+        raise SystemExit(1)
+
+
+@perf_cli.command('explicar')
+@click.option('--usuario', type=int, help='Id do usuário logado nas requisições (padrão: o primeiro).')
+@click.option('--min-linhas', default=1000, show_default=True,
+              help='Ignora Seq Scans em tabelas menores que isso.')
+@click.option('--todos', is_flag=True, help='Lista também os Seq Scans sem filtro seletivo (COUNT, agregados).')
+@click.option('--analisar/--sem-analisar', default=True, show_default=True,
+              help='Roda ANALYZE antes, para o planner enxergar o volume real.')
+def explicar(usuario, min_linhas, todos, analisar):
+    """Roda EXPLAIN nas queries das rotas e falha se algum Seq Scan seletivo pedir um índice."""
+    from flask import current_app
+    from app.utils.orcamento_rotas import explicar_rotas, seq_scan_evitavel
+
+    if db.engine.dialect.name != 'postgresql':
+        raise click.ClickException('O EXPLAIN das rotas só é suportado no PostgreSQL.')
+    usuario = usuario or db.session.query(User.id).order_by(User.id).limit(1).scalar()
+    if usuario is None:
+        raise click.ClickException('Nenhum usuário no banco; rode \'flask perf semear\' antes.')
+    if analisar:
+        db.session.execute(text('ANALYZE'))
+        db.session.commit()
+
+    problemas = 0
+    for url, statement, scans in explicar_rotas(current_app._get_current_object(), usuario):
+        for scan in scans:
+            if scan['tabela'].startswith('pg_'):
+                continue
+            evitavel = seq_scan_evitavel(scan, min_linhas=min_linhas)
+            if not (evitavel or todos):
+                continue
+            problemas += evitavel
+            click.echo(f"[{'Seq Scan' if evitavel else 'info'}] {url}: {scan['tabela']} "
+                       f"(~{scan['linhas']:.0f} de {scan['linhas_tabela']:.0f} linhas) filtro: {scan['filtro'] or '-'}")
+            click.echo('    ' + ' '.join(statement.split())[:300])
+
+    if problemas:
+        click.echo(f'{problemas} Seq Scan(s) que pedem índice.')
+        raise SystemExit(1)
+    click.echo('Nenhum Seq Scan seletivo nas rotas.')
+
+
+def register_commands(app):
+    app.cli.add_command(schema_cli)
+    app.cli.add_command(perf_cli)
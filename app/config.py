@@ -3,11 +3,76 @@ import os
 class Config:
     # --- CONEXÃO PARA O BANCO DE DADOS LOCAL (COM SENHA CORRIGIDA) ---
     # A senha "luft@123" foi codificada para "luft%40123"
-    SQLALCHEMY_DATABASE_URI = (
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or (
         "postgresql://postgres:luft%40123"
         "@localhost:5432/tower_control"
     )
 
+    # --- ENGINE / POOL (app/utils/conexoes.py) ---
+    # Perfil do engine: dev, test ou prod.
+    DB_PERFIL = os.environ.get('DB_PERFIL', 'dev')
+    # Workers e threads do gunicorn (gunicorn.conf.py lê as mesmas variáveis): no perfil
+    # prod o pool de cada worker sai dessa conta.
+    WEB_CONCURRENCY = int(os.environ.get('WEB_CONCURRENCY', 1))
+    WEB_THREADS = int(os.environ.get('WEB_THREADS', 8))
+    # Streams SSE simultâneos por processo (cada um ocupa uma thread); 0 desliga o stream.
+    SSE_MAX_CLIENTES = int(os.environ.get('SSE_MAX_CLIENTES', WEB_THREADS // 2))
+    # max_connections do PostgreSQL e quantas ficam de fora dos workers (cron, CLI, psql).
+    DB_MAX_CONEXOES = int(os.environ.get('DB_MAX_CONEXOES', 100))
+    DB_CONEXOES_RESERVADAS = int(os.environ.get('DB_CONEXOES_RESERVADAS', 10))
+    # Sobrescrevem o valor do perfil quando definidos.
+    DB_POOL_SIZE = int(os.environ['DB_POOL_SIZE']) if os.environ.get('DB_POOL_SIZE') else None
+    DB_MAX_OVERFLOW = int(os.environ['DB_MAX_OVERFLOW']) if os.environ.get('DB_MAX_OVERFLOW') else None
+    DB_POOL_TIMEOUT = int(os.environ['DB_POOL_TIMEOUT']) if os.environ.get('DB_POOL_TIMEOUT') else None
+
+    # statement_timeout (segundos) das requisições, por blueprint; 0 = sem limite.
+    # Comandos do CLI ('flask kpi atualizar', migrações) rodam sem limite.
+    STATEMENT_TIMEOUT_PADRAO = int(os.environ.get('STATEMENT_TIMEOUT_PADRAO', 5))
+    STATEMENT_TIMEOUTS = {
+        'kpi': 30,
+        'exportacoes': 120,
+    }
+
+    # --- RÉPLICA DE LEITURA (app/utils/replica.py), opcional ---
+    # Localmente, qualquer segundo banco serve (ex.: CREATE DATABASE ... TEMPLATE do primário).
+    SQLALCHEMY_BINDS = {'replica': os.environ['DATABASE_REPLICA_URL']} if os.environ.get('DATABASE_REPLICA_URL') else {}
+    # Atraso máximo aceito (segundos); também é a janela em que o usuário lê do primário depois de um POST.
+    REPLICA_LAG_TOLERADO = float(os.environ.get('REPLICA_LAG_TOLERADO', 5))
+    # Blueprints lidos da réplica em qualquer rota GET (as demais só nas rotas somente-GET).
+    REPLICA_BLUEPRINTS = ('kpi',)
+
+    # --- PERFILAMENTO DE SQL (app/utils/perfilamento.py), opt-in ---
+    # Server-Timing em cada resposta, p50/p95 por rota em /admin/perf e log de queries lentas.
+    PERFILAMENTO_SQL = os.environ.get('PERFILAMENTO_SQL', '0') == '1'
+    PERF_QUERY_LENTA_MS = int(os.environ.get('PERF_QUERY_LENTA_MS', 200))
+    # Arquivo compartilhado pelos workers, rotacionado pelo logrotate (sem copytruncate); '-' = stderr.
+    PERF_LOG_QUERIES_LENTAS = os.environ.get('PERF_LOG_QUERIES_LENTAS', 'logs/queries_lentas.log')
+
+    # --- MÉTRICAS /metrics (app/utils/metricas.py) ---
+    METRICAS_ATIVAS = os.environ.get('METRICAS_ATIVAS', '1') == '1'
+    # Diretório local compartilhado pelos workers do gunicorn (o gunicorn.conf.py usa um temporário se vazio);
+    # sem ele, cada processo expõe só os seus números.
+    METRICAS_DIR = os.environ.get('METRICAS_DIR')
+    # Se definido, o scrape precisa de 'Authorization: Bearer <token>'.
+    METRICAS_TOKEN = os.environ.get('METRICAS_TOKEN')
+
     SECRET_KEY = os.environ.get('SECRET_KEY') or "uma_senha_supersecreta"
     
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Idade máxima (segundos) de um snapshot de KPI antes de ser recalculado na leitura.
+    # 0 = serve sempre o último snapshot e depende só do 'flask kpi atualizar'.
+    KPI_SNAPSHOT_MAX_AGE = int(os.environ.get('KPI_SNAPSHOT_MAX_AGE', 900))
+
+    # Lote do hub (/kpis/api/batch): KPIs calculados em paralelo, cada um na sua conexão.
+    KPI_LOTE_PARALELO = os.environ.get('KPI_LOTE_PARALELO', '1') == '1'
+    KPI_POOL_WORKERS = int(os.environ.get('KPI_POOL_WORKERS', 4))
+    # Timeout (segundos) por widget; os que estouram voltam como erro no lote.
+    KPI_TIMEOUT_PADRAO = 10
+    KPI_TIMEOUTS = {
+        'employee-journey-sankey': 15,
+    }
+
+    # Cache (por processo) da identidade do usuário logado (user_loader), em segundos. É também o
+    # tempo máximo em que os outros workers ainda veem o tipo/active antigo de um usuário alterado.
+    USUARIO_CACHE_TTL = int(os.environ.get('USUARIO_CACHE_TTL', 5))
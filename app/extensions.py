@@ -1,5 +1,7 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 
-db = SQLAlchemy()
+from app.utils.replica import SessaoRoteada
+
+db = SQLAlchemy(session_options={'class_': SessaoRoteada})
 login_manager = LoginManager()
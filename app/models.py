@@ -2,7 +2,7 @@ from .extensions import db
 from flask_login import UserMixin
 from datetime import datetime, date
 from sqlalchemy.dialects.postgresql import JSONB # Importe JSONB para dados semi-estruturados
-from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Date, ForeignKey, DateTime, text
 from sqlalchemy.orm import relationship
 
 
@@ -17,6 +17,10 @@ class User(db.Model, UserMixin):
     active = db.Column(db.Boolean, default=True)
     profile_picture = db.Column(db.String(255))
 
+    __table_args__ = (
+        db.Index('ix_users_nome', 'nome'),
+    )
+
     def __repr__(self):
         return f"<User {self.email}>"
 
@@ -27,6 +31,10 @@ class Employees(db.Model):
     cargo = db.Column(db.String(120), nullable=False)
     salario = db.Column(db.Numeric(10, 2), nullable=False)
     media_feedbacks = db.Column(db.Numeric(3, 2), default=0.0)
+    # Soma e quantidade das pontuações recebidas; media_feedbacks = soma / total.
+    # Mantidas por app/utils/media_feedbacks.py na mesma transação do feedback.
+    feedbacks_soma = db.Column(db.Numeric(12, 2), nullable=False, default=0, server_default='0')
+    feedbacks_total = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     data_entrada = db.Column(db.Date, default=date.today)
     data_saida = db.Column(db.Date)
     status = db.Column(db.String(50), default='Ativo')
@@ -34,6 +42,16 @@ class Employees(db.Model):
 
     user = db.relationship('User', backref=db.backref('funcionario', uselist=False))
 
+    # Índices parciais: as telas e os KPIs quase sempre filtram 'active'.
+    __table_args__ = (
+        db.Index('ix_employees_status', 'status'),
+        db.Index('ix_employees_cargo', 'cargo'),
+        db.Index('ix_employees_ativos_media_feedbacks', media_feedbacks.desc().nulls_last(), 'id',
+                 postgresql_where=text('active')),
+        db.Index('ix_employees_ativos_data_entrada', 'data_entrada', postgresql_where=text('active')),
+        db.Index('ix_employees_inativos_user_id', 'user_id', postgresql_where=text('NOT active')),
+    )
+
     def __repr__(self):
         return f'<Funcionario {self.user.nome}>'
 
@@ -64,6 +82,13 @@ class TeamMember(db.Model):
     time = db.relationship('Team', back_populates='membros')
     user = db.relationship('User')
 
+    __table_args__ = (
+        db.Index('ix_team_members_user_id_status', 'user_id', 'status'),
+        db.Index('ix_team_members_ativos_team_id', 'team_id', postgresql_where=text("status = 'ativo'")),
+        db.Index('ix_team_members_data_entrada', 'data_entrada'),
+        db.Index('ix_team_members_data_saida', 'data_saida', postgresql_where=text('data_saida IS NOT NULL')),
+    )
+
 class PromotionLog(db.Model):
     __tablename__ = "promotions_logs"
 
@@ -80,6 +105,11 @@ class PromotionLog(db.Model):
     employee = db.relationship('Employees', backref='historico_promocoes')
     promovido_por = db.relationship('User')
 
+    __table_args__ = (
+        db.Index('ix_promotions_logs_employee_id', 'employee_id'),
+        db.Index('ix_promotions_logs_data_promocao', 'data_promocao'),
+    )
+
 # Novo modelo para Feedback
 class Feedback(db.Model):
     __tablename__ = "feedbacks"
@@ -95,6 +125,13 @@ class Feedback(db.Model):
     employee = db.relationship('Employees', backref='feedbacks')
     giver = db.relationship('User', foreign_keys=[giver_id])
 
+    __table_args__ = (
+        db.Index('ix_feedbacks_employee_id_data_feedback', 'employee_id', data_feedback.desc()),
+        # Janela de tempo e 'kpis ?| array[...]' do KPI de qualidades/defeitos (jsonb_ops).
+        db.Index('ix_feedbacks_data_feedback', 'data_feedback'),
+        db.Index('ix_feedbacks_kpis', 'kpis', postgresql_using='gin'),
+    )
+
     def __repr__(self):
         return f'<Feedback {self.id} para {self.employee.user.nome}>'
     
@@ -114,6 +151,10 @@ class SalaryAdjustmentLog(db.Model):
     employee = db.relationship('Employees', backref=db.backref('historico_ajustes', lazy=True))
     aprovado_por = db.relationship('User')
 
+    __table_args__ = (
+        db.Index('ix_salary_adjustments_logs_employee_id_data_ajuste', 'employee_id', 'data_ajuste'),
+    )
+
     def __repr__(self):
         return f'<SalaryAdjustmentLog {self.id} - {self.tipo_ajuste}>'
     
@@ -155,9 +196,20 @@ class Milestone(db.Model):
     employee = relationship('Employees', backref='milestones')
     team = relationship('Team', backref='milestones')
 
+    __table_args__ = (
+        db.Index('ix_milestones_data_marco', milestone_date.desc()),
+    )
+
     def __repr__(self):
         return f'<Milestone {self.id}: {self.title}>'
     
+# Tipos de reação aceitos na timeline -> coluna de contador correspondente em 'journeys'
+TIPOS_REACAO = {
+    'aplauso': 'reacoes_aplauso',
+    'foguete': 'reacoes_foguete',
+    'trofeu': 'reacoes_trofeu',
+}
+
 class Jornada(db.Model):
     __tablename__ = 'journeys'  # <-- ATUALIZADO
 
@@ -174,6 +226,13 @@ class Jornada(db.Model):
     team_id = Column('team_id', Integer, ForeignKey('teams.id'))
     data_criacao = Column('data_criacao', DateTime, default=datetime.utcnow)
 
+    # Contadores desnormalizados, mantidos por api_reagir/api_comentar na mesma transação
+    # da escrita. 'flask jornadas recalcular-contadores' os reconstrói a partir das tabelas base.
+    reacoes_aplauso = Column('reacoes_aplauso', Integer, nullable=False, default=0, server_default='0')
+    reacoes_foguete = Column('reacoes_foguete', Integer, nullable=False, default=0, server_default='0')
+    reacoes_trofeu = Column('reacoes_trofeu', Integer, nullable=False, default=0, server_default='0')
+    comentarios_total = Column('comentarios_total', Integer, nullable=False, default=0, server_default='0')
+
     # Relacionamentos (nenhuma mudança necessária aqui)
     criador = relationship('User', foreign_keys=[criado_por_id])
     employee = relationship('Employees', backref='jornadas')
@@ -181,6 +240,13 @@ class Jornada(db.Model):
     reacoes = relationship('JornadaReacao', backref='jornada', cascade="all, delete-orphan")
     comentarios = relationship('JornadaComentario', backref='jornada', cascade="all, delete-orphan")
 
+    # Ordem do keyset da timeline (data_jornada DESC, id DESC) e filtros da API.
+    __table_args__ = (
+        db.Index('ix_journeys_data_jornada_id', data_jornada.desc(), id.desc()),
+        db.Index('ix_journeys_employee_id', 'employee_id'),
+        db.Index('ix_journeys_team_id', 'team_id'),
+    )
+
 class Conquista(db.Model):
     __tablename__ = 'achievements'  # <-- ATUALIZADO
 
@@ -213,6 +279,11 @@ class JornadaReacao(db.Model):
 
     usuario = relationship('User')
 
+    __table_args__ = (
+        db.Index('uq_journey_reactions_user_jornada_tipo', 'user_id', 'jornada_id', 'tipo_reacao', unique=True),
+        db.Index('ix_journey_reactions_jornada_id_user_id', 'jornada_id', 'user_id'),
+    )
+
 class JornadaComentario(db.Model):
     __tablename__ = 'journey_comments'  # <-- ATUALIZADO
 
@@ -222,4 +293,35 @@ class JornadaComentario(db.Model):
     comentario = Column('comentario', Text, nullable=False)
     data_comentario = Column('data_comentario', DateTime, default=datetime.utcnow)
 
-    usuario = relationship('User')
\ No newline at end of file
+    usuario = relationship('User')
+
+    __table_args__ = (
+        db.Index('ix_journey_comments_jornada_id_data_id', 'jornada_id', 'data_comentario', 'id'),
+    )
+
+class KpiSnapshot(db.Model):
+    """
+    Resultado pré-calculado de um KPI do hub de analytics.
+    'periodo' identifica a janela/parâmetros usados no cálculo (ex.: 'padrao', 'months=24').
+    Há uma linha vigente por (kpi, periodo), sobrescrita a cada recálculo; as
+    linhas com 'historico' são as cópias gravadas pelo job 'flask kpi atualizar'.
+    """
+    __tablename__ = 'kpi_snapshots'
+
+    id = Column(Integer, primary_key=True)
+    kpi = Column('kpi', String(80), nullable=False)
+    periodo = Column('periodo', String(120), nullable=False, default='padrao')
+    dados = Column('dados', JSONB, nullable=False)
+    gerado_em = Column('gerado_em', DateTime, nullable=False, default=datetime.utcnow)
+    # Preenchido quando uma escrita em tabela de origem torna o snapshot obsoleto.
+    invalidado_em = Column('invalidado_em', DateTime)
+    historico = Column('historico', db.Boolean, nullable=False, default=False, server_default=text('false'))
+
+    __table_args__ = (
+        db.Index('ix_kpi_snapshots_kpi_periodo_gerado_em', 'kpi', 'periodo', 'gerado_em'),
+        db.Index('ux_kpi_snapshots_vigente', 'kpi', 'periodo', unique=True,
+                 postgresql_where=text('NOT historico')),
+    )
+
+    def __repr__(self):
+        return f'<KpiSnapshot {self.kpi} ({self.periodo}) @ {self.gerado_em}>'
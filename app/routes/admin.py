@@ -0,0 +1,47 @@
+# app/routes/admin.py
+from flask import Blueprint, abort, current_app, flash, jsonify, redirect, render_template, url_for
+from flask_login import current_user, login_required
+
+from app.extensions import db
+from app.utils.conexoes import estatisticas_pool
+from app.utils.perfilamento import limpar_rotas, resumo_rotas
+from app.utils.replica import lag_replica, replica_configurada
+from app.utils.usuarios import tipo_atual
+
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
+
+
+@admin_bp.before_request
+@login_required
+def exigir_admin():
+    # Do banco, não do cache da identidade: um rebaixamento vale na hora em todos os workers.
+    if tipo_atual(current_user.id) != 'Admin':
+        abort(403)
+
+
+@admin_bp.route('/pool')
+def pool():
+    """Ocupação e tempo de espera do pool de conexões de cada engine (deste worker)."""
+    dados = {
+        'perfil': current_app.config['DB_PERFIL'],
+        'engines': {nome or 'default': estatisticas_pool(engine) for nome, engine in db.engines.items()},
+    }
+    if replica_configurada():
+        dados['replica'] = {'lag_s': lag_replica(), 'lag_tolerado_s': current_app.config['REPLICA_LAG_TOLERADO']}
+    return jsonify(dados)
+
+
+@admin_bp.route('/perf')
+def perf():
+    """p50/p95 de tempo total, tempo de banco e queries por rota (todos os workers)."""
+    ativo = current_app.config.get('PERFILAMENTO_SQL')
+    return render_template('admin/perf.html', ativo=ativo, blueprints=resumo_rotas() if ativo else {},
+                           limite_ms=current_app.config.get('PERF_QUERY_LENTA_MS'))
+
+
+@admin_bp.route('/perf/limpar', methods=['POST'])
+def limpar_perf():
+    if current_app.config.get('PERFILAMENTO_SQL'):
+        limpar_rotas()
+    flash('Amostras de desempenho zeradas.', 'success')
+    return redirect(url_for('admin.perf'))
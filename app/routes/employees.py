@@ -1,8 +1,12 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required
-from app.models import User, Employees, TeamMember
+from app.models import User, Employees
 from app.extensions import db
 from datetime import date
+from app.utils.equipes import encerrar_vinculos_inativos
+from app.utils.listagem import (ler_parametros, paginar_funcionarios, renderizar_listagem,
+                                serializar_pagina, ParametrosInvalidos)
+from app.utils.busca import buscar_usuarios, serializar_resultado, ESCOPOS, LIMITE_PADRAO, LIMITE_MAX
 
 funcionarios_bp = Blueprint('funcionarios', __name__, url_prefix='/funcionarios')
 
@@ -19,8 +23,32 @@ def parse_salario(valor_str):
 @funcionarios_bp.route('/')
 @login_required
 def lista_funcionarios():
-    funcionarios = Employees.query.all()
-    return render_template('gestor/funcionarios.html', funcionarios=funcionarios)
+    return renderizar_listagem('gestor/funcionarios.html', 'gestor/_funcionarios_lista.html')
+
+@funcionarios_bp.route('/api/lista')
+@login_required
+def api_lista_funcionarios():
+    """Página da listagem de funcionários em JSON (mesmos parâmetros das telas)."""
+    try:
+        params = ler_parametros()
+    except ParametrosInvalidos as erro:
+        return jsonify({'erro': str(erro)}), 400
+    return jsonify(serializar_pagina(paginar_funcionarios(params)))
+
+@funcionarios_bp.route('/api/search')
+@login_required
+def api_search():
+    """
+    Typeahead de funcionários por nome, e-mail ou cargo.
+    ?q=termo&limite=10&escopo=ativos|disponiveis|todos
+    """
+    escopo = request.args.get('escopo', 'ativos')
+    if escopo not in ESCOPOS:
+        return jsonify({'erro': f"Escopo inválido. Use: {', '.join(ESCOPOS)}."}), 400
+    limite = request.args.get('limite', LIMITE_PADRAO, type=int)
+    limite = max(1, min(limite, LIMITE_MAX))
+    termo = request.args.get('q', '')[:100]
+    return jsonify({'itens': [serializar_resultado(linha) for linha in buscar_usuarios(termo, limite, escopo)]})
 
 @funcionarios_bp.route('/demitir/<int:funcionario_id>', methods=['POST'])
 @login_required
@@ -31,11 +59,8 @@ def demitir_funcionario(funcionario_id):
     funcionario.status = 'Demitido'
     funcionario.data_saida = date.today()
 
-    # Atualiza os registros na tabela team_members
-    membros = TeamMember.query.filter_by(user_id=funcionario.user_id, status='ativo').all()
-    for membro in membros:
-        membro.status = 'inativo'
-        membro.data_saida = date.today()
+    # Encerra os vínculos ativos com os times num único UPDATE
+    encerrar_vinculos_inativos([funcionario.user_id])
 
     db.session.commit()
 
@@ -101,5 +126,7 @@ def adicionar_funcionario():
         flash('Funcionário adicionado com sucesso!', 'success')
         return redirect(url_for('funcionarios.lista_funcionarios'))
 
-    usuarios = User.query.all()
-    return render_template('gestor/adicionar_funcionario.html', usuarios=usuarios)
+    # As opções do select vêm sob demanda de /funcionarios/api/search; só o usuário
+    # pré-selecionado (link de reativação da lista) é renderizado aqui.
+    usuario_selecionado = User.query.get(request.args.get('user_id', type=int)) if request.args.get('user_id') else None
+    return render_template('gestor/adicionar_funcionario.html', usuario_selecionado=usuario_selecionado)
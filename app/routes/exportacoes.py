@@ -0,0 +1,61 @@
+# app/routes/exportacoes.py
+import click
+from datetime import date
+from flask import Blueprint, Response, abort, render_template, request, stream_with_context
+from flask_login import login_required
+
+from app.models import Team
+from app.utils.exportacao import CONJUNTOS, FORMATOS, FiltrosInvalidos, gerar_exportacao, ler_filtros
+
+exportacoes_bp = Blueprint('exportacoes', __name__, url_prefix='/exportacoes')
+
+
+@exportacoes_bp.route('/')
+@login_required
+def index():
+    """Tela com os conjuntos exportáveis e os filtros de período e time."""
+    times = Team.query.with_entities(Team.id, Team.nome).order_by(Team.nome).all()
+    return render_template('gestor/exportacoes.html', conjuntos=CONJUNTOS, formatos=FORMATOS, times=times)
+
+
+@exportacoes_bp.route('/<conjunto>.<formato>')
+@login_required
+def exportar(conjunto, formato):
+    """
+    Download em streaming: a resposta sai em chunks enquanto o cursor do banco é lido.
+    Filtros: ?de=AAAA-MM-DD&ate=AAAA-MM-DD&team_id=N.
+    """
+    if conjunto not in CONJUNTOS or formato not in FORMATOS:
+        abort(404)
+    try:
+        filtros = ler_filtros(request.args.get('de'), request.args.get('ate'), request.args.get('team_id'))
+    except FiltrosInvalidos as erro:
+        abort(400, description=str(erro))
+
+    nome_arquivo = f'{conjunto}_{date.today():%Y%m%d}.{formato}'
+    response = Response(stream_with_context(gerar_exportacao(conjunto, formato, **filtros)),
+                        mimetype=FORMATOS[formato])
+    response.headers['Content-Disposition'] = f'attachment; filename="{nome_arquivo}"'
+    # Evita que proxies (nginx) acumulem o arquivo inteiro antes de repassar.
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.cache_control.no_store = True
+    return response
+
+
+# --- CLI ---
+
+@exportacoes_bp.cli.command('gerar')
+@click.argument('conjunto', type=click.Choice(list(CONJUNTOS)))
+@click.option('--formato', type=click.Choice(list(FORMATOS)), default='csv', show_default=True)
+@click.option('--saida', type=click.File('wb'), default='-', help='Arquivo de destino (padrão: stdout).')
+@click.option('--de', help='Data inicial (AAAA-MM-DD).')
+@click.option('--ate', help='Data final (AAAA-MM-DD).')
+@click.option('--time', 'team_id', type=int, help='Só funcionários que passaram por este time.')
+def gerar_command(conjunto, formato, saida, de, ate, team_id):
+    """Exporta folha, histórico salarial, promoções ou feedbacks em CSV/XLSX, em streaming."""
+    try:
+        filtros = ler_filtros(de, ate, team_id)
+    except FiltrosInvalidos as erro:
+        raise click.BadParameter(str(erro))
+    for pedaco in gerar_exportacao(conjunto, formato, **filtros):
+        saida.write(pedaco)
@@ -1,9 +1,15 @@
+import click
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required, current_user
 from app.models import Employees, Feedback, User
 from app.extensions import db
 from datetime import datetime
 import json
+from sqlalchemy.orm import joinedload
+from app.utils.listagem import renderizar_listagem
+from app.utils.media_feedbacks import ajustar_media, recalcular_medias
+from app.utils.validacao_feedbacks import FeedbackInvalido, kpis_do_formulario, validar_pontuacao
+from app.utils.importacao_feedbacks import TAMANHO_LOTE, formato_do_arquivo, importar_feedbacks, ler_linhas
 
 feedbacks_bp = Blueprint('feedbacks', __name__, url_prefix='/feedbacks')
 
@@ -11,8 +17,9 @@ feedbacks_bp = Blueprint('feedbacks', __name__, url_prefix='/feedbacks')
 @login_required
 def dashboard_feedbacks():
     # ❗ CORREÇÃO: Lista apenas funcionários ativos.
-    funcionarios_ordenados = Employees.query.filter_by(active=True).order_by(Employees.media_feedbacks.desc()).all()
-    return render_template('gestor/dashboard_feedbacks.html', funcionarios=funcionarios_ordenados)
+    return renderizar_listagem('gestor/dashboard_feedbacks.html', 'gestor/_dashboard_feedbacks_lista.html',
+                               padroes={'ordem': 'media_feedbacks', 'direcao': 'desc'},
+                               fixos={'status': 'ativo'})
 
 @feedbacks_bp.route('/funcionario/<int:employee_id>')
 @login_required
@@ -24,13 +31,12 @@ def ver_feedbacks_funcionario(employee_id):
         flash('Não é possível visualizar feedbacks de um funcionário inativo.', 'danger')
         return redirect(url_for('feedbacks.dashboard_feedbacks'))
 
-    feedbacks_recebidos = Feedback.query.filter_by(employee_id=employee_id).order_by(Feedback.data_feedback.desc()).all()
-    media_feedbacks_funcionario = db.session.query(db.func.avg(Feedback.pontuacao_geral)).filter(Feedback.employee_id == employee_id).scalar()
-    
+    feedbacks_recebidos = Feedback.query.options(joinedload(Feedback.giver)).filter_by(employee_id=employee_id).order_by(Feedback.data_feedback.desc()).all()
+
     return render_template('gestor/ver_feedbacks_funcionario.html',
                            funcionario=funcionario,
                            feedbacks=feedbacks_recebidos,
-                           media_feedbacks=media_feedbacks_funcionario)
+                           media_feedbacks=funcionario.media_feedbacks if funcionario.feedbacks_total else None)
 
 @feedbacks_bp.route('/dar/<int:employee_id>', methods=['GET', 'POST'])
 @login_required
@@ -53,54 +59,12 @@ def dar_feedback(employee_id):
             return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
         
         try:
-            pontuacao_geral = float(pontuacao_str)
-            if not (0 <= pontuacao_geral <= 5):
-                raise ValueError
-        except (ValueError, TypeError):
-            flash('A pontuação geral deve ser um número entre 0 e 5.', 'danger')
+            pontuacao_geral = validar_pontuacao(pontuacao_str)
+            kpis_to_save = kpis_do_formulario(request.form)
+        except FeedbackInvalido as erro:
+            flash(str(erro), 'danger')
             return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
 
-        kpis_data = {"qualidades": {}, "defeitos": {}}
-        
-        qualidade_nomes = request.form.getlist('kpi_qualidade_nome[]')
-        qualidade_niveis = request.form.getlist('kpi_qualidade_nivel[]')
-        
-        for i in range(len(qualidade_nomes)):
-            nome = qualidade_nomes[i].strip()
-            nivel_str = qualidade_niveis[i].strip()
-            if nome and nivel_str:
-                try:
-                    nivel = float(nivel_str)
-                    if not (0 <= nivel <= 5):
-                        flash(f"Nível inválido para a qualidade '{nome}'. Deve ser entre 0 e 5.", 'danger')
-                        return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
-                    kpis_data["qualidades"][nome] = nivel
-                except (ValueError, TypeError):
-                    flash(f"Nível inválido para a qualidade '{nome}'. Deve ser um número.", 'danger')
-                    return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
-
-        defeito_nomes = request.form.getlist('kpi_defeito_nome[]')
-        defeito_niveis = request.form.getlist('kpi_defeito_nivel[]')
-
-        for i in range(len(defeito_nomes)):
-            nome = defeito_nomes[i].strip()
-            nivel_str = defeito_niveis[i].strip()
-            if nome and nivel_str:
-                try:
-                    nivel = float(nivel_str)
-                    if not (0 <= nivel <= 5):
-                        flash(f"Nível inválido para o defeito '{nome}'. Deve ser entre 0 e 5.", 'danger')
-                        return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
-                    kpis_data["defeitos"][nome] = nivel
-                except (ValueError, TypeError):
-                    flash(f"Nível inválido para o defeito '{nome}'. Deve ser um número.", 'danger')
-                    return redirect(url_for('feedbacks.dar_feedback', employee_id=employee_id))
-        
-        if not kpis_data["qualidades"] and not kpis_data["defeitos"]:
-            kpis_to_save = None
-        else:
-            kpis_to_save = kpis_data
-
         novo_feedback = Feedback(
             employee_id=funcionario_alvo.id,
             giver_id=current_user.id,
@@ -111,14 +75,7 @@ def dar_feedback(employee_id):
         )
 
         db.session.add(novo_feedback)
-        db.session.commit()
-
-        media_atualizada = db.session.query(db.func.avg(Feedback.pontuacao_geral)).filter(Feedback.employee_id == funcionario_alvo.id).scalar()
-        if media_atualizada is not None:
-            funcionario_alvo.media_feedbacks = media_atualizada
-        else:
-            funcionario_alvo.media_feedbacks = 0.0
-            
+        ajustar_media(funcionario_alvo.id, nova=pontuacao_geral)
         db.session.commit()
         
         flash(f'Feedback para {funcionario_alvo.user.nome} registrado com sucesso!', 'success')
@@ -137,77 +94,24 @@ def editar_feedback(feedback_id):
         return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=feedback.employee_id))
 
     if request.method == 'POST':
+        pontuacao_anterior = feedback.pontuacao_geral
         feedback.descricao = request.form.get('descricao')
         feedback.tipo_feedback = request.form.get('tipo_feedback')
         
-        pontuacao_str = request.form.get('pontuacao_geral')
+        # --- PONTUAÇÃO E KPIS DINÂMICOS (mesmas regras do cadastro) ---
         try:
-            pontuacao_geral = float(pontuacao_str)
-            if not (0 <= pontuacao_geral <= 5):
-                raise ValueError
-            feedback.pontuacao_geral = pontuacao_geral
-        except (ValueError, TypeError):
-            flash('A pontuação geral deve ser um número entre 0 e 5.', 'danger')
+            feedback.pontuacao_geral = validar_pontuacao(request.form.get('pontuacao_geral'))
+            feedback.kpis = kpis_do_formulario(request.form)
+        except FeedbackInvalido as erro:
+            flash(str(erro), 'danger')
             return redirect(url_for('feedbacks.editar_feedback', feedback_id=feedback_id))
-
-        # --- PROCESSAMENTO DOS KPIS DINÂMICOS NA EDIÇÃO ---
-        kpis_data = {"qualidades": {}, "defeitos": {}}
-        
-        # Coleta os dados de qualidades
-        qualidade_nomes = request.form.getlist('kpi_qualidade_nome[]')
-        qualidade_niveis = request.form.getlist('kpi_qualidade_nivel[]')
-        
-        for i in range(len(qualidade_nomes)):
-            nome = qualidade_nomes[i].strip()
-            nivel_str = qualidade_niveis[i].strip()
-            if nome and nivel_str:
-                try:
-                    nivel = float(nivel_str)
-                    if not (0 <= nivel <= 5):
-                        flash(f"Nível inválido para a qualidade '{nome}'. Deve ser entre 0 e 5.", 'danger')
-                        return redirect(url_for('feedbacks.editar_feedback', feedback_id=feedback_id))
-                    kpis_data["qualidades"][nome] = nivel
-                except (ValueError, TypeError):
-                    flash(f"Nível inválido para a qualidade '{nome}'. Deve ser um número.", 'danger')
-                    return redirect(url_for('feedbacks.editar_feedback', feedback_id=feedback_id))
-
-        # Coleta os dados de defeitos
-        defeito_nomes = request.form.getlist('kpi_defeito_nome[]')
-        defeito_niveis = request.form.getlist('kpi_defeito_nivel[]')
-
-        for i in range(len(defeito_nomes)):
-            nome = defeito_nomes[i].strip()
-            nivel_str = defeito_niveis[i].strip()
-            if nome and nivel_str:
-                try:
-                    nivel = float(nivel_str)
-                    if not (0 <= nivel <= 5):
-                        flash(f"Nível inválido para o defeito '{nome}'. Deve ser entre 0 e 5.", 'danger')
-                        return redirect(url_for('feedbacks.editar_feedback', feedback_id=feedback_id))
-                    kpis_data["defeitos"][nome] = nivel
-                except (ValueError, TypeError):
-                    flash(f"Nível inválido para o defeito '{nome}'. Deve ser um número.", 'danger')
-                    return redirect(url_for('feedbacks.editar_feedback', feedback_id=feedback_id))
-        
-        if not kpis_data["qualidades"] and not kpis_data["defeitos"]:
-            feedback.kpis = None
-        else:
-            feedback.kpis = kpis_data
         # ------------------------------------------
 
-        db.session.commit()
-        
-        media_atualizada = db.session.query(db.func.avg(Feedback.pontuacao_geral))\
-                                    .filter(Feedback.employee_id == feedback.employee_id)\
-                                    .scalar()
-        if media_atualizada is not None:
-            feedback.employee.media_feedbacks = media_atualizada
-        else:
-            feedback.employee.media_feedbacks = 0.0
+        ajustar_media(feedback.employee_id, anterior=pontuacao_anterior, nova=feedback.pontuacao_geral)
         db.session.commit()
 
         flash('Feedback atualizado com sucesso!', 'success')
-        return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=feedback.employee.id))
+        return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=feedback.employee_id))
     
     # Para o GET request, prepare os dados para preencher o formulário dinâmico
     # O template de edição usará estas listas para recriar os campos dinâmicos
@@ -231,18 +135,70 @@ def deletar_feedback(feedback_id):
         return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=employee_id))
     
     db.session.delete(feedback)
+    ajustar_media(employee_id, anterior=feedback.pontuacao_geral)
     db.session.commit()
 
-    media_atualizada = db.session.query(db.func.avg(Feedback.pontuacao_geral))\
-                                .filter(Feedback.employee_id == employee_id)\
-                                .scalar()
-    funcionario = Employees.query.get(employee_id)
-    if funcionario:
-        if media_atualizada is not None:
-            funcionario.media_feedbacks = media_atualizada
-        else:
-            funcionario.media_feedbacks = 0.0
+    flash('Feedback deletado com sucesso!', 'success')
+    return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=employee_id))
+
+
+# --- Importação em lote (ciclo de avaliação) ---
+@feedbacks_bp.route('/importar', methods=['GET', 'POST'])
+@login_required
+def importar_feedbacks_lote():
+    if request.method == 'POST':
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            flash('Selecione um arquivo CSV ou JSON para importar.', 'danger')
+            return redirect(url_for('feedbacks.importar_feedbacks_lote'))
+
+        try:
+            formato = formato_do_arquivo(arquivo.filename)
+            resultado = importar_feedbacks(ler_linhas(arquivo.stream, formato), current_user.id)
+        except FeedbackInvalido as erro:
+            db.session.rollback()
+            flash(str(erro), 'danger')
+            return redirect(url_for('feedbacks.importar_feedbacks_lote'))
         db.session.commit()
 
-    flash('Feedback deletado com sucesso!', 'success')
-    return redirect(url_for('feedbacks.ver_feedbacks_funcionario', employee_id=employee_id))
\ No newline at end of file
+        categoria = 'warning' if resultado.erros else 'success'
+        flash(f'{resultado.importados} feedback(s) importado(s) para {len(resultado.funcionarios)} funcionário(s); '
+              f'{len(resultado.erros)} linha(s) com erro.', categoria)
+        return render_template('gestor/importar_feedbacks.html', resultado=resultado)
+
+    return render_template('gestor/importar_feedbacks.html', resultado=None)
+
+
+# --- MANUTENÇÃO (CLI) ---
+
+@feedbacks_bp.cli.command('importar')
+@click.argument('arquivo', type=click.File('rb'))
+@click.option('--autor', required=True, help='E-mail do usuário registrado como autor dos feedbacks.')
+@click.option('--lote', default=TAMANHO_LOTE, show_default=True, help='Linhas por INSERT em lote.')
+def importar_command(arquivo, autor, lote):
+    """Importa feedbacks de um arquivo .csv, .json ou .jsonl (mesmas regras do formulário)."""
+    giver_id = db.session.query(User.id).filter(db.func.lower(User.email) == autor.strip().lower()).scalar()
+    if giver_id is None:
+        raise click.ClickException(f"Usuário '{autor}' não encontrado.")
+    try:
+        formato = formato_do_arquivo(arquivo.name)
+        resultado = importar_feedbacks(ler_linhas(arquivo, formato), giver_id, tamanho_lote=lote)
+    except FeedbackInvalido as erro:
+        db.session.rollback()
+        raise click.ClickException(str(erro))
+    db.session.commit()
+
+    for numero, mensagem in resultado.erros:
+        click.echo(f'Linha {numero}: {mensagem}', err=True)
+    click.echo(f'{resultado.importados} feedback(s) importado(s) para {len(resultado.funcionarios)} funcionário(s); '
+               f'{len(resultado.erros)} linha(s) com erro.')
+    if resultado.erros:
+        raise SystemExit(1)
+
+
+@feedbacks_bp.cli.command('recalcular-medias')
+def recalcular_medias_command():
+    """Reconstrói soma, total e média de feedbacks de todos os funcionários a partir da tabela feedbacks."""
+    atualizados = recalcular_medias()
+    db.session.commit()
+    click.echo(f'Médias recalculadas para {atualizados} funcionário(s).')
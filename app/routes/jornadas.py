@@ -1,9 +1,17 @@
 # app/routes/jornadas.py
-from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify
+import json
+import queue
+
+import click
+from flask import Blueprint, Response, current_app, render_template, request, redirect, url_for, flash, jsonify
 from flask_login import login_required, current_user
-from app.models import db, Jornada, JornadaReacao, JornadaComentario, Employees, Team, User
-from sqlalchemy.orm import joinedload, subqueryload
-from datetime import date
+from app.models import db, Jornada, JornadaReacao, JornadaComentario, Employees, Team, User, TIPOS_REACAO
+from app.utils.eventos import barramento
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload
+from datetime import date, datetime
 
 jornadas_bp = Blueprint('jornadas', __name__, url_prefix='/jornada')
 
@@ -11,7 +19,8 @@ jornadas_bp = Blueprint('jornadas', __name__, url_prefix='/jornada')
 @login_required
 def timeline():
     """ Rota principal que renderiza a página da timeline. """
-    return render_template('gestor/jornada_timeline.html')
+    teams = Team.query.filter_by(status='ativo').order_by(Team.nome).all()
+    return render_template('gestor/jornada_timeline.html', teams=teams)
 
 # (As rotas de adicionar, editar e deletar continuam as mesmas da resposta anterior)
 @jornadas_bp.route('/adicionar', methods=['GET', 'POST'])
@@ -31,15 +40,15 @@ def adicionar_jornada():
             team_id=int(request.form.get('team_id')) if request.form.get('team_id') else None
         )
         db.session.add(nova_jornada)
+        db.session.flush()
+        barramento.publicar('jornada_nova', {'id': nova_jornada.id})
         db.session.commit()
         flash('Novo marco adicionado à Jornada com sucesso!', 'success')
         return redirect(url_for('jornadas.timeline'))
 
-    # Para o método GET, busca dados para preencher os selects
-    employees = db.session.query(Employees).join(User).filter(Employees.active==True).order_by(User.nome).all()
+    # Para o método GET, busca os times do select (funcionários vêm sob demanda de /funcionarios/api/search)
     teams = Team.query.filter_by(status='ativo').order_by(Team.nome).all()
     return render_template('gestor/jornada_form.html',
-                           employees=employees,
                            teams=teams,
                            today=date.today().isoformat())
 
@@ -62,11 +71,9 @@ def editar_jornada(jornada_id):
         flash('Marco da Jornada atualizado com sucesso!', 'info')
         return redirect(url_for('jornadas.timeline'))
 
-    employees = db.session.query(Employees).join(User).filter(Employees.active==True).order_by(User.nome).all()
     teams = Team.query.filter_by(status='ativo').order_by(Team.nome).all()
     return render_template('gestor/jornada_form.html',
                            jornada=jornada,
-                           employees=employees,
                            teams=teams,
                            today=date.today().isoformat())
 
@@ -86,76 +93,299 @@ def deletar_jornada(jornada_id):
 
 # --- ROTAS DA API (PARA O FRONTEND DINÂMICO) ---
 
+TIMELINE_LIMITE_PADRAO = 20
+TIMELINE_LIMITE_MAX = 100
+# Quantos comentários de cada jornada vêm junto com a página; o resto sai por /api/<id>/comentarios.
+COMENTARIOS_POR_JORNADA = 3
+COMENTARIOS_LIMITE_MAX = 50
+
+
+def _codificar_cursor(jornada):
+    return f'{jornada.data_jornada.isoformat()}_{jornada.id}'
+
+
+def _decodificar_cursor(cursor):
+    """ Converte 'AAAA-MM-DD_id' em (data_jornada, id). Levanta ValueError se inválido. """
+    data_str, id_str = cursor.split('_', 1)
+    return date.fromisoformat(data_str), int(id_str)
+
+
+def _codificar_cursor_comentario(comentario):
+    return f'{comentario.data_comentario.isoformat()}_{comentario.id}'
+
+
+def _decodificar_cursor_comentario(cursor):
+    data_str, id_str = cursor.split('_', 1)
+    return datetime.fromisoformat(data_str), int(id_str)
+
+
+def _serializar_comentario(c):
+    return {'id': c.id, 'texto': c.comentario, 'user': c.usuario.nome, 'data': c.data_comentario.strftime('%d/%m %H:%M')}
+
+
+def _reacoes_do_usuario(jornada_ids):
+    """ Tipos de reação que o usuário logado deixou em cada jornada da página. """
+    do_usuario = {jornada_id: set() for jornada_id in jornada_ids}
+    linhas = db.session.query(JornadaReacao.jornada_id, JornadaReacao.tipo_reacao)\
+        .filter(JornadaReacao.jornada_id.in_(jornada_ids), JornadaReacao.user_id == current_user.id)
+    for jornada_id, tipo_reacao in linhas:
+        do_usuario[jornada_id].add(tipo_reacao)
+    return do_usuario
+
+
+def _comentarios_da_pagina(jornada_ids):
+    """ Primeiros COMENTARIOS_POR_JORNADA comentários de cada jornada (row_number). """
+    posicao = func.row_number().over(
+        partition_by=JornadaComentario.jornada_id,
+        order_by=(JornadaComentario.data_comentario, JornadaComentario.id)
+    ).label('posicao')
+    numerados = db.session.query(JornadaComentario.id, posicao)\
+        .filter(JornadaComentario.jornada_id.in_(jornada_ids))\
+        .subquery()
+
+    primeiros = {jornada_id: [] for jornada_id in jornada_ids}
+    comentarios = JornadaComentario.query.options(joinedload(JornadaComentario.usuario))\
+        .join(numerados, numerados.c.id == JornadaComentario.id)\
+        .filter(numerados.c.posicao <= COMENTARIOS_POR_JORNADA)\
+        .order_by(JornadaComentario.data_comentario, JornadaComentario.id)
+    for comentario in comentarios:
+        primeiros[comentario.jornada_id].append(comentario)
+    return primeiros
+
+
+def _serializar_jornada(jornada, user_reacoes, comentarios):
+    reacoes_contagem = {tipo: getattr(jornada, coluna) for tipo, coluna in TIPOS_REACAO.items() if getattr(jornada, coluna)}
+    comentarios_total = jornada.comentarios_total
+    return {
+        'id': jornada.id,
+        'titulo': jornada.titulo,
+        'descricao': jornada.descricao,
+        'data_jornada': jornada.data_jornada.strftime('%d de %B de %Y'),
+        'tipo': jornada.tipo,
+        'categoria': jornada.categoria,
+        'icone': jornada.icone,
+        'employee': jornada.employee.user.nome if jornada.employee and jornada.employee.user else None,
+        'team': jornada.time.nome if jornada.time else None,
+        'reacoes_contagem': reacoes_contagem,
+        'user_reacoes': sorted(user_reacoes),
+        'comentarios': [_serializar_comentario(c) for c in comentarios],
+        'comentarios_total': comentarios_total,
+        'comentarios_cursor': _codificar_cursor_comentario(comentarios[-1]) if comentarios_total > len(comentarios) else None,
+    }
+
+
 @jornadas_bp.route('/api/dados')
 @login_required
 def api_dados_jornada():
-    """ API OTIMIZADA que envia os dados da jornada, agora com filtro por tipo. """
+    """
+    API paginada por cursor (keyset em data_jornada, id) da timeline.
+    Filtros: tipo, team_id, employee_id, data_inicio, data_fim (AAAA-MM-DD).
+    Paginação: limit (padrão 20, máx. 100) e cursor (valor de 'proximo_cursor' da página anterior).
+    """
     tipo_filtro = request.args.get('tipo', None) # Pega o parâmetro 'tipo' da URL
+    team_id = request.args.get('team_id', type=int)
+    employee_id = request.args.get('employee_id', type=int)
+    limite = min(request.args.get('limit', TIMELINE_LIMITE_PADRAO, type=int) or TIMELINE_LIMITE_PADRAO, TIMELINE_LIMITE_MAX)
+
+    try:
+        data_inicio = date.fromisoformat(request.args['data_inicio']) if request.args.get('data_inicio') else None
+        data_fim = date.fromisoformat(request.args['data_fim']) if request.args.get('data_fim') else None
+        cursor = _decodificar_cursor(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'status': 'erro', 'message': 'Parâmetros de data ou cursor inválidos.'}), 400
 
-    # Query base otimizada
+    # Query base otimizada: contagens vêm dos contadores desnormalizados da própria
+    # jornada; reações do usuário e primeiros comentários, de queries só da página.
     query = Jornada.query.options(
         joinedload(Jornada.employee).joinedload(Employees.user),
-        joinedload(Jornada.time),
-        subqueryload(Jornada.reacoes).joinedload(JornadaReacao.usuario),
-        subqueryload(Jornada.comentarios).joinedload(JornadaComentario.usuario)
+        joinedload(Jornada.time)
     )
 
-    # Aplica o filtro se ele foi fornecido
+    # Aplica os filtros que foram fornecidos
     if tipo_filtro:
         query = query.filter(Jornada.tipo == tipo_filtro)
-    
-    jornadas = query.order_by(Jornada.data_jornada.desc(), Jornada.id.desc()).all()
-    
-    # O resto da serialização continua igual
-    dados_json = []
-    for jornada in jornadas:
-        reacoes_contagem = {}
-        for r in jornada.reacoes:
-            reacoes_contagem[r.tipo_reacao] = reacoes_contagem.get(r.tipo_reacao, 0) + 1
-        
-        user_reacoes = {r.tipo_reacao for r in jornada.reacoes if r.user_id == current_user.id}
-
-        dados_json.append({
-            'id': jornada.id,
-            'titulo': jornada.titulo,
-            'descricao': jornada.descricao,
-            'data_jornada': jornada.data_jornada.strftime('%d de %B de %Y'),
-            'tipo': jornada.tipo,
-            'categoria': jornada.categoria,
-            'icone': jornada.icone,
-            'employee': jornada.employee.user.nome if jornada.employee and jornada.employee.user else None,
-            'team': jornada.time.nome if jornada.time else None,
-            'reacoes_contagem': reacoes_contagem,
-            'user_reacoes': list(user_reacoes),
-            'comentarios': [{'id': c.id, 'texto': c.comentario, 'user': c.usuario.nome, 'data': c.data_comentario.strftime('%d/%m %H:%M')} for c in jornada.comentarios],
-        })
-    return jsonify(dados_json)
+    if team_id:
+        query = query.filter(Jornada.team_id == team_id)
+    if employee_id:
+        query = query.filter(Jornada.employee_id == employee_id)
+    if data_inicio:
+        query = query.filter(Jornada.data_jornada >= data_inicio)
+    if data_fim:
+        query = query.filter(Jornada.data_jornada <= data_fim)
+
+    # Keyset: continua exatamente depois do último item da página anterior,
+    # sem OFFSET, então o custo da página não cresce com o histórico.
+    if cursor:
+        query = query.filter(tuple_(Jornada.data_jornada, Jornada.id) < cursor)
+
+    jornadas = query.order_by(Jornada.data_jornada.desc(), Jornada.id.desc()).limit(limite + 1).all()
+
+    tem_mais = len(jornadas) > limite
+    jornadas = jornadas[:limite]
+
+    jornada_ids = [jornada.id for jornada in jornadas]
+    if jornada_ids:
+        do_usuario = _reacoes_do_usuario(jornada_ids)
+        comentarios = _comentarios_da_pagina(jornada_ids)
+
+    return jsonify({
+        'itens': [
+            _serializar_jornada(jornada, do_usuario[jornada.id], comentarios[jornada.id])
+            for jornada in jornadas
+        ],
+        'proximo_cursor': _codificar_cursor(jornadas[-1]) if tem_mais else None,
+    })
+
+
+@jornadas_bp.route('/api/<int:jornada_id>')
+@login_required
+def api_jornada(jornada_id):
+    """ Uma jornada no mesmo formato dos itens de /api/dados (usada ao receber 'jornada_nova'). """
+    jornada = Jornada.query.options(
+        joinedload(Jornada.employee).joinedload(Employees.user),
+        joinedload(Jornada.time)
+    ).get_or_404(jornada_id)
+    return jsonify(_serializar_jornada(jornada, _reacoes_do_usuario([jornada.id])[jornada.id],
+                                       _comentarios_da_pagina([jornada.id])[jornada.id]))
+
+
+@jornadas_bp.route('/api/stream')
+@login_required
+def api_stream():
+    """
+    Server-Sent Events com as mudanças da timeline: 'jornada_nova', 'reacoes' e 'comentario'.
+    O frontend aplica cada evento no card correspondente, sem recarregar a página de dados.
+    """
+    fila = barramento.assinar(maximo=current_app.config.get('SSE_MAX_CLIENTES'))
+    if fila is None:
+        # Todas as threads reservadas para streams estão ocupadas: 204 encerra o EventSource.
+        return '', 204
+    # A conexão usada pelo load_user volta ao pool: o stream pode ficar aberto por horas.
+    db.session.remove()
+
+    def gerar():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    evento = fila.get(timeout=25)
+                except queue.Empty:
+                    # Comentário SSE para manter a conexão viva atrás de proxies.
+                    yield ': ping\n\n'
+                    continue
+                yield f"event: {evento['tipo']}\ndata: {json.dumps(evento['dados'])}\n\n"
+        finally:
+            barramento.cancelar(fila)
+
+    response = Response(gerar(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@jornadas_bp.route('/api/<int:jornada_id>/comentarios')
+@login_required
+def api_comentarios_jornada(jornada_id):
+    """ Próxima página de comentários de uma jornada ('carregar mais comentários'). """
+    limite = min(request.args.get('limit', COMENTARIOS_LIMITE_MAX, type=int) or COMENTARIOS_LIMITE_MAX, COMENTARIOS_LIMITE_MAX)
+
+    try:
+        cursor = _decodificar_cursor_comentario(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'status': 'erro', 'message': 'Cursor inválido.'}), 400
+
+    query = JornadaComentario.query.options(joinedload(JornadaComentario.usuario))\
+        .filter(JornadaComentario.jornada_id == jornada_id)
+    if cursor:
+        query = query.filter(tuple_(JornadaComentario.data_comentario, JornadaComentario.id) > cursor)
+
+    comentarios = query.order_by(JornadaComentario.data_comentario, JornadaComentario.id).limit(limite + 1).all()
+    tem_mais = len(comentarios) > limite
+    comentarios = comentarios[:limite]
+
+    return jsonify({
+        'comentarios': [_serializar_comentario(c) for c in comentarios],
+        'proximo_cursor': _codificar_cursor_comentario(comentarios[-1]) if tem_mais else None,
+    })
+
+
+@jornadas_bp.route('/api/comentario/<int:comentario_id>')
+@login_required
+def api_comentario(comentario_id):
+    """ Um comentário (usado ao receber o evento 'comentario' do stream). """
+    comentario = JornadaComentario.query.options(joinedload(JornadaComentario.usuario)).get_or_404(comentario_id)
+    return jsonify(_serializar_comentario(comentario))
 
 
 @jornadas_bp.route('/api/reagir', methods=['POST'])
 @login_required
 def api_reagir():
-    """ API para adicionar/remover uma reação. """
+    """
+    API para adicionar/remover uma reação.
+    Com 'acao' ('adicionar' ou 'remover') a chamada é idempotente; sem ela, alterna a reação.
+    Cada mudança é um único DELETE ... RETURNING ou INSERT ... ON CONFLICT DO NOTHING
+    (índice único em user_id, jornada_id, tipo_reacao) e o contador da jornada só
+    muda quando uma linha realmente entrou ou saiu, na mesma transação.
+    """
     data = request.json
     jornada_id = data.get('jornada_id')
     tipo_reacao = data.get('tipo_reacao')
-    
-    reacao_existente = JornadaReacao.query.filter_by(user_id=current_user.id, jornada_id=jornada_id, tipo_reacao=tipo_reacao).first()
+    acao = data.get('acao')
 
-    if reacao_existente:
-        db.session.delete(reacao_existente)
-        db.session.commit()
-        return jsonify({'status': 'removido'})
+    if tipo_reacao not in TIPOS_REACAO:
+        return jsonify({'status': 'erro', 'message': 'Tipo de reação inválido.'}), 400
+    if acao not in (None, 'adicionar', 'remover'):
+        return jsonify({'status': 'erro', 'message': "A ação deve ser 'adicionar' ou 'remover'."}), 400
+
+    reacoes = JornadaReacao.__table__
+    jornadas = Jornada.__table__
+    contador = jornadas.c[TIPOS_REACAO[tipo_reacao]]
+    delta = 0
+
+    if acao != 'adicionar':
+        removida = db.session.execute(
+            reacoes.delete()
+            .where(reacoes.c.user_id == current_user.id,
+                   reacoes.c.jornada_id == jornada_id,
+                   reacoes.c.tipo_reacao == tipo_reacao)
+            .returning(reacoes.c.id)
+        ).first()
+        if removida:
+            delta = -1
+
+    status = 'removido'
+    if acao == 'adicionar' or (acao is None and not delta):
+        status = 'adicionado'
+        try:
+            inserida = db.session.execute(
+                pg_insert(reacoes)
+                .values(user_id=current_user.id, jornada_id=jornada_id, tipo_reacao=tipo_reacao)
+                .on_conflict_do_nothing(index_elements=['user_id', 'jornada_id', 'tipo_reacao'])
+                .returning(reacoes.c.id)
+            ).first()
+        except IntegrityError:
+            db.session.rollback()
+            return jsonify({'status': 'erro', 'message': 'Jornada não encontrada.'}), 404
+        if inserida:
+            delta = 1
+
+    if delta:
+        total = db.session.execute(
+            jornadas.update().where(jornadas.c.id == jornada_id)
+            .values({contador: contador + delta})
+            .returning(contador)
+        ).scalar()
+        barramento.publicar('reacoes', {'jornada_id': jornada_id, 'tipo_reacao': tipo_reacao, 'total': total})
     else:
-        nova_reacao = JornadaReacao(user_id=current_user.id, jornada_id=jornada_id, tipo_reacao=tipo_reacao)
-        db.session.add(nova_reacao)
-        db.session.commit()
-        return jsonify({'status': 'adicionado'})
+        total = db.session.execute(select(contador).where(jornadas.c.id == jornada_id)).scalar()
+    db.session.commit()
+
+    return jsonify({'status': status, 'total': total or 0})
 
 @jornadas_bp.route('/api/comentar', methods=['POST'])
 @login_required
 def api_comentar():
-    """ API para adicionar um comentário. """
+    """ API para adicionar um comentário (e incrementar o contador da jornada na mesma transação). """
     data = request.json
     jornada_id = data.get('jornada_id')
     comentario_texto = data.get('comentario')
@@ -163,20 +393,61 @@ def api_comentar():
     if not comentario_texto or not comentario_texto.strip():
         return jsonify({'status': 'erro', 'message': 'Comentário não pode ser vazio.'}), 400
 
+    jornadas = Jornada.__table__
+    comentarios_total = db.session.execute(
+        jornadas.update().where(jornadas.c.id == jornada_id)
+        .values(comentarios_total=jornadas.c.comentarios_total + 1)
+        .returning(jornadas.c.comentarios_total)
+    ).scalar()
+    if comentarios_total is None:
+        db.session.rollback()
+        return jsonify({'status': 'erro', 'message': 'Jornada não encontrada.'}), 404
+
     novo_comentario = JornadaComentario(
         user_id=current_user.id,
         jornada_id=jornada_id,
         comentario=comentario_texto
     )
     db.session.add(novo_comentario)
+    db.session.flush()
+
+    comentario = {
+        'id': novo_comentario.id,
+        'texto': novo_comentario.comentario,
+        'user': current_user.nome,
+        'data': novo_comentario.data_comentario.strftime('%d/%m %H:%M')
+    }
+    # Só ids: o texto não tem limite de tamanho e o cliente busca o comentário em /api/comentario/<id>.
+    barramento.publicar('comentario', {'jornada_id': jornada_id, 'comentario_id': novo_comentario.id,
+                                       'comentarios_total': comentarios_total})
     db.session.commit()
 
     return jsonify({
         'status': 'sucesso',
-        'comentario': {
-            'id': novo_comentario.id,
-            'texto': novo_comentario.comentario,
-            'user': current_user.nome,
-            'data': novo_comentario.data_comentario.strftime('%d/%m %H:%M')
-        }
-    })
\ No newline at end of file
+        'comentarios_total': comentarios_total,
+        'comentario': comentario
+    })
+
+
+# --- MANUTENÇÃO (CLI) ---
+
+@jornadas_bp.cli.command('recalcular-contadores')
+def recalcular_contadores_command():
+    """Reconstrói os contadores de reações e comentários a partir das tabelas base."""
+    reacoes = JornadaReacao.__table__
+    comentarios = JornadaComentario.__table__
+    jornadas = Jornada.__table__
+
+    valores = {
+        coluna: select(func.count(reacoes.c.id))
+            .where(reacoes.c.jornada_id == jornadas.c.id, reacoes.c.tipo_reacao == tipo)
+            .scalar_subquery()
+        for tipo, coluna in TIPOS_REACAO.items()
+    }
+    valores['comentarios_total'] = select(func.count(comentarios.c.id))\
+        .where(comentarios.c.jornada_id == jornadas.c.id)\
+        .scalar_subquery()
+
+    resultado = db.session.execute(jornadas.update().values(valores))
+    db.session.commit()
+    click.echo(f'Contadores recalculados para {resultado.rowcount} jornada(s).')
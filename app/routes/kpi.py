@@ -1,9 +1,21 @@
 # app/routes/kpi.py
-from flask import Blueprint, jsonify, render_template
+import time
+
+import click
+import json
+
+from flask import Blueprint, Response, current_app, jsonify, render_template, request, stream_with_context
 from flask_login import login_required
-from app.models import db, Employees, PromotionLog, Team, TeamMember, User
-from sqlalchemy import func, case, and_, extract
-from datetime import datetime, timedelta
+from app.models import db, Employees, Feedback, PromotionLog, Team, TeamMember, User
+from app.utils.kpi_snapshots import (
+    registrar_kpi, resposta_kpi, atualizar_snapshots, limpar_snapshots_antigos, calcular_kpi,
+    obter_kpis_em_lote, pedido_fresh, KPI_CALCULOS
+)
+from app.utils.kpi_paralelo import obter_kpis_em_paralelo
+from app.utils.sql_counter import contar_queries
+from sqlalchemy import func, case, and_, or_, select, cast, literal_column, true, Date, Numeric
+from sqlalchemy.dialects.postgresql import array
+from datetime import date, datetime, timedelta
 
 kpi_bp = Blueprint('kpi', __name__, url_prefix='/kpis')
 
@@ -19,6 +31,9 @@ def hub():
 
 # =================================================================
 # --- ENDPOINTS DA API 100% BASEADOS NO SEU MODEL.PY ---
+# Cada KPI tem uma função de cálculo registrada no armazém de snapshots
+# (app/utils/kpi_snapshots.py). A rota serve o snapshot mais recente e
+# só recalcula ao vivo se ele não existir, estiver velho ou com ?fresh=1.
 # =================================================================
 
 # -----------------------------------------------------------------
@@ -28,39 +43,59 @@ def hub():
 @login_required
 def api_vital_metrics():
     """Fornece os principais indicadores numéricos da empresa."""
-    active_employees_query = db.session.query(Employees).filter(Employees.status == 'Ativo')
-    headcount = active_employees_query.count()
-    
+    return resposta_kpi('vital-metrics')
+
+@registrar_kpi('vital-metrics')
+def calcular_vital_metrics():
+    """
+    Todos os números vitais em um único SELECT: agregados com FILTER sobre
+    'employees' e o total de desligamentos como subquery escalar.
+    """
     one_year_ago = datetime.now().date() - timedelta(days=365)
+    ativo = Employees.status == 'Ativo'
 
     # CORREÇÃO: Usando TeamMember.data_saida para o cálculo de turnover.
-    terminations_last_12m = db.session.query(TeamMember).filter(
+    terminations_subquery = select(func.count(TeamMember.id))\
+        .where(TeamMember.data_saida >= one_year_ago)\
+        .scalar_subquery()
+
+    # Headcount 1 ano atrás: já tinha entrado e continua ativo ou saiu de um time nos últimos 12 meses.
+    saiu_nos_ultimos_12m = select(TeamMember.id).where(
+        TeamMember.user_id == Employees.user_id,
         TeamMember.data_saida >= one_year_ago
-    ).count()
+    ).exists()
 
-    # Headcount médio: (Headcount atual + Headcount 1 ano atrás) / 2
-    headcount_12m_ago_query = db.session.query(Employees).filter(Employees.data_entrada < one_year_ago)
-    active_at_that_time = headcount_12m_ago_query.filter(
-        (Employees.status == 'Ativo') | 
-        (db.session.query(TeamMember.id).filter(
-            TeamMember.user_id == Employees.user_id,
-            TeamMember.data_saida >= one_year_ago
-        ).exists())
-    ).count()
+    metrics = db.session.execute(
+        select(
+            func.count(Employees.id).filter(ativo).label('headcount'),
+            terminations_subquery.label('terminations_last_12m'),
+            func.count(Employees.id).filter(
+                Employees.data_entrada < one_year_ago,
+                ativo | saiu_nos_ultimos_12m
+            ).label('active_at_that_time'),
+            func.sum(Employees.salario).filter(ativo).label('total_payroll'),
+            # No PostgreSQL 'date - date' devolve o número de dias, então a média chega como Decimal.
+            func.avg(func.current_date() - Employees.data_entrada).filter(ativo).label('avg_tenure_days')
+        ).select_from(Employees)
+    ).one()
+
+    headcount = metrics.headcount
+    terminations_last_12m = metrics.terminations_last_12m
+    active_at_that_time = metrics.active_at_that_time
 
+    # Headcount médio: (Headcount atual + Headcount 1 ano atrás) / 2
     avg_headcount_last_12m = (headcount + active_at_that_time) / 2 if (headcount + active_at_that_time) > 0 else 0
     turnover_rate = (terminations_last_12m / avg_headcount_last_12m) * 100 if avg_headcount_last_12m > 0 else 0
 
-    total_payroll = active_employees_query.with_entities(func.sum(Employees.salario)).scalar() or 0
-    avg_tenure_delta = active_employees_query.with_entities(func.avg(func.current_date() - Employees.data_entrada)).scalar()
-    avg_tenure_months = (avg_tenure_delta.days / 30) if avg_tenure_delta else 0
+    total_payroll = metrics.total_payroll or 0
+    avg_tenure_months = (float(metrics.avg_tenure_days) / 30) if metrics.avg_tenure_days else 0
 
-    return jsonify({
+    return {
         'headcount': {'value': headcount, 'label': 'Colaboradores Ativos'},
         'turnover_rate': {'value': f"{turnover_rate:.1f}%", 'label': 'Turnover Anual'},
         'avg_tenure': {'value': f"{avg_tenure_months:.1f}", 'label': 'Tempo de Casa (Meses)'},
         'total_payroll': {'value': float(total_payroll), 'label': 'Folha Mensal'}
-    })
+    }
 
 # -----------------------------------------------------------------
 # KPI 2: JORNADA DO COLABORADOR (FLUXO DE TALENTOS)
@@ -69,6 +104,10 @@ def api_vital_metrics():
 @login_required
 def api_employee_journey_sankey():
     """Cria dados para um gráfico Sankey mostrando o ciclo de vida completo."""
+    return resposta_kpi('employee-journey-sankey')
+
+@registrar_kpi('employee-journey-sankey')
+def calcular_employee_journey_sankey():
     sankey_data = []
     one_year_ago = datetime.now().date() - timedelta(days=365)
     
@@ -96,7 +135,7 @@ def api_employee_journey_sankey():
     for source, weight in terminations:
         sankey_data.append([str(source), 'Desligamento', weight])
         
-    return jsonify(sankey_data)
+    return sankey_data
 
 # -----------------------------------------------------------------
 # KPI 3: DISTRIBUIÇÃO DE PERFORMANCE
@@ -105,6 +144,10 @@ def api_employee_journey_sankey():
 @login_required
 def api_performance_distribution():
     """Agrupa os colaboradores por faixa de performance."""
+    return resposta_kpi('performance-distribution')
+
+@registrar_kpi('performance-distribution')
+def calcular_performance_distribution():
     rating_band_case = case(
         (Employees.media_feedbacks >= 4.5, 'Excelente'),
         (Employees.media_feedbacks >= 3.5, 'Bom'),
@@ -117,44 +160,91 @@ def api_performance_distribution():
         rating_band_case, func.count(Employees.id)
     ).filter(Employees.status == 'Ativo').group_by('rating_band').order_by(rating_band_case).all()
 
-    return jsonify({'series': [d[1] for d in data], 'labels': [d[0] for d in data]})
+    return {'series': [d[1] for d in data], 'labels': [d[0] for d in data]}
 
 # -----------------------------------------------------------------
 # KPI 4: FLUXO DE PESSOAL (CONTRATAÇÕES VS. DESLIGAMENTOS)
 # -----------------------------------------------------------------
+HEADCOUNT_FLOW_MESES_PADRAO = 6
+HEADCOUNT_FLOW_MESES_MAX = 120
+HEADCOUNT_FLOW_GRANULARIDADES = {'month': '%b/%y', 'week': '%d/%m/%y'}
+
 @kpi_bp.route('/api/headcount-flow')
 @login_required
 def api_headcount_flow():
-    """Fornece dados mensais de contratações e desligamentos."""
-    labels, hires_data, terminations_data = [], [], []
-
-    for i in range(5, -1, -1):
-        target_date = datetime.now().date() - timedelta(days=i * 30)
-        month, year = target_date.month, target_date.year
-        labels.append(target_date.strftime("%b/%y"))
-
-        # CORREÇÃO: Usando TeamMember.data_entrada para contratações.
-        hires_count = db.session.query(func.count(TeamMember.id)).filter(
-            extract('month', TeamMember.data_entrada) == month,
-            extract('year', TeamMember.data_entrada) == year
-        ).scalar()
-        
-        # CORREÇÃO: Usando TeamMember.data_saida para desligamentos.
-        terminations_count = db.session.query(func.count(TeamMember.id)).filter(
-            extract('month', TeamMember.data_saida) == month,
-            extract('year', TeamMember.data_saida) == year
-        ).scalar()
+    """
+    Fornece contratações e desligamentos por período.
+    Parâmetros: ?months=N (janela, padrão 6) e ?granularity=month|week.
+    """
+    months = request.args.get('months', HEADCOUNT_FLOW_MESES_PADRAO, type=int)
+    granularity = request.args.get('granularity', 'month')
+
+    if granularity not in HEADCOUNT_FLOW_GRANULARIDADES:
+        return jsonify({'erro': "granularity deve ser 'month' ou 'week'."}), 400
+    if not months or not (1 <= months <= HEADCOUNT_FLOW_MESES_MAX):
+        return jsonify({'erro': f'months deve estar entre 1 e {HEADCOUNT_FLOW_MESES_MAX}.'}), 400
 
-        hires_data.append(hires_count)
-        terminations_data.append(terminations_count)
+    # Só a janela padrão tem snapshot (atualizado pelo job); as demais são calculadas ao vivo.
+    if months == HEADCOUNT_FLOW_MESES_PADRAO and granularity == 'month':
+        return resposta_kpi('headcount-flow')
+    return resposta_kpi('headcount-flow', months=months, granularity=granularity)
 
-    return jsonify({
-        'labels': labels,
+@registrar_kpi('headcount-flow')
+def calcular_headcount_flow(months=HEADCOUNT_FLOW_MESES_PADRAO, granularity='month'):
+    """
+    Série completa em uma única query: um calendário gerado com generate_series
+    e duas agregações por date_trunc, filtradas por intervalo de datas (usam índice
+    em data_entrada/data_saida, ao contrário de extract(month)/extract(year)).
+    """
+    hoje = datetime.now().date()
+    primeiro_mes = hoje.replace(day=1)
+    ano, mes = divmod(primeiro_mes.year * 12 + primeiro_mes.month - 1 - (months - 1), 12)
+    inicio = date(ano, mes + 1, 1)
+    if granularity == 'week':
+        inicio -= timedelta(days=inicio.weekday())
+
+    # 'granularity' vem de uma lista fechada, então pode ir literal no SQL
+    # (o GROUP BY precisa da mesma expressão date_trunc do SELECT).
+    unidade = literal_column(f"'{granularity}'")
+    passo = literal_column(f"interval '1 {granularity}'")
+
+    calendario = select(
+        func.generate_series(
+            func.date_trunc(unidade, cast(inicio, Date)),
+            func.date_trunc(unidade, func.current_date()),
+            passo
+        ).label('periodo')
+    ).subquery('calendario')
+
+    entradas = select(
+        func.date_trunc(unidade, TeamMember.data_entrada).label('periodo'),
+        func.count(TeamMember.id).label('total')
+    ).where(TeamMember.data_entrada >= inicio).group_by(literal_column('1')).subquery('entradas')
+
+    saidas = select(
+        func.date_trunc(unidade, TeamMember.data_saida).label('periodo'),
+        func.count(TeamMember.id).label('total')
+    ).where(TeamMember.data_saida >= inicio).group_by(literal_column('1')).subquery('saidas')
+
+    rows = db.session.execute(
+        select(
+            calendario.c.periodo,
+            func.coalesce(entradas.c.total, 0),
+            func.coalesce(saidas.c.total, 0)
+        )
+        .outerjoin(entradas, entradas.c.periodo == calendario.c.periodo)
+        .outerjoin(saidas, saidas.c.periodo == calendario.c.periodo)
+        .order_by(calendario.c.periodo)
+    ).all()
+
+    formato = HEADCOUNT_FLOW_GRANULARIDADES[granularity]
+    return {
+        'labels': [periodo.strftime(formato) for periodo, _, _ in rows],
         'series': [
-            {'name': 'Contratações', 'data': hires_data},
-            {'name': 'Desligamentos', 'data': terminations_data}
+            {'name': 'Contratações', 'data': [hires for _, hires, _ in rows]},
+            {'name': 'Desligamentos', 'data': [terminations for _, _, terminations in rows]}
         ]
-    })
+    }
 
 # -----------------------------------------------------------------
 # KPI 5: PERFORMANCE MÉDIA POR EQUIPE
@@ -163,6 +253,10 @@ def api_headcount_flow():
 @login_required
 def api_performance_by_team():
     """Calcula a média de performance para cada equipe."""
+    return resposta_kpi('performance-by-team')
+
+@registrar_kpi('performance-by-team')
+def calcular_performance_by_team():
     query = db.session.query(
         Team.nome, func.avg(Employees.media_feedbacks)
     ).join(TeamMember, Team.id == TeamMember.team_id)\
@@ -173,7 +267,213 @@ def api_performance_by_team():
      .order_by(func.avg(Employees.media_feedbacks).desc())\
      .all()
 
-    return jsonify({
+    return {
         'series': [{'data': [round(float(d[1] or 0), 2) for d in query]}],
         'labels': [d[0] for d in query]
-    })
\ No newline at end of file
+    }
+
+# -----------------------------------------------------------------
+# KPI 6: QUALIDADES E DEFEITOS MAIS CITADOS POR EQUIPE (Feedback.kpis)
+# -----------------------------------------------------------------
+FEEDBACK_KPIS_MESES_PADRAO = 6
+FEEDBACK_KPIS_MESES_MAX = 36
+FEEDBACK_KPIS_TOP_PADRAO = 5
+FEEDBACK_KPIS_TOP_MAX = 20
+FEEDBACK_KPIS_TIPOS = ('qualidades', 'defeitos')
+
+@kpi_bp.route('/api/feedback-kpis')
+@login_required
+def api_feedback_kpis():
+    """
+    Qualidades e defeitos mais citados nos feedbacks de cada equipe, com o nível médio.
+    Parâmetros: ?months=N (janela, padrão 6), ?top=N (itens por tipo, padrão 5) e ?team_id=.
+    """
+    months = request.args.get('months', FEEDBACK_KPIS_MESES_PADRAO, type=int)
+    top = request.args.get('top', FEEDBACK_KPIS_TOP_PADRAO, type=int)
+    team_id = request.args.get('team_id', type=int)
+
+    if not months or not (1 <= months <= FEEDBACK_KPIS_MESES_MAX):
+        return jsonify({'erro': f'months deve estar entre 1 e {FEEDBACK_KPIS_MESES_MAX}.'}), 400
+    if not top or not (1 <= top <= FEEDBACK_KPIS_TOP_MAX):
+        return jsonify({'erro': f'top deve estar entre 1 e {FEEDBACK_KPIS_TOP_MAX}.'}), 400
+
+    # Só a janela padrão tem snapshot (atualizado pelo job); as demais são calculadas ao vivo.
+    if months == FEEDBACK_KPIS_MESES_PADRAO and top == FEEDBACK_KPIS_TOP_PADRAO and team_id is None:
+        return resposta_kpi('feedback-kpis')
+    params = {'months': months, 'top': top}
+    if team_id is not None:
+        params['team_id'] = team_id
+    return resposta_kpi('feedback-kpis', **params)
+
+@registrar_kpi('feedback-kpis')
+def calcular_feedback_kpis(months=FEEDBACK_KPIS_MESES_PADRAO, top=FEEDBACK_KPIS_TOP_PADRAO, team_id=None):
+    """
+    Agregação inteira no banco: jsonb_each abre {'qualidades': {...}, 'defeitos': {...}}
+    em (tipo, nome, nível) e o ranking por equipe sai de row_number() sobre o GROUP BY.
+    O filtro 'kpis ?| array[...]' usa o índice GIN de feedbacks.kpis. O feedback conta
+    para as equipes de que o funcionário fazia parte na data do feedback.
+    """
+    inicio = datetime.now().date() - timedelta(days=30 * months)
+
+    grupo = func.jsonb_each(Feedback.kpis).table_valued('key', 'value').lateral('grupo')
+    # Guarda contra dados fora do formato (ex.: "qualidades": null): jsonb_each só aceita objeto.
+    mapa = case((func.jsonb_typeof(grupo.c.value) == 'object', grupo.c.value), else_=func.jsonb_build_object())
+    item = func.jsonb_each(mapa).table_valued('key', 'value').lateral('item')
+
+    media = func.avg(cast(item.c.value, Numeric))
+    ocorrencias = func.count()
+    membro_na_data = and_(
+        TeamMember.user_id == Employees.user_id,
+        TeamMember.data_entrada <= Feedback.data_feedback,
+        or_(TeamMember.data_saida.is_(None), TeamMember.data_saida >= Feedback.data_feedback)
+    )
+
+    agregado = select(
+        Team.id.label('team_id'),
+        Team.nome.label('time'),
+        grupo.c.key.label('tipo'),
+        item.c.key.label('nome'),
+        media.label('media'),
+        ocorrencias.label('ocorrencias'),
+        func.row_number().over(
+            partition_by=(Team.id, grupo.c.key),
+            order_by=(ocorrencias.desc(), media.desc(), item.c.key)
+        ).label('posicao')
+    ).select_from(Feedback)\
+     .join(Employees, Employees.id == Feedback.employee_id)\
+     .join(TeamMember, membro_na_data)\
+     .join(Team, Team.id == TeamMember.team_id)\
+     .join(grupo, true())\
+     .join(item, true())\
+     .where(
+        Feedback.kpis.has_any(array(FEEDBACK_KPIS_TIPOS)),
+        Feedback.data_feedback >= inicio,
+        grupo.c.key.in_(FEEDBACK_KPIS_TIPOS),
+        func.jsonb_typeof(item.c.value) == 'number'
+     )\
+     .group_by(Team.id, Team.nome, grupo.c.key, item.c.key)
+    if team_id is not None:
+        agregado = agregado.where(Team.id == team_id)
+    agregado = agregado.subquery('agregado')
+
+    rows = db.session.execute(
+        select(agregado)
+        .where(agregado.c.posicao <= top)
+        .order_by(agregado.c.time, agregado.c.team_id, agregado.c.tipo, agregado.c.posicao)
+    ).all()
+
+    times = {}
+    for row in rows:
+        time = times.setdefault(row.team_id, {'team_id': row.team_id, 'time': row.time,
+                                              **{tipo: [] for tipo in FEEDBACK_KPIS_TIPOS}})
+        time[row.tipo].append({'nome': row.nome, 'media': round(float(row.media), 2),
+                               'ocorrencias': row.ocorrencias})
+    return {'janela_meses': months, 'desde': inicio.isoformat(), 'times': list(times.values())}
+
+# -----------------------------------------------------------------
+# LOTE: VÁRIOS KPIS EM UMA ÚNICA REQUISIÇÃO
+# -----------------------------------------------------------------
+# Apelido usado pelo hub -> nome do KPI registrado
+WIDGETS_LOTE = {
+    'vital': 'vital-metrics',
+    'sankey': 'employee-journey-sankey',
+    'perf': 'performance-distribution',
+    'flow': 'headcount-flow',
+    'team': 'performance-by-team',
+    'kpis': 'feedback-kpis',
+}
+
+@kpi_bp.route('/api/batch')
+@login_required
+def api_batch():
+    """
+    Calcula os widgets pedidos em ?widgets=vital,sankey,perf,flow,team,kpis numa única
+    requisição, todos sobre o mesmo snapshot do banco. Com KPI_LOTE_PARALELO os
+    KPIs rodam em paralelo no pool de workers, cada um com seu timeout.
+    Com ?stream=1 (ou Accept: application/x-ndjson) a resposta é NDJSON, uma
+    linha por widget assim que ele fica pronto.
+    """
+    pedidos = [w.strip() for w in request.args.get('widgets', ','.join(WIDGETS_LOTE)).split(',') if w.strip()]
+    invalidos = [w for w in pedidos if w not in WIDGETS_LOTE]
+    if invalidos:
+        return jsonify({'erro': f"Widgets desconhecidos: {', '.join(invalidos)}"}), 400
+
+    apelidos = {WIDGETS_LOTE[w]: w for w in pedidos}
+    if current_app.config.get('KPI_LOTE_PARALELO'):
+        lote = obter_kpis_em_paralelo(list(apelidos), forcar=pedido_fresh())
+    else:
+        lote = obter_kpis_em_lote(list(apelidos), forcar=pedido_fresh())
+
+    stream = request.args.get('stream', '').lower() in ('1', 'true', 'sim') \
+        or request.accept_mimetypes.best == 'application/x-ndjson'
+    if not stream:
+        return jsonify({apelidos[nome]: resultado for nome, resultado in lote})
+
+    def gerar_linhas():
+        for nome, resultado in lote:
+            yield json.dumps({'widget': apelidos[nome], **resultado}) + '\n'
+
+    response = Response(stream_with_context(gerar_linhas()), mimetype='application/x-ndjson')
+    # Evita que proxies (nginx) segurem a resposta até o fim do lote.
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.cache_control.no_cache = True
+    return response
+
+# =================================================================
+# JOB DE ATUALIZAÇÃO DOS SNAPSHOTS (CLI)
+#   flask kpi atualizar                -> recalcula todos os KPIs uma vez
+#   flask kpi atualizar --intervalo 900 -> fica em loop (processo 'clock'/cron)
+# =================================================================
+
+@kpi_bp.cli.command('atualizar')
+@click.option('--kpi', 'nomes', multiple=True, help='KPI a recalcular (padrão: todos).')
+@click.option('--intervalo', type=int, default=0, help='Segundos entre execuções; 0 roda uma única vez.')
+@click.option('--manter-dias', type=int, default=30, help='Dias de histórico de snapshots a manter.')
+def atualizar_snapshots_command(nomes, intervalo, manter_dias):
+    """Recalcula os snapshots dos KPIs do hub."""
+    invalidos = set(nomes) - set(KPI_CALCULOS)
+    if invalidos:
+        raise click.BadParameter(f"KPIs desconhecidos: {', '.join(sorted(invalidos))}", param_hint='--kpi')
+
+    while True:
+        for nome, gerado_em in atualizar_snapshots(list(nomes) or None):
+            click.echo(f'{gerado_em:%Y-%m-%d %H:%M:%S} {nome} atualizado')
+        removidos = limpar_snapshots_antigos(manter_dias)
+        if removidos:
+            click.echo(f'{removidos} snapshot(s) antigos removidos')
+        if not intervalo:
+            break
+        time.sleep(intervalo)
+
+# Número máximo de statements SQL que cada cálculo pode emitir. Conferido por
+# tests/test_kpi_queries.py e pelo comando 'flask kpi verificar-queries' (exit 1
+# se algum KPI voltar a fazer N queries).
+KPI_ORCAMENTO_QUERIES = {
+    'vital-metrics': 1,
+    'employee-journey-sankey': 3,
+    'performance-distribution': 1,
+    'headcount-flow': 1,
+    'performance-by-team': 1,
+    'feedback-kpis': 1,
+}
+
+def medir_queries_kpi(nome):
+    """Número de statements SQL emitidos pelo cálculo ao vivo do KPI."""
+    with contar_queries(*db.engines.values()) as contador:
+        calcular_kpi(nome)
+    return contador.total
+
+@kpi_bp.cli.command('verificar-queries')
+def verificar_queries_command():
+    """Confere o número de queries de cada KPI contra o orçamento."""
+    estourados = []
+    for nome in KPI_CALCULOS:
+        total = medir_queries_kpi(nome)
+        limite = KPI_ORCAMENTO_QUERIES.get(nome)
+        ok = limite is None or total <= limite
+        click.echo(f"[{'ok' if ok else 'ERRO'}] {nome}: {total} queries (limite {limite})")
+        if not ok:
+            estourados.append(nome)
+
+    if estourados:
+        raise SystemExit(1)
@@ -0,0 +1,48 @@
+# app/routes/metricas.py
+import hmac
+import urllib.request
+
+import click
+from flask import Blueprint, Response, abort, current_app, request
+
+from app.utils.metricas import gerar_exposicao, registro, validar_exposicao
+
+metricas_bp = Blueprint('metricas', __name__)
+
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+@metricas_bp.route('/metrics')
+def metricas():
+    """Métricas de todos os workers no formato de exposição do Prometheus."""
+    token = current_app.config.get('METRICAS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        abort(401)
+    return Response(gerar_exposicao(registro.estados()), content_type=TIPO_CONTEUDO)
+
+
+@metricas_bp.cli.command('verificar')
+@click.option('--url', default=None, help='Endpoint de um servidor rodando (ex.: http://localhost:8000/metrics). '
+                                           'Sem ele, usa o test client desta aplicação.')
+@click.option('--token', default=None, help='Bearer token, se METRICAS_TOKEN estiver definido.')
+def verificar_command(url, token):
+    """Faz o scrape de /metrics e valida a saída como o Prometheus faria."""
+    cabecalhos = {'Authorization': f'Bearer {token}'} if token else {}
+    if url:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=cabecalhos), timeout=10) as resposta:
+            tipo, texto = resposta.headers.get('Content-Type', ''), resposta.read().decode('utf-8')
+    else:
+        resposta = current_app.test_client().get('/metrics', headers=cabecalhos)
+        if resposta.status_code != 200:
+            click.echo(f'[ERRO] /metrics respondeu {resposta.status_code}')
+            raise SystemExit(1)
+        tipo, texto = resposta.content_type, resposta.get_data(as_text=True)
+
+    erros, familias, series = validar_exposicao(texto)
+    if not tipo.startswith('text/plain'):
+        erros.insert(0, f'Content-Type inesperado: {tipo}')
+    for erro in erros:
+        click.echo(f'[ERRO] {erro}')
+    click.echo(f"[{'ok' if not erros else 'ERRO'}] {familias} métricas, {series} séries")
+    if erros:
+        raise SystemExit(1)
@@ -5,13 +5,17 @@ from flask_login import login_required, current_user
 # Importe o modelo User junto com os outros
 from app.models import db, Milestone, Employees, Team, User
 from datetime import date
+from sqlalchemy.orm import joinedload
 
 milestones_bp = Blueprint('milestones', __name__, url_prefix='/milestones')
 
 @milestones_bp.route('/')
 @login_required
 def list_milestones():
-    milestones = Milestone.query.order_by(Milestone.milestone_date.desc()).all()
+    milestones = Milestone.query.options(
+        joinedload(Milestone.employee).joinedload(Employees.user),
+        joinedload(Milestone.team),
+    ).order_by(Milestone.milestone_date.desc()).all()
     return render_template('gestor/milestones_list.html', milestones=milestones)
 
 @milestones_bp.route('/add', methods=['GET', 'POST'])
@@ -34,12 +38,10 @@ def add_milestone():
         flash('Marco criado com sucesso!', 'success')
         return redirect(url_for('milestones.list_milestones'))
 
-    # CORREÇÃO AQUI: Use join para ordenar pelo nome do User
-    employees = db.session.query(Employees).join(User).filter(Employees.active==True).order_by(User.nome).all()
+    # Os funcionários do select vêm sob demanda de /funcionarios/api/search
     teams = Team.query.filter_by(status='ativo').order_by(Team.nome).all()
     
     return render_template('gestor/milestones_form.html',
-                           employees=employees,
                            teams=teams,
                            today=date.today().isoformat())
 
@@ -61,13 +63,10 @@ def edit_milestone(milestone_id):
         flash('Marco atualizado com sucesso!', 'info')
         return redirect(url_for('milestones.list_milestones'))
 
-    # CORREÇÃO AQUI TAMBÉM: Use join para ordenar pelo nome do User
-    employees = db.session.query(Employees).join(User).filter(Employees.active==True).order_by(User.nome).all()
     teams = Team.query.filter_by(status='ativo').order_by(Team.nome).all()
     
     return render_template('gestor/milestones_form.html',
                            milestone=milestone,
-                           employees=employees,
                            teams=teams,
                            today=date.today().isoformat())
 
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from datetime import date
 from app.models import Employees, PromotionLog
 from app.extensions import db
+from app.utils.listagem import renderizar_listagem
 
 promocoes_bp = Blueprint('promocoes', __name__, url_prefix='/promocoes')
 
@@ -19,8 +20,8 @@ def parse_salario(valor_str):
 @login_required
 def lista_funcionarios():
     # ❗ CORREÇÃO: Lista apenas funcionários ativos.
-    funcionarios = Employees.query.filter_by(active=True).all()
-    return render_template('gestor/promocoes.html', funcionarios=funcionarios)
+    return renderizar_listagem('gestor/promocoes.html', 'gestor/_promocoes_lista.html',
+                               fixos={'status': 'ativo'})
 
 # ✨ Rota de promover funcionário (COM VALIDAÇÃO DE ATIVO)
 @promocoes_bp.route('/<int:funcionario_id>/promover', methods=['GET', 'POST'])
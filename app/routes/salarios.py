@@ -1,8 +1,11 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
-from app.models import db, User, Employees, SalaryAdjustmentLog, PromotionLog
+from app.models import db, User, Employees, SalaryAdjustmentLog
 from datetime import date
 from decimal import Decimal
+from sqlalchemy.orm import joinedload
+from app.utils.listagem import renderizar_listagem
+from app.utils.historico_remuneracao import painel_remuneracao
 
 salarios_bp = Blueprint('salarios', __name__, url_prefix='/salarios')
 
@@ -10,53 +13,32 @@ salarios_bp = Blueprint('salarios', __name__, url_prefix='/salarios')
 @login_required
 def index():
     # ❗ CORREÇÃO: Lista apenas funcionários ativos.
-    funcionarios = db.session.query(Employees).join(User).filter(Employees.active == True).order_by(User.nome).all()
-    return render_template('salarios/lista_funcionarios.html', funcionarios=funcionarios)
+    return renderizar_listagem('salarios/lista_funcionarios.html', 'salarios/_lista_funcionarios.html',
+                               fixos={'status': 'ativo'})
 
 @salarios_bp.route('/painel/<int:employee_id>')
 @login_required
 def painel_financeiro(employee_id):
-    employee = Employees.query.get_or_404(employee_id)
+    employee = Employees.query.options(joinedload(Employees.user)).get_or_404(employee_id)
 
     # ❗ VALIDAÇÃO: Impede o acesso ao painel de funcionário inativo.
     if not employee.active:
         flash('Não é possível acessar o painel de um funcionário inativo.', 'danger')
         return redirect(url_for('salarios.index'))
 
-    promocoes = PromotionLog.query.filter_by(employee_id=employee.id).all()
-    ajustes = SalaryAdjustmentLog.query.filter_by(employee_id=employee.id).all()
-    
-    linha_do_tempo = []
-    # ... (lógica da linha do tempo continua a mesma)
-    for p in promocoes:
-        linha_do_tempo.append({
-            'data': p.data_promocao,
-            'evento': f'Promoção para {p.novo_cargo}',
-            'salario_anterior': p.salario_anterior,
-            'salario_novo': p.salario_novo,
-            'motivo': p.motivo
-        })
-
-    for a in ajustes:
-        linha_do_tempo.append({
-            'data': a.data_ajuste,
-            'evento': f'Ajuste por {a.tipo_ajuste}',
-            'salario_anterior': a.salario_anterior,
-            'salario_novo': a.salario_novo,
-            'motivo': a.motivo
-        })
-
-    linha_do_tempo.sort(key=lambda x: x['data'], reverse=True)
-    
-    eventos_ordenados_grafico = sorted(linha_do_tempo, key=lambda x: x['data'])
-    chart_labels = [item['data'].strftime('%d/%m/%Y') for item in eventos_ordenados_grafico]
-    chart_data = [float(item['salario_novo']) for item in eventos_ordenados_grafico]
+    pagina = request.args.get('pagina', 1, type=int)
+    paginacao, serie = painel_remuneracao(employee.id, pagina=pagina)
+
+    def url_da_pagina(numero):
+        return url_for('salarios.painel_financeiro', employee_id=employee.id, pagina=numero)
 
     return render_template('salarios/painel_financeiro.html',
                            employee=employee,
-                           linha_do_tempo=linha_do_tempo,
-                           chart_labels=chart_labels,
-                           chart_data=chart_data)
+                           linha_do_tempo=paginacao.items,
+                           paginacao=paginacao,
+                           url_da_pagina=url_da_pagina,
+                           chart_labels=serie['labels'],
+                           chart_data=serie['data'])
 
 @salarios_bp.route('/ajuste/novo/<int:employee_id>', methods=['GET', 'POST'])
 @login_required
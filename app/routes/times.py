@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, redirect, url_for, request, flash
 from flask_login import login_required
 from datetime import date
+import click
+from sqlalchemy.orm import joinedload, selectinload, contains_eager
+from app.utils.equipes import encerrar_vinculos_inativos
 
 # Importando os modelos necessários do banco de dados
 from app.models import db, User, Team, TeamMember, Employees
@@ -13,7 +16,7 @@ times_bp = Blueprint('times', __name__, url_prefix='/times')
 @times_bp.route('/')
 @login_required
 def times_list():
-    times = Team.query.all()
+    times = Team.query.options(joinedload(Team.gestor), selectinload(Team.membros)).all()
     return render_template('gestor/times.html', times=times)
 
 
@@ -47,29 +50,24 @@ def criar_time():
     gestores_ativos = User.query.join(Employees).filter(Employees.active == True).all()
     return render_template('gestor/criar_time.html', gestores=gestores_ativos)
 
-# 🧠 Detalhes do time (COM LÓGICA DE ATUALIZAÇÃO)
+# 🧠 Detalhes do time
 @times_bp.route('/<int:time_id>/detalhes')
 @login_required
 def detalhes_time(time_id):
-    time = Team.query.get_or_404(time_id)
-    
-    # Lista para armazenar apenas os membros que estão realmente ativos
-    membros_ativos_para_exibir = []
-
-    # Itera sobre todos os membros que ainda constam como ativos no time
-    for membro in time.membros:
-        if membro.status == 'ativo':
-            # Busca o registro correspondente na tabela de funcionários
-            funcionario = Employees.query.filter_by(user_id=membro.user_id).first()
-
-            # Se o funcionário foi demitido (inativo), atualiza o registro do time
-            if funcionario and not funcionario.active:
-                membro.status = 'inativo'
-                membro.data_saida = date.today()
-                db.session.commit()
-            else:
-                # Se o funcionário está ativo, adiciona à lista para exibição
-                membros_ativos_para_exibir.append(membro)
+    time = Team.query.options(joinedload(Team.gestor)).get_or_404(time_id)
+
+    # Membros ativos numa única query, já com o usuário e o cadastro de funcionário.
+    # Vínculos de quem foi desligado ficam de fora da tela; o encerramento deles é
+    # feito na demissão ou pelo job 'flask times encerrar-vinculos'.
+    membros_ativos_para_exibir = TeamMember.query\
+        .join(TeamMember.user)\
+        .outerjoin(Employees, Employees.user_id == TeamMember.user_id)\
+        .options(contains_eager(TeamMember.user))\
+        .filter(TeamMember.team_id == time_id,
+                TeamMember.status == 'ativo',
+                db.or_(Employees.id.is_(None), Employees.active == True))\
+        .order_by(User.nome)\
+        .all()
 
     return render_template('gestor/detalhes_time.html', time=time, membros=membros_ativos_para_exibir)
 
@@ -109,9 +107,8 @@ def adicionar_membro(time_id):
         flash('Funcionário adicionado ao time!', 'success')
         return redirect(url_for('times.detalhes_time', time_id=time_id))
 
-    # ❗ FILTRO: Mostra apenas funcionários ativos na lista de seleção
-    funcionarios_ativos = Employees.query.filter_by(active=True).all()
-    return render_template('gestor/adicionar_membro.html', time=time, funcionarios=funcionarios_ativos)
+    # ❗ FILTRO: o select busca só funcionários ativos, sob demanda (/funcionarios/api/search)
+    return render_template('gestor/adicionar_membro.html', time=time)
 
 
 # ✏️ Editar time
@@ -129,8 +126,7 @@ def editar_time(time_id):
         flash('Time atualizado com sucesso!', 'success')
         return redirect(url_for('times.times_list'))
 
-    gestores = User.query.all()
-    return render_template('gestor/editar_time.html', time=time, gestores=gestores)
+    return render_template('gestor/editar_time.html', time=time)
 
 
 # 🗑️ Remover membro do time (Lógica atualizada para soft delete)
@@ -157,4 +153,12 @@ def deletar_time(time_id):
     db.session.delete(time)
     db.session.commit()
     flash('Time deletado com sucesso!', 'success')
-    return redirect(url_for('times.times_list'))
\ No newline at end of file
+    return redirect(url_for('times.times_list'))
+
+
+@times_bp.cli.command('encerrar-vinculos')
+def encerrar_vinculos_command():
+    """Encerra os vínculos de time ainda ativos de funcionários desligados."""
+    total = encerrar_vinculos_inativos()
+    db.session.commit()
+    click.echo(f'{total} vínculos encerrados.')
@@ -0,0 +1,80 @@
+// static/js/busca_funcionarios.js
+// Select de funcionário com busca sob demanda: em vez de embutir todos os
+// funcionários no HTML, cada <select data-busca-funcionarios> ganha um campo de
+// busca e carrega as opções de /funcionarios/api/search conforme se digita.
+//
+//   data-url     -> URL da API de busca
+//   data-valor   -> campo usado como value da opção: 'employee_id' (padrão) ou 'user_id'
+//   data-escopo  -> ativos (padrão) | disponiveis | todos
+(function () {
+    function debounce(fn, ms) {
+        let espera = null;
+        return (...args) => {
+            clearTimeout(espera);
+            espera = setTimeout(() => fn(...args), ms);
+        };
+    }
+
+    function rotulo(item) {
+        const extra = item.cargo || item.email;
+        return extra ? `${item.nome} (${extra})` : item.nome;
+    }
+
+    function iniciar(select) {
+        const campoValor = select.dataset.valor || 'employee_id';
+        const escopo = select.dataset.escopo || 'ativos';
+        // Primeira opção vazia ("Selecione...", "-- Nenhum --") e a já selecionada ficam sempre.
+        const opcaoVazia = select.querySelector('option[value=""]');
+
+        const busca = document.createElement('input');
+        busca.type = 'search';
+        busca.className = 'form-control form-control-sm mb-1';
+        busca.placeholder = 'Buscar por nome, e-mail ou cargo...';
+        busca.autocomplete = 'off';
+        busca.setAttribute('aria-label', 'Buscar funcionário');
+        select.parentNode.insertBefore(busca, select);
+
+        let controller = null;
+        let carregado = false;
+
+        async function carregar(termo) {
+            if (controller) controller.abort();
+            controller = new AbortController();
+            const url = new URL(select.dataset.url, window.location.origin);
+            url.searchParams.set('q', termo);
+            url.searchParams.set('escopo', escopo);
+            try {
+                const response = await fetch(url, { signal: controller.signal, headers: { 'Accept': 'application/json' } });
+                if (!response.ok) return;
+                const { itens } = await response.json();
+                preencher(itens);
+                carregado = true;
+            } catch (error) {
+                if (error.name !== 'AbortError') console.error('Falha na busca de funcionários:', error);
+            }
+        }
+
+        function preencher(itens) {
+            const selecionada = select.selectedOptions[0];
+            const valorAtual = select.value;
+            select.innerHTML = '';
+            if (opcaoVazia) select.appendChild(opcaoVazia);
+            if (valorAtual && selecionada) select.appendChild(selecionada);
+            itens.forEach((item) => {
+                const valor = String(item[campoValor]);
+                if (valor === valorAtual) return;
+                select.appendChild(new Option(rotulo(item), valor));
+            });
+            select.value = valorAtual;
+        }
+
+        busca.addEventListener('input', debounce(() => carregar(busca.value.trim()), 250));
+        // Carrega a primeira leva só quando o usuário interage com o campo.
+        const primeiraCarga = () => { if (!carregado) carregar(busca.value.trim()); };
+        busca.addEventListener('focus', primeiraCarga);
+        select.addEventListener('focus', primeiraCarga);
+        select.addEventListener('mousedown', primeiraCarga);
+    }
+
+    document.querySelectorAll('select[data-busca-funcionarios]').forEach(iniciar);
+})();
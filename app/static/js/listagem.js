@@ -0,0 +1,60 @@
+// static/js/listagem.js
+// Filtros e paginação das listagens de funcionários sem recarregar a página:
+// busca '?parcial=1' (só as linhas + paginação) e troca o conteúdo de [data-listagem].
+(function () {
+    const container = document.querySelector('[data-listagem]');
+    const form = document.querySelector('[data-listagem-form]');
+    if (!container) return;
+
+    let controller = null;
+
+    async function carregar(url, empilhar = true) {
+        const alvo = new URL(url, window.location.href);
+        const parcial = new URL(alvo);
+        parcial.searchParams.set('parcial', '1');
+
+        if (controller) controller.abort();
+        controller = new AbortController();
+        container.classList.add('opacity-50');
+        try {
+            const response = await fetch(parcial, { signal: controller.signal, headers: { 'Accept': 'text/html' } });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            container.innerHTML = await response.text();
+            if (empilhar) history.pushState(null, '', alvo);
+        } catch (error) {
+            if (error.name !== 'AbortError') window.location.href = alvo;
+        } finally {
+            container.classList.remove('opacity-50');
+        }
+    }
+
+    function urlDoFormulario() {
+        const params = new URLSearchParams();
+        new FormData(form).forEach((valor, chave) => { if (valor) params.set(chave, valor); });
+        return `${window.location.pathname}?${params}`;
+    }
+
+    container.addEventListener('click', (event) => {
+        const link = event.target.closest('a[data-listagem-link]');
+        if (!link || link.closest('.disabled')) return;
+        event.preventDefault();
+        carregar(link.href);
+        container.scrollIntoView({ behavior: 'smooth', block: 'start' });
+    });
+
+    if (form) {
+        let espera = null;
+        form.addEventListener('submit', (event) => {
+            event.preventDefault();
+            carregar(urlDoFormulario());
+        });
+        form.addEventListener('change', () => carregar(urlDoFormulario()));
+        form.addEventListener('input', (event) => {
+            if (event.target.name !== 'q') return;
+            clearTimeout(espera);
+            espera = setTimeout(() => carregar(urlDoFormulario()), 300);
+        });
+    }
+
+    window.addEventListener('popstate', () => window.location.reload());
+})();
@@ -19,9 +19,11 @@ document.addEventListener('DOMContentLoaded', function () {
         legend: { labels: { colors: '#888' } }
     };
 
+    // Cada widget monta seu container no grid e devolve a função que desenha os dados.
+    // Os dados de todos chegam juntos pelo endpoint em lote (/kpis/api/batch).
     const widgetFactory = {
-        vitalMetrics: (grid, pos, apiUrl) => {
-            fetch(apiUrl).then(res => res.json()).then(data => {
+        vitalMetrics: (grid, pos) => {
+            return (data) => {
                 let cards = '';
                 Object.values(data).forEach(item => {
                     let value = (typeof item.value === 'number' && item.label.includes('Mensal')) 
@@ -34,64 +36,117 @@ document.addEventListener('DOMContentLoaded', function () {
                 });
                 const content = `<div class="widget-header">Indicadores-Chave</div><div class="widget-body row">${cards}</div>`;
                 grid.addWidget({ ...pos, content, id: 'kpi-widget' });
-            });
+            };
         },
-        headcountFlow: (grid, pos, apiUrl) => {
+        headcountFlow: (grid, pos) => {
             const chartId = "headcount-flow-chart";
             const content = `<div class="widget-header">Fluxo de Pessoal (Últimos 6 Meses)</div><div class="widget-body"><div id="${chartId}"></div></div>`;
             grid.addWidget({ ...pos, content, id: 'headcount-flow-widget' });
-            fetch(apiUrl).then(res => res.json()).then(data => {
+            return (data) => {
                 new ApexCharts(document.querySelector(`#${chartId}`), {
                     ...commonChartOptions, chart: { type: 'bar', stacked: false, ...commonChartOptions.chart }, colors: [chartColors[2], chartColors[3]],
                     series: data.series, xaxis: { categories: data.labels }, plotOptions: { bar: { horizontal: false, columnWidth: '60%' } },
                     legend: { position: 'top', horizontalAlign: 'right' }
                 }).render();
-            });
+            };
         },
-        performanceDistribution: (grid, pos, apiUrl) => {
+        performanceDistribution: (grid, pos) => {
             const chartId = "performance-chart";
             const content = `<div class="widget-header">Distribuição de Performance</div><div class="widget-body"><div id="${chartId}"></div></div>`;
             grid.addWidget({ ...pos, content, id: 'performance-widget' });
-            fetch(apiUrl).then(res => res.json()).then(data => {
+            return (data) => {
                 new ApexCharts(document.querySelector(`#${chartId}`), {
                     ...commonChartOptions, chart: { type: 'donut', ...commonChartOptions.chart }, colors: chartColors,
                     series: data.series, labels: data.labels, legend: { position: 'bottom' },
                 }).render();
-            });
+            };
         },
-        performanceByTeam: (grid, pos, apiUrl) => {
+        performanceByTeam: (grid, pos) => {
             const chartId = "team-performance-chart";
             const content = `<div class="widget-header">Performance Média por Equipe</div><div class="widget-body"><div id="${chartId}"></div></div>`;
             grid.addWidget({ ...pos, content, id: 'team-performance-widget' });
-            fetch(apiUrl).then(res => res.json()).then(data => {
+            return (data) => {
                 new ApexCharts(document.querySelector(`#${chartId}`), {
                     ...commonChartOptions, chart: { type: 'bar', ...commonChartOptions.chart }, colors: [chartColors[0]],
                     series: data.series, xaxis: { categories: data.labels }, plotOptions: { bar: { horizontal: true, barHeight: '60%', distributed: true } },
                     legend: { show: false }, grid: { xaxis: { lines: { show: true } } }
                 }).render();
-            });
+            };
         },
-        employeeJourney: (grid, pos, apiUrl) => {
+        feedbackKpis: (grid, pos) => {
+            const bodyId = "feedback-kpis-body";
+            const content = `<div class="widget-header">Qualidades e Defeitos por Equipe (Últimos 6 Meses)</div><div class="widget-body overflow-auto" id="${bodyId}"></div>`;
+            grid.addWidget({ ...pos, content, id: 'feedback-kpis-widget' });
+            const escapeHtml = (text) => String(text).replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c]));
+            const badges = (itens, cor) => itens.length
+                ? itens.map(i => `<span class="badge bg-${cor} bg-opacity-75 me-1 mb-1" title="${i.ocorrencias} citação(ões)">${escapeHtml(i.nome)} · ${i.media.toFixed(1)}</span>`).join('')
+                : '<span class="text-muted small">—</span>';
+            return (data) => {
+                const body = document.getElementById(bodyId);
+                if (!data.times.length) {
+                    body.innerHTML = '<p class="text-muted mb-0">Nenhum KPI registrado em feedbacks no período.</p>';
+                    return;
+                }
+                const rows = data.times.map(t => `<tr><td class="fw-semibold">${escapeHtml(t.time)}</td>
+                    <td>${badges(t.qualidades, 'success')}</td><td>${badges(t.defeitos, 'danger')}</td></tr>`).join('');
+                body.classList.add('align-items-start');
+                body.innerHTML = `<table class="table table-sm align-middle mb-0">
+                    <thead><tr><th>Equipe</th><th>Qualidades (nível médio)</th><th>Defeitos (nível médio)</th></tr></thead>
+                    <tbody>${rows}</tbody></table>`;
+            };
+        },
+        employeeJourney: (grid, pos) => {
             const chartId = "sankey-chart";
             const content = `<div class="widget-header">Jornada do Colaborador (Fluxo Anual)</div><div class="widget-body"><div id="${chartId}"></div></div>`;
             grid.addWidget({ ...pos, content, id: 'sankey-widget' });
-            fetch(apiUrl).then(res => res.json()).then(data => {
+            return (data) => {
                 new ApexCharts(document.querySelector(`#${chartId}`), {
                     ...commonChartOptions, chart: { type: 'sankey', ...commonChartOptions.chart },
                     series: [{ name: 'Fluxo', data: data }], title: { text: '' }
                 }).render();
-            });
+            };
         }
     };
 
+    // Lê a resposta NDJSON do lote e chama onLine a cada widget que chega,
+    // para que os KPIs rápidos apareçam antes dos lentos.
+    async function readNdjson(response, onLine) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { value, done } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => onLine(JSON.parse(line)));
+        }
+        if (buffer.trim()) onLine(JSON.parse(buffer));
+    }
+
     function loadHubLayout() {
         grid.batchUpdate();
-        widgetFactory.vitalMetrics(grid, {x:0, y:0, w:12, h:2}, '/kpis/api/vital-metrics');
-        widgetFactory.headcountFlow(grid, {x:0, y:2, w:8, h:4}, '/kpis/api/headcount-flow');
-        widgetFactory.performanceDistribution(grid, {x:8, y:2, w:4, h:4}, '/kpis/api/performance-distribution');
-        widgetFactory.performanceByTeam(grid, {x:0, y:6, w:12, h:5}, '/kpis/api/performance-by-team');
-        widgetFactory.employeeJourney(grid, {x:0, y:11, w:12, h:5}, '/kpis/api/employee-journey-sankey');
+        const renderers = {
+            vital: widgetFactory.vitalMetrics(grid, {x:0, y:0, w:12, h:2}),
+            flow: widgetFactory.headcountFlow(grid, {x:0, y:2, w:8, h:4}),
+            perf: widgetFactory.performanceDistribution(grid, {x:8, y:2, w:4, h:4}),
+            team: widgetFactory.performanceByTeam(grid, {x:0, y:6, w:12, h:5}),
+            sankey: widgetFactory.employeeJourney(grid, {x:0, y:11, w:12, h:5}),
+            kpis: widgetFactory.feedbackKpis(grid, {x:0, y:16, w:12, h:5}),
+        };
         grid.commit();
+
+        const url = `/kpis/api/batch?stream=1&widgets=${Object.keys(renderers).join(',')}`;
+        fetch(url, { headers: { 'Accept': 'application/x-ndjson' } })
+            .then(res => readNdjson(res, (item) => {
+                if (item.erro) {
+                    console.error(`Widget ${item.widget}: ${item.erro}`);
+                    return;
+                }
+                renderers[item.widget](item.dados);
+            }))
+            .catch(err => console.error("Erro ao carregar os KPIs do hub:", err));
     }
     
     loadHubLayout();
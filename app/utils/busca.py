@@ -0,0 +1,156 @@
+# app/utils/busca.py
+"""
+Busca de funcionários/usuários por nome, e-mail e cargo (typeahead /funcionarios/api/search).
+
+- PostgreSQL com pg_trgm: ILIKE '%termo%' atendido pelos índices GIN trigram da
+  migração 0004, mais o operador de similaridade (%) para erros de digitação,
+  ordenado pela similaridade. Cada tabela é filtrada no seu próprio SELECT
+  (users por nome/e-mail, employees por cargo), unidos por UNION antes do JOIN:
+  um OR entre colunas das duas tabelas do JOIN não usaria nenhum dos índices.
+- PostgreSQL sem pg_trgm (extensão indisponível no servidor): o mesmo ILIKE,
+  sem índice e sem ranking por similaridade.
+- SQLite (testes locais): tabela virtual FTS5 'busca_usuarios' mantida por
+  triggers, criada na primeira busca; sem FTS5, LIKE.
+"""
+import re
+
+from sqlalchemy import func, literal_column, select, text, union
+from sqlalchemy.exc import OperationalError
+
+from app.extensions import db
+from app.models import User, Employees
+
+LIMITE_PADRAO = 10
+LIMITE_MAX = 50
+# ativos: funcionários ativos | disponiveis: usuários sem cadastro ativo | todos: qualquer usuário
+ESCOPOS = ('ativos', 'disponiveis', 'todos')
+
+# engine -> pg_trgm instalado? (checado uma vez por processo)
+_trigram_disponivel = {}
+# engine SQLite -> índice FTS5 criado? (False se o SQLite não tiver FTS5)
+_fts_disponivel = {}
+
+_SQL_FTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS busca_usuarios USING fts5("
+    " nome, email, cargo, tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER IF NOT EXISTS busca_usuarios_ai AFTER INSERT ON users BEGIN"
+    " INSERT INTO busca_usuarios (rowid, nome, email, cargo) VALUES (new.id, new.nome, new.email,"
+    " (SELECT cargo FROM employees WHERE user_id = new.id)); END",
+    "CREATE TRIGGER IF NOT EXISTS busca_usuarios_au AFTER UPDATE OF nome, email ON users BEGIN"
+    " UPDATE busca_usuarios SET nome = new.nome, email = new.email WHERE rowid = new.id; END",
+    "CREATE TRIGGER IF NOT EXISTS busca_usuarios_ad AFTER DELETE ON users BEGIN"
+    " DELETE FROM busca_usuarios WHERE rowid = old.id; END",
+    "CREATE TRIGGER IF NOT EXISTS busca_employees_ai AFTER INSERT ON employees BEGIN"
+    " UPDATE busca_usuarios SET cargo = new.cargo WHERE rowid = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS busca_employees_au AFTER UPDATE OF cargo ON employees BEGIN"
+    " UPDATE busca_usuarios SET cargo = new.cargo WHERE rowid = new.user_id; END",
+    "CREATE TRIGGER IF NOT EXISTS busca_employees_ad AFTER DELETE ON employees BEGIN"
+    " UPDATE busca_usuarios SET cargo = NULL WHERE rowid = old.user_id; END",
+]
+
+
+def trigram_disponivel():
+    engine = db.engine
+    if engine not in _trigram_disponivel:
+        _trigram_disponivel[engine] = db.session.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    return _trigram_disponivel[engine]
+
+
+def fts_disponivel():
+    """Cria (uma vez) a tabela FTS5 e os triggers no SQLite, populando a partir das tabelas base."""
+    engine = db.engine
+    if engine in _fts_disponivel:
+        return _fts_disponivel[engine]
+    try:
+        novo = db.session.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE name = 'busca_usuarios'")).first() is None
+        for sql in _SQL_FTS:
+            db.session.execute(text(sql))
+        if novo:
+            db.session.execute(text(
+                "INSERT INTO busca_usuarios (rowid, nome, email, cargo)"
+                " SELECT u.id, u.nome, u.email, e.cargo FROM users u LEFT JOIN employees e ON e.user_id = u.id"))
+        db.session.commit()
+        _fts_disponivel[engine] = True
+    except OperationalError:
+        db.session.rollback()
+        _fts_disponivel[engine] = False
+    return _fts_disponivel[engine]
+
+
+def _consulta_base(escopo):
+    query = db.session.query(User.id, User.nome, User.email, User.profile_picture,
+                             Employees.id, Employees.cargo, Employees.active)
+    if escopo == 'ativos':
+        return query.join(Employees, Employees.user_id == User.id).filter(Employees.active == True)
+    query = query.outerjoin(Employees, Employees.user_id == User.id)
+    if escopo == 'disponiveis':
+        # Usuários que ainda podem ser cadastrados (ou reativados) como funcionário.
+        query = query.filter(db.or_(Employees.id.is_(None), Employees.active == False))
+    return query
+
+
+def _padrao_like(termo):
+    return '%' + termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _ids_que_casam(termo, similaridade=False):
+    """ids dos usuários cujo nome/e-mail ou cargo contém o termo (um SELECT por tabela)."""
+    padrao = _padrao_like(termo)
+    condicoes = [User.nome.ilike(padrao, escape='\\'), User.email.ilike(padrao, escape='\\')]
+    if similaridade:
+        condicoes.append(User.nome.op('%')(termo))
+    return union(
+        select(User.id).where(db.or_(*condicoes)),
+        select(Employees.user_id).where(Employees.cargo.ilike(padrao, escape='\\')),
+    )
+
+
+def _consulta_fts(termo):
+    """Expressão FTS5 com prefixo em cada palavra: 'ana sil' -> "ana"* "sil"*"""
+    palavras = re.findall(r'\w+', termo)
+    return ' '.join(f'"{p}"*' for p in palavras)
+
+
+def buscar_usuarios(termo, limite=LIMITE_PADRAO, escopo='ativos'):
+    """
+    Devolve até 'limite' tuplas (user_id, nome, email, profile_picture, employee_id,
+    cargo, active) que casam com o termo. Termo vazio lista os primeiros por nome.
+    """
+    termo = (termo or '').strip()
+    query = _consulta_base(escopo)
+    if not termo:
+        return query.order_by(User.nome, User.id).limit(limite).all()
+
+    dialeto = db.engine.dialect.name
+    if dialeto == 'postgresql' and trigram_disponivel():
+        ranking = func.greatest(func.similarity(User.nome, termo),
+                                func.similarity(User.email, termo),
+                                func.coalesce(func.similarity(Employees.cargo, termo), 0))
+        query = query.filter(User.id.in_(_ids_que_casam(termo, similaridade=True)))
+        return query.order_by(ranking.desc(), User.nome, User.id).limit(limite).all()
+
+    if dialeto == 'sqlite' and fts_disponivel():
+        expressao = _consulta_fts(termo)
+        if not expressao:
+            return []
+        ids = select(literal_column('rowid')).select_from(text('busca_usuarios'))\
+            .where(text('busca_usuarios MATCH :expressao').bindparams(expressao=expressao))
+        query = query.filter(User.id.in_(ids))
+        return query.order_by(User.nome, User.id).limit(limite).all()
+
+    return query.filter(User.id.in_(_ids_que_casam(termo))).order_by(User.nome, User.id).limit(limite).all()
+
+
+def serializar_resultado(linha):
+    user_id, nome, email, profile_picture, employee_id, cargo, active = linha
+    return {
+        'user_id': user_id,
+        'employee_id': employee_id,
+        'nome': nome,
+        'email': email,
+        'cargo': cargo,
+        'active': bool(active) if active is not None else None,
+        'profile_picture': profile_picture,
+    }
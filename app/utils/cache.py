@@ -0,0 +1,76 @@
+# app/utils/cache.py
+"""
+Cache em memória do processo (LRU com expiração), para leituras por chave que
+se repetem muito e mudam pouco. Cada worker do gunicorn tem o seu: quem grava
+invalida a chave no próprio processo e o TTL limita quanto tempo os outros
+workers podem servir o valor antigo.
+
+Caches criados com 'nome' entram em CACHES_NOMEADOS e têm acertos/faltas
+expostos em /metrics (app/utils/metricas.py).
+"""
+import threading
+import time
+from collections import OrderedDict
+
+_AUSENTE = object()
+
+CACHES_NOMEADOS = []
+
+
+class CacheLRU:
+    def __init__(self, maximo=1024, ttl=300, nome=None):
+        self.maximo = maximo
+        self.ttl = ttl
+        self.nome = nome
+        self.acertos = 0
+        self.faltas = 0
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+        # Incrementada a cada invalidação: um cálculo que começou antes dela não é guardado.
+        self._geracao = 0
+        if nome:
+            CACHES_NOMEADOS.append(self)
+
+    def obter(self, chave, calcular, ttl=None):
+        """Valor em cache da chave ou, se ausente/expirado, o resultado de calcular() (que é guardado)."""
+        agora = time.monotonic()
+        with self._lock:
+            valor, expira_em = self._itens.get(chave, (_AUSENTE, 0))
+            if valor is not _AUSENTE and expira_em > agora:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return valor
+            self.faltas += 1
+            geracao = self._geracao
+
+        # Calcula fora do lock: uma query lenta não trava as leituras das outras chaves.
+        valor = calcular()
+        ttl = self.ttl if ttl is None else ttl
+        if ttl > 0:
+            with self._lock:
+                if geracao != self._geracao:
+                    return valor
+                self._itens[chave] = (valor, agora + ttl)
+                self._itens.move_to_end(chave)
+                while len(self._itens) > self.maximo:
+                    self._itens.popitem(last=False)
+        return valor
+
+    def invalidar(self, *chaves):
+        """Remove as chaves informadas; sem argumentos, limpa o cache inteiro."""
+        with self._lock:
+            self._geracao += 1
+            if not chaves:
+                self._itens.clear()
+            for chave in chaves:
+                self._itens.pop(chave, None)
+
+    def invalidar_se(self, predicado):
+        """Remove as entradas cujo valor satisfaz predicado(valor)."""
+        with self._lock:
+            self._geracao += 1
+            for chave in [c for c, (valor, _) in self._itens.items() if predicado(valor)]:
+                del self._itens[chave]
+
+    def __len__(self):
+        return len(self._itens)
@@ -0,0 +1,156 @@
+# app/utils/conexoes.py
+"""
+Configuração do engine do SQLAlchemy por perfil (DB_PERFIL: dev, test, prod).
+
+No perfil prod o pool é dimensionado pelo número de workers do gunicorn: cada
+processo tem o seu pool, então as conexões de todos os workers (pool_size +
+max_overflow) precisam caber em DB_MAX_CONEXOES menos as reservadas para
+cron/CLI/psql. O pool_size cobre as threads da requisição mais as do lote de
+KPIs (app/utils/kpi_paralelo.py); o que sobrar do orçamento vira overflow.
+
+statement_timeout é aplicado no checkout da conexão conforme o blueprint da
+requisição (STATEMENT_TIMEOUTS, com STATEMENT_TIMEOUT_PADRAO para as telas
+interativas). O valor vigente fica anotado na conexão do pool: o SET só é
+enviado quando muda, e comandos do CLI (sem requisição) rodam sem limite.
+
+PoolMonitorado acumula o tempo de espera por uma conexão; as estatísticas de
+cada engine saem em /admin/pool.
+"""
+import threading
+import time
+
+from flask import current_app, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+PERFIS = ('dev', 'test', 'prod')
+
+
+class PoolMonitorado(QueuePool):
+    """QueuePool que mede quanto cada checkout levou (fila, conexão nova e pre-ping)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock_espera = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_maxima = 0.0
+        self.timeouts = 0
+
+    def connect(self):
+        inicio = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            with self._lock_espera:
+                self.timeouts += 1
+            raise
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._lock_espera:
+                self.checkouts += 1
+                self.espera_total += espera
+                self.espera_maxima = max(self.espera_maxima, espera)
+
+
+def dimensionar_pool(config):
+    """(pool_size, max_overflow) de cada worker no perfil prod."""
+    workers = max(1, config['WEB_CONCURRENCY'])
+    por_worker = max(2, (config['DB_MAX_CONEXOES'] - config['DB_CONEXOES_RESERVADAS']) // workers)
+    threads_kpi = config['KPI_POOL_WORKERS'] if config['KPI_LOTE_PARALELO'] else 0
+    pool_size = min(config['WEB_THREADS'] + threads_kpi, por_worker)
+    return pool_size, por_worker - pool_size
+
+
+def opcoes_engine(config):
+    """SQLALCHEMY_ENGINE_OPTIONS do perfil configurado."""
+    perfil = config['DB_PERFIL']
+    if perfil not in PERFIS:
+        raise ValueError(f"DB_PERFIL inválido '{perfil}'. Use: {', '.join(PERFIS)}.")
+    if config['SQLALCHEMY_DATABASE_URI'].startswith('sqlite'):
+        # SQLite usa os pools próprios que o Flask-SQLAlchemy escolhe.
+        return {}
+
+    if perfil == 'prod':
+        pool_size, max_overflow = dimensionar_pool(config)
+        opcoes = {
+            'pool_size': pool_size,
+            'max_overflow': max_overflow,
+            # Melhor um 503 rápido do que a requisição presa esperando conexão.
+            'pool_timeout': 10,
+            'pool_pre_ping': True,
+            # Abaixo do idle timeout de proxies/PgBouncer/firewalls.
+            'pool_recycle': 1800,
+            'connect_args': {'connect_timeout': 5},
+        }
+    elif perfil == 'test':
+        opcoes = {'pool_size': 2, 'max_overflow': 0, 'pool_timeout': 5}
+    else:
+        opcoes = {'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30, 'pool_pre_ping': True}
+
+    for chave, opcao in (('DB_POOL_SIZE', 'pool_size'), ('DB_MAX_OVERFLOW', 'max_overflow'),
+                         ('DB_POOL_TIMEOUT', 'pool_timeout')):
+        if config.get(chave) is not None:
+            opcoes[opcao] = config[chave]
+    opcoes['poolclass'] = PoolMonitorado
+    return opcoes
+
+
+def binds_com_opcoes(binds, opcoes):
+    """SQLALCHEMY_BINDS com as opções do perfil (o Flask-SQLAlchemy só as aplica ao engine padrão)."""
+    return {chave: {'url': valor, **opcoes} if isinstance(valor, str) else valor for chave, valor in binds.items()}
+
+
+def statement_timeout_ms():
+    """Timeout da requisição corrente, em ms (0 = sem limite, fora de requisição)."""
+    if not has_request_context():
+        return 0
+    config = current_app.config
+    segundos = config.get('STATEMENT_TIMEOUTS', {}).get(request.blueprint, config.get('STATEMENT_TIMEOUT_PADRAO', 0))
+    return int(segundos * 1000)
+
+
+def _aplicar_statement_timeout(dbapi_connection, registro, proxy):
+    timeout = statement_timeout_ms()
+    if registro.info.get('statement_timeout') == timeout:
+        return
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f'SET statement_timeout = {timeout}')
+    finally:
+        cursor.close()
+    # Fora de transação: o SET vale para a sessão e sobrevive ao rollback do checkin.
+    dbapi_connection.commit()
+    registro.info['statement_timeout'] = timeout
+
+
+def instrumentar_engine(engine):
+    """Liga o statement_timeout por blueprint num engine PostgreSQL (uma vez por engine)."""
+    if engine.dialect.name == 'postgresql' and not event.contains(engine.pool, 'checkout', _aplicar_statement_timeout):
+        event.listen(engine.pool, 'checkout', _aplicar_statement_timeout)
+
+
+def estatisticas_pool(engine):
+    """Ocupação e espera do pool do engine (por processo)."""
+    pool = engine.pool
+    estatisticas = {'pool': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        estatisticas.update({
+            'tamanho': pool.size(),
+            'max_overflow': pool._max_overflow,
+            'em_uso': pool.checkedout(),
+            'ociosas': pool.checkedin(),
+            'overflow': max(0, pool.overflow()),
+            'timeout': pool.timeout(),
+        })
+    if isinstance(pool, PoolMonitorado):
+        with pool._lock_espera:
+            checkouts, total, maxima, timeouts = pool.checkouts, pool.espera_total, pool.espera_maxima, pool.timeouts
+        estatisticas.update({
+            'checkouts': checkouts,
+            'espera_media_ms': round(total / checkouts * 1000, 3) if checkouts else 0.0,
+            'espera_maxima_ms': round(maxima * 1000, 3),
+            'timeouts_checkout': timeouts,
+        })
+    return estatisticas
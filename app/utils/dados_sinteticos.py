@@ -0,0 +1,66 @@
+# app/utils/dados_sinteticos.py
+"""
+Massa de dados sintética para medir as telas com volume (flask perf semear).
+Só roda em banco vazio: os e-mails gerados seguem o padrão 'sintetico-N@exemplo.com'.
+"""
+import random
+from datetime import date, timedelta
+
+from app.extensions import db
+from app.models import (User, Employees, Team, TeamMember, PromotionLog, Feedback,
+                        SalaryAdjustmentLog, Milestone, Jornada)
+
+CARGOS = ['Desenvolvedor', 'Analista', 'QA', 'Designer', 'Product Manager', 'Tech Lead']
+
+
+def semear(funcionarios=2000, times=20, semente=42):
+    """Cria usuários/funcionários, times, históricos, feedbacks, milestones e jornadas."""
+    rnd = random.Random(semente)
+    hoje = date.today()
+
+    usuarios = [User(nome=f'Funcionário Sintético {i}', email=f'sintetico-{i}@exemplo.com',
+                     senha_hash='!', tipo='Admin' if i == 0 else 'colaborador')
+                for i in range(funcionarios)]
+    db.session.add_all(usuarios)
+    db.session.flush()
+
+    empregados = [Employees(user_id=u.id, cargo=rnd.choice(CARGOS), salario=rnd.randint(3000, 20000),
+                            media_feedbacks=0, data_entrada=hoje - timedelta(days=rnd.randint(30, 1500)))
+                  for u in usuarios]
+    db.session.add_all(empregados)
+    db.session.flush()
+
+    equipes = [Team(nome=f'Time Sintético {i}', gestor_id=usuarios[i].id, descricao='Gerado para testes de carga.')
+               for i in range(min(times, funcionarios))]
+    db.session.add_all(equipes)
+    db.session.flush()
+
+    admin = usuarios[0]
+    for i, (usuario, empregado) in enumerate(zip(usuarios, empregados)):
+        equipe = equipes[i % len(equipes)]
+        db.session.add(TeamMember(team_id=equipe.id, user_id=usuario.id, status='ativo',
+                                  responsabilidade=empregado.cargo, data_entrada=empregado.data_entrada))
+        if i % 10 == 0:
+            db.session.add(PromotionLog(employee_id=empregado.id, cargo_anterior='Júnior', salario_anterior=2500,
+                                        cargo_novo=empregado.cargo, salario_novo=empregado.salario,
+                                        promovido_por_id=admin.id, data_promocao=hoje - timedelta(days=rnd.randint(1, 365))))
+            db.session.add(SalaryAdjustmentLog(employee_id=empregado.id, salario_anterior=2500,
+                                               salario_novo=empregado.salario, tipo_ajuste='Dissídio',
+                                               aprovado_por_id=admin.id, data_ajuste=hoje - timedelta(days=rnd.randint(1, 365))))
+        if i % 4 == 0:
+            nota = rnd.randint(1, 5)
+            db.session.add(Feedback(employee_id=empregado.id, giver_id=admin.id, descricao='Feedback sintético.',
+                                    tipo_feedback='avaliação', pontuacao_geral=nota,
+                                    kpis={'qualidades': {'Comunicação': nota}, 'defeitos': {}}))
+            empregado.media_feedbacks = empregado.feedbacks_soma = nota
+            empregado.feedbacks_total = 1
+        if i % 20 == 0:
+            db.session.add(Milestone(title=f'Marco sintético {i}', created_by_id=admin.id,
+                                     employee_id=empregado.id, team_id=equipe.id,
+                                     milestone_date=hoje - timedelta(days=rnd.randint(0, 365))))
+            db.session.add(Jornada(titulo=f'Jornada sintética {i}', tipo='Individual', criado_por_id=admin.id,
+                                   employee_id=empregado.id, team_id=equipe.id,
+                                   data_jornada=hoje - timedelta(days=rnd.randint(0, 365))))
+
+    db.session.commit()
+    return len(usuarios)
@@ -0,0 +1,38 @@
+# app/utils/equipes.py
+"""
+Reconciliação dos vínculos de time com o cadastro de funcionários.
+
+Quem é desligado deixa de ser membro ativo dos times. Isso é feito num único
+UPDATE, no momento da demissão ou pelo job 'flask times encerrar-vinculos',
+e não na renderização das telas.
+"""
+from datetime import date
+
+from sqlalchemy import select
+
+from app.extensions import db
+from app.models import Employees, TeamMember
+from app.utils.kpi_snapshots import invalidar_kpis, kpis_afetados
+
+
+def encerrar_vinculos_inativos(user_ids=None):
+    """
+    Marca como 'inativo' os vínculos ativos de funcionários desligados (opcionalmente
+    só dos user_ids informados). Não faz commit; devolve quantos vínculos foram encerrados.
+    """
+    # O UPDATE em lote não passa pelo flush do ORM: garante que a demissão pendente
+    # já está no banco e invalida os KPIs à mão.
+    db.session.flush()
+
+    desligados = select(Employees.user_id).where(Employees.active == False)
+    if user_ids is not None:
+        desligados = desligados.where(Employees.user_id.in_(user_ids))
+
+    membros = TeamMember.__table__
+    stmt = membros.update()\
+        .where(membros.c.status == 'ativo', membros.c.user_id.in_(desligados))\
+        .values(status='inativo', data_saida=date.today())
+    total = db.session.execute(stmt).rowcount
+    if total:
+        invalidar_kpis(kpis_afetados({TeamMember}))
+    return total
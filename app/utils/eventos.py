@@ -0,0 +1,144 @@
+# app/utils/eventos.py
+"""
+Pub/sub dos eventos da timeline (nova jornada, contagem de reações, novo comentário),
+consumido pelo stream SSE /jornada/api/stream.
+
+Cada processo mantém uma fila por cliente conectado. A publicação é transacional:
+no PostgreSQL o evento vai por pg_notify dentro da transação da escrita (só é
+entregue no COMMIT) e uma thread por processo faz LISTEN e distribui para as filas
+locais — assim funciona com vários workers do gunicorn. Em outros bancos o evento
+é distribuído só no processo atual, depois do commit.
+
+O stream mantém a requisição aberta e ocupa uma thread do worker (gthread, ver
+gunicorn.conf.py). Cada processo aceita até SSE_MAX_CLIENTES streams; acima
+disso o assinante recebe None e a rota responde 204, que faz o EventSource
+parar de reconectar (a página segue funcionando, só sem atualização ao vivo).
+
+Os eventos levam só ids e contagens; o cliente busca o conteúdo (jornada,
+comentário) pela API. O payload do NOTIFY tem limite de 8000 bytes e um
+estouro abortaria a transação da escrita: acima de LIMITE_PAYLOAD o evento é
+descartado (com aviso no log) e a escrita segue.
+"""
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+from sqlalchemy import event, text
+
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+CANAL = 'jornada_eventos'
+# Abaixo dos 8000 bytes aceitos pelo pg_notify.
+LIMITE_PAYLOAD = 7900
+
+
+class BarramentoEventos:
+    def __init__(self, canal=CANAL, tamanho_fila=100):
+        self.canal = canal
+        self.tamanho_fila = tamanho_fila
+        self._filas = set()
+        self._lock = threading.Lock()
+        self._ouvinte = None
+
+    # --- assinantes -------------------------------------------------
+
+    def assinar(self, maximo=None):
+        """
+        Registra um cliente e devolve a fila de onde ele lê os eventos, ou None
+        se o processo já tem 'maximo' clientes conectados.
+        """
+        fila = queue.Queue(maxsize=self.tamanho_fila)
+        with self._lock:
+            if maximo is not None and len(self._filas) >= maximo:
+                return None
+            self._filas.add(fila)
+        if db.engine.dialect.name == 'postgresql':
+            self._iniciar_ouvinte(db.engine)
+        return fila
+
+    def cancelar(self, fila):
+        with self._lock:
+            self._filas.discard(fila)
+
+    def distribuir(self, evento):
+        """Entrega o evento a todos os clientes deste processo; descarta para quem estiver atrasado."""
+        with self._lock:
+            filas = list(self._filas)
+        for fila in filas:
+            try:
+                fila.put_nowait(evento)
+            except queue.Full:
+                pass
+
+    # --- publicação -------------------------------------------------
+
+    def publicar(self, tipo, dados):
+        """
+        Publica um evento junto com a transação corrente da sessão: só chega aos
+        clientes se a escrita for confirmada.
+        """
+        evento = {'tipo': tipo, 'dados': dados}
+        if db.engine.dialect.name == 'postgresql':
+            payload = json.dumps(evento)
+            if len(payload.encode('utf-8')) > LIMITE_PAYLOAD:
+                logger.warning('Evento %s descartado: payload de %d bytes', tipo, len(payload.encode('utf-8')))
+                return
+            db.session.execute(text("SELECT pg_notify(:canal, :payload)"),
+                               {'canal': self.canal, 'payload': payload})
+        else:
+            db.session.info.setdefault('eventos_pendentes', []).append(evento)
+
+    # --- ponte LISTEN/NOTIFY ----------------------------------------
+
+    def _iniciar_ouvinte(self, engine):
+        with self._lock:
+            if self._ouvinte and self._ouvinte.is_alive():
+                return
+            self._ouvinte = threading.Thread(target=self._ouvir, args=(engine,),
+                                             name='jornada-eventos', daemon=True)
+            self._ouvinte.start()
+
+    def _ouvir(self, engine):
+        while True:
+            conexao = None
+            try:
+                # Conexão dedicada, fora da contagem do pool.
+                conexao = engine.raw_connection()
+                conexao.detach()
+                dbapi = conexao.dbapi_connection
+                dbapi.autocommit = True
+                dbapi.cursor().execute(f'LISTEN {self.canal}')
+                while True:
+                    if select.select([dbapi], [], [], 30) == ([], [], []):
+                        continue
+                    dbapi.poll()
+                    while dbapi.notifies:
+                        notificacao = dbapi.notifies.pop(0)
+                        self.distribuir(json.loads(notificacao.payload))
+            except Exception:
+                logger.exception('Ouvinte de eventos da timeline caiu; reconectando em 5s')
+                if conexao is not None:
+                    try:
+                        conexao.close()
+                    except Exception:
+                        pass
+                time.sleep(5)
+
+
+barramento = BarramentoEventos()
+
+
+@event.listens_for(db.session, 'after_commit')
+def _distribuir_pendentes(session):
+    for evento in session.info.pop('eventos_pendentes', []):
+        barramento.distribuir(evento)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_pendentes(session):
+    session.info.pop('eventos_pendentes', None)
@@ -0,0 +1,286 @@
+# app/utils/exportacao.py
+"""
+Exportações em streaming (folha, histórico salarial, promoções e feedbacks).
+
+As linhas vêm do banco por cursor do lado do servidor (yield_per: o driver busca
+TAMANHO_LOTE linhas por vez) e são escritas em pedaços, então a memória não
+depende do tamanho da exportação. Servem tanto a resposta HTTP em chunks
+(/exportacoes/<conjunto>.<formato>) quanto o 'flask exportacoes gerar'.
+
+XLSX é gerado sem dependência extra: o arquivo é um zip com meia dúzia de XMLs
+fixos e uma planilha escrita linha a linha (strings inline, sem sharedStrings).
+
+Os textos vêm dos usuários (nomes, motivos, descrições): caracteres de controle
+que o XML não aceita são removidos (um só invalidaria a planilha inteira) e, no
+CSV, células de texto que o Excel leria como fórmula ganham um ' na frente.
+"""
+import csv
+import io
+import json
+import re
+import zipfile
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from sqlalchemy import exists, select
+from sqlalchemy.orm import aliased
+
+from app.extensions import db
+from app.models import User, Employees, TeamMember, SalaryAdjustmentLog, PromotionLog, Feedback
+
+TAMANHO_LOTE = 1000
+# Controles fora de tab, LF e CR (e os não-caracteres U+FFFE/U+FFFF) não são válidos em XML 1.0.
+_CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+# Início de célula que o Excel interpreta como fórmula.
+_INICIO_FORMULA = ('=', '+', '-', '@', '\t', '\r')
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+class FiltrosInvalidos(ValueError):
+    pass
+
+
+# --- Conjuntos exportáveis ---------------------------------------------------
+# Cada conjunto: título, coluna de data usada no filtro de período e a função que
+# monta o SELECT (só colunas, sem entidades do ORM: nada fica no identity map).
+
+def _select_funcionarios():
+    return select(
+        Employees.id.label('ID'), User.nome.label('Nome'), User.email.label('E-mail'),
+        Employees.cargo.label('Cargo'), Employees.salario.label('Salário'),
+        Employees.data_entrada.label('Data de entrada'), Employees.data_saida.label('Data de saída'),
+        Employees.status.label('Status'), Employees.media_feedbacks.label('Média de feedbacks'),
+    ).join(User, User.id == Employees.user_id).order_by(Employees.id)
+
+
+def _select_salarios():
+    aprovador = aliased(User)
+    return select(
+        SalaryAdjustmentLog.id.label('ID'), Employees.id.label('ID do funcionário'), User.nome.label('Funcionário'),
+        SalaryAdjustmentLog.data_ajuste.label('Data do ajuste'), SalaryAdjustmentLog.tipo_ajuste.label('Tipo'),
+        SalaryAdjustmentLog.salario_anterior.label('Salário anterior'),
+        SalaryAdjustmentLog.salario_novo.label('Salário novo'), SalaryAdjustmentLog.motivo.label('Motivo'),
+        aprovador.nome.label('Aprovado por'),
+    ).join(Employees, Employees.id == SalaryAdjustmentLog.employee_id)\
+     .join(User, User.id == Employees.user_id)\
+     .outerjoin(aprovador, aprovador.id == SalaryAdjustmentLog.aprovado_por_id)\
+     .order_by(SalaryAdjustmentLog.data_ajuste, SalaryAdjustmentLog.id)
+
+
+def _select_promocoes():
+    promotor = aliased(User)
+    return select(
+        PromotionLog.id.label('ID'), Employees.id.label('ID do funcionário'), User.nome.label('Funcionário'),
+        PromotionLog.data_promocao.label('Data da promoção'),
+        PromotionLog.cargo_anterior.label('Cargo anterior'), PromotionLog.cargo_novo.label('Cargo novo'),
+        PromotionLog.salario_anterior.label('Salário anterior'), PromotionLog.salario_novo.label('Salário novo'),
+        PromotionLog.motivo.label('Motivo'), promotor.nome.label('Promovido por'),
+    ).join(Employees, Employees.id == PromotionLog.employee_id)\
+     .join(User, User.id == Employees.user_id)\
+     .outerjoin(promotor, promotor.id == PromotionLog.promovido_por_id)\
+     .order_by(PromotionLog.data_promocao, PromotionLog.id)
+
+
+def _select_feedbacks():
+    autor = aliased(User)
+    return select(
+        Feedback.id.label('ID'), Employees.id.label('ID do funcionário'), User.nome.label('Funcionário'),
+        Feedback.data_feedback.label('Data'), Feedback.tipo_feedback.label('Tipo'),
+        Feedback.pontuacao_geral.label('Pontuação geral'), Feedback.descricao.label('Descrição'),
+        Feedback.kpis.label('KPIs'), autor.nome.label('Autor'),
+    ).join(Employees, Employees.id == Feedback.employee_id)\
+     .join(User, User.id == Employees.user_id)\
+     .outerjoin(autor, autor.id == Feedback.giver_id)\
+     .order_by(Feedback.data_feedback, Feedback.id)
+
+
+CONJUNTOS = {
+    'funcionarios': {'titulo': 'Folha de pagamento', 'data': Employees.data_entrada, 'select': _select_funcionarios},
+    'salarios': {'titulo': 'Histórico salarial', 'data': SalaryAdjustmentLog.data_ajuste, 'select': _select_salarios},
+    'promocoes': {'titulo': 'Promoções', 'data': PromotionLog.data_promocao, 'select': _select_promocoes},
+    'feedbacks': {'titulo': 'Feedbacks', 'data': Feedback.data_feedback, 'select': _select_feedbacks},
+}
+
+
+def ler_filtros(de=None, ate=None, team_id=None):
+    """Converte os filtros vindos da query string/CLI (textos) e valida."""
+    filtros = {}
+    for nome, valor in (('de', de), ('ate', ate)):
+        if valor:
+            try:
+                filtros[nome] = date.fromisoformat(str(valor).strip())
+            except ValueError:
+                raise FiltrosInvalidos(f"Data inválida em '{nome}'. Use AAAA-MM-DD.")
+    if filtros.get('de') and filtros.get('ate') and filtros['de'] > filtros['ate']:
+        raise FiltrosInvalidos("'de' não pode ser depois de 'ate'.")
+    if team_id not in (None, ''):
+        try:
+            filtros['team_id'] = int(team_id)
+        except (TypeError, ValueError):
+            raise FiltrosInvalidos("Parâmetro 'team_id' inválido.")
+    return filtros
+
+
+def consulta_exportacao(conjunto, de=None, ate=None, team_id=None):
+    """SELECT do conjunto com o período (na coluna de data do conjunto) e o time aplicados."""
+    definicao = CONJUNTOS[conjunto]
+    stmt = definicao['select']()
+    coluna_data = definicao['data']
+    if de:
+        stmt = stmt.where(coluna_data >= de)
+    if ate:
+        # Colunas DateTime (feedbacks) incluem o dia inteiro de 'ate'.
+        stmt = stmt.where(coluna_data < ate + timedelta(days=1)
+                          if isinstance(coluna_data.type, db.DateTime) else coluna_data <= ate)
+    if team_id:
+        # Funcionários que passaram pelo time (vínculo ativo ou encerrado).
+        stmt = stmt.where(exists().where(TeamMember.user_id == Employees.user_id, TeamMember.team_id == team_id))
+    return stmt
+
+
+def linhas_exportacao(stmt):
+    """Gera o cabeçalho e depois as linhas, lidas do banco em lotes por cursor do servidor."""
+    resultado = db.session.execute(stmt.execution_options(yield_per=TAMANHO_LOTE))
+    yield list(resultado.keys())
+    for particao in resultado.partitions():
+        yield from particao
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, bool):
+        return 'Sim' if valor else 'Não'
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False)
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat(sep=' ') if isinstance(valor, datetime) else valor.isoformat()
+    return _CARACTERES_INVALIDOS.sub('', str(valor))
+
+
+def _celula_csv(valor):
+    texto = _texto(valor)
+    if isinstance(valor, str) and texto.startswith(_INICIO_FORMULA):
+        return "'" + texto
+    return texto
+
+
+# --- Escritores ------------------------------------------------------------------
+
+def gerar_csv(linhas):
+    """Gera o CSV em pedaços de bytes (UTF-8 com BOM, para o Excel reconhecer os acentos)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    buffer.write('\ufeff')
+    for numero, linha in enumerate(linhas):
+        escritor.writerow([_celula_csv(v) for v in linha])
+        if numero % TAMANHO_LOTE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _SaidaEmPedacos(io.RawIOBase):
+    """Destino não posicionável para o zipfile: acumula o que foi escrito até ser drenado."""
+
+    def __init__(self):
+        self._pedacos = []
+        self._posicao = 0
+
+    def writable(self):
+        return True
+
+    def write(self, dados):
+        self._pedacos.append(bytes(dados))
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self):
+        return self._posicao
+
+    def drenar(self):
+        dados = b''.join(self._pedacos)
+        self._pedacos = []
+        return dados
+
+
+_XLSX_ARQUIVOS_FIXOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_workbook(titulo):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(titulo[:31], {chr(34): "&quot;"})}" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    )
+
+
+def _xlsx_celula(valor):
+    if isinstance(valor, (int, float, Decimal)) and not isinstance(valor, bool):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(_texto(valor))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def gerar_xlsx(linhas, titulo='Exportação'):
+    """Gera o .xlsx em pedaços de bytes, escrevendo a planilha dentro do zip linha a linha."""
+    saida = _SaidaEmPedacos()
+    with zipfile.ZipFile(saida, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in _XLSX_ARQUIVOS_FIXOS.items():
+            arquivo.writestr(nome, conteudo)
+        arquivo.writestr('xl/workbook.xml', _xlsx_workbook(titulo))
+        yield saida.drenar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                           b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            for numero, linha in enumerate(linhas):
+                planilha.write(('<row>' + ''.join(_xlsx_celula(v) for v in linha) + '</row>').encode('utf-8'))
+                if numero % TAMANHO_LOTE == 0:
+                    yield saida.drenar()
+            planilha.write(b'</sheetData></worksheet>')
+    yield saida.drenar()
+
+
+def gerar_exportacao(conjunto, formato, **filtros):
+    """Pedaços de bytes da exportação completa de 'conjunto' no 'formato' pedido."""
+    linhas = linhas_exportacao(consulta_exportacao(conjunto, **filtros))
+    if formato == 'xlsx':
+        return gerar_xlsx(linhas, CONJUNTOS[conjunto]['titulo'])
+    return gerar_csv(linhas)
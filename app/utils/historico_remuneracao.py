@@ -0,0 +1,93 @@
+# app/utils/historico_remuneracao.py
+"""
+Histórico de remuneração de um funcionário (painel financeiro): promoções e
+ajustes salariais numa única query UNION ALL, já ordenada pelo banco.
+
+A tabela é paginada no banco (LIMIT/OFFSET sobre o UNION ALL), então o custo de
+uma página não cresce com o histórico. O gráfico precisa da série inteira, mas
+lê só data e salário; o tamanho dela dá o total da paginação.
+
+Sem cache: as queries filtram as duas tabelas pelo employee_id indexado e são
+lidas a cada abertura do painel, então o histórico e o gráfico mostram o ajuste
+recém-gravado em qualquer worker, junto com o salário atual do cabeçalho.
+"""
+from flask_sqlalchemy.pagination import Pagination
+from sqlalchemy import literal, select, union_all
+
+from app.extensions import db
+from app.models import PromotionLog, SalaryAdjustmentLog
+
+POR_PAGINA = 20
+
+
+class PaginacaoHistorico(Pagination):
+    """Pagination do Flask-SQLAlchemy sobre o UNION ALL (consulta=..., total=... já contado)."""
+
+    def _query_items(self):
+        consulta = self._query_args['consulta'].limit(self.per_page).offset(self._query_offset)
+        return [_evento(linha) for linha in db.session.execute(consulta)]
+
+    def _query_count(self):
+        return self._query_args['total']
+
+
+def _eventos(employee_id):
+    promocoes = select(
+        PromotionLog.data_promocao.label('data'),
+        literal('promocao').label('tipo'),
+        PromotionLog.id.label('id'),
+        PromotionLog.cargo_novo.label('descricao'),
+        PromotionLog.salario_anterior.label('salario_anterior'),
+        PromotionLog.salario_novo.label('salario_novo'),
+        PromotionLog.motivo.label('motivo'),
+    ).where(PromotionLog.employee_id == employee_id)
+
+    ajustes = select(
+        SalaryAdjustmentLog.data_ajuste,
+        literal('ajuste'),
+        SalaryAdjustmentLog.id,
+        SalaryAdjustmentLog.tipo_ajuste,
+        SalaryAdjustmentLog.salario_anterior,
+        SalaryAdjustmentLog.salario_novo,
+        SalaryAdjustmentLog.motivo,
+    ).where(SalaryAdjustmentLog.employee_id == employee_id)
+
+    return union_all(promocoes, ajustes).subquery('eventos')
+
+
+def consulta_historico(employee_id):
+    """Promoções e ajustes do funcionário, do mais recente para o mais antigo."""
+    eventos = _eventos(employee_id)
+    return select(eventos).order_by(eventos.c.data.desc(), eventos.c.tipo, eventos.c.id.desc())
+
+
+def consulta_serie(employee_id):
+    """(data, salario_novo) de cada evento, em ordem cronológica (a inversa de consulta_historico)."""
+    eventos = _eventos(employee_id)
+    return select(eventos.c.data, eventos.c.salario_novo)\
+        .order_by(eventos.c.data, eventos.c.tipo.desc(), eventos.c.id)
+
+
+def _evento(linha):
+    evento = f'Promoção para {linha.descricao}' if linha.tipo == 'promocao' else f'Ajuste por {linha.descricao}'
+    return {
+        'data': linha.data,
+        'tipo': linha.tipo,
+        'evento': evento,
+        'salario_anterior': linha.salario_anterior,
+        'salario_novo': linha.salario_novo,
+        'motivo': linha.motivo,
+    }
+
+
+def painel_remuneracao(employee_id, pagina=1, por_pagina=POR_PAGINA):
+    """Página da tabela de eventos (paginada no banco) e a série completa do gráfico."""
+    serie = db.session.execute(consulta_serie(employee_id)).all()
+    # Página além da última mostra a última (ex.: link antigo depois de uma exclusão).
+    pagina = min(max(pagina, 1), max(1, -(-len(serie) // por_pagina)))
+    paginacao = PaginacaoHistorico(page=pagina, per_page=por_pagina, error_out=False,
+                                   consulta=consulta_historico(employee_id), total=len(serie))
+    return paginacao, {
+        'labels': [data.strftime('%d/%m/%Y') for data, _ in serie],
+        'data': [float(salario) for _, salario in serie],
+    }
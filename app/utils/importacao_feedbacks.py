@@ -0,0 +1,227 @@
+# app/utils/importacao_feedbacks.py
+"""
+Importação em lote de feedbacks (ciclo de avaliação): upload em /feedbacks/importar
+e 'flask feedbacks importar ARQUIVO'.
+
+Formatos aceitos:
+
+    .csv    cabeçalho com employee_id ou email, descricao, pontuacao_geral e, opcionais,
+            tipo_feedback, data_feedback (AAAA-MM-DD) e qualidades/defeitos no formato
+            "Comunicação=4; Prazo=3"
+    .jsonl  um objeto por linha com as mesmas chaves (qualidades/defeitos como objeto
+            {"Comunicação": 4} ou dentro de "kpis")
+    .json   um array desses objetos
+
+O arquivo é lido como UTF-8 (com ou sem BOM); bytes que não forem UTF-8 válido
+são lidos como cp1252, a codificação do CSV que o Excel exporta no Windows.
+
+As linhas são lidas em streaming e gravadas em lotes de TAMANHO_LOTE com um
+INSERT executemany por lote. Linhas inválidas (inclusive CSV malformado e
+caracteres nulos, que o PostgreSQL recusa) entram no relatório de erros sem
+interromper as demais; a média de cada funcionário afetado é recalculada uma
+única vez no fim. Tudo numa transação: o commit fica com quem chama.
+"""
+import codecs
+import csv
+import io
+import json
+from datetime import date, datetime
+from itertools import islice
+
+from sqlalchemy import insert
+
+from app.extensions import db
+from app.models import Employees, Feedback, User
+from app.utils.kpi_snapshots import invalidar_kpis, kpis_afetados
+from app.utils.media_feedbacks import recalcular_medias
+from app.utils.validacao_feedbacks import FeedbackInvalido, validar_kpis, validar_pontuacao
+
+TAMANHO_LOTE = 500
+FORMATOS = ('csv', 'json', 'jsonl')
+
+
+class ResultadoImportacao:
+    def __init__(self):
+        self.importados = 0
+        self.funcionarios = set()
+        # (número da linha no arquivo, mensagem)
+        self.erros = []
+
+
+def formato_do_arquivo(nome_arquivo):
+    extensao = nome_arquivo.rsplit('.', 1)[-1].lower() if '.' in nome_arquivo else ''
+    if extensao not in FORMATOS:
+        raise FeedbackInvalido(f"Formato não suportado. Use: {', '.join('.' + f for f in FORMATOS)}.")
+    return extensao
+
+
+def _utf8_ou_cp1252(erro):
+    """Handler de decodificação: o trecho que não é UTF-8 é lido como cp1252."""
+    return erro.object[erro.start:erro.end].decode('cp1252', errors='replace'), erro.end
+
+
+codecs.register_error('importacao_cp1252', _utf8_ou_cp1252)
+
+
+def ler_linhas(arquivo, formato):
+    """
+    Gera (número da linha, dict) a partir de um arquivo binário aberto. Uma linha
+    de CSV que o leitor não consegue interpretar vem como FeedbackInvalido.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', errors='importacao_cp1252', newline='')
+    if formato == 'csv':
+        leitor = csv.DictReader(texto)
+        while True:
+            try:
+                linha = next(leitor)
+            except StopIteration:
+                return
+            except csv.Error as erro:
+                # O DictReader só atualiza line_num quando a linha é lida com sucesso.
+                yield leitor.reader.line_num, FeedbackInvalido(f'CSV malformado: {erro}.')
+                continue
+            yield leitor.line_num, linha
+    elif formato == 'jsonl':
+        for numero, conteudo in enumerate(texto, start=1):
+            if not conteudo.strip():
+                continue
+            try:
+                yield numero, json.loads(conteudo)
+            except ValueError:
+                yield numero, None
+    else:
+        try:
+            dados = json.load(texto)
+        except ValueError:
+            raise FeedbackInvalido('Arquivo JSON inválido.')
+        if not isinstance(dados, list):
+            raise FeedbackInvalido('O arquivo JSON deve conter uma lista de feedbacks.')
+        yield from enumerate(dados, start=1)
+
+
+def _pares_kpi(valor):
+    """Pares (nome, nível) de um objeto JSON ou de um texto 'Nome=4; Outro=3'."""
+    if not valor:
+        return []
+    if isinstance(valor, dict):
+        return list(valor.items())
+    if not isinstance(valor, str):
+        raise FeedbackInvalido('KPIs devem ser um objeto ou um texto no formato "Nome=nível; Nome=nível".')
+    pares = []
+    for item in valor.split(';'):
+        nome, _, nivel = item.partition('=')
+        pares.append((nome, nivel))
+    return pares
+
+
+def _data_feedback(valor):
+    if not valor:
+        return datetime.utcnow()
+    try:
+        return datetime.combine(date.fromisoformat(str(valor).strip()), datetime.min.time())
+    except ValueError:
+        raise FeedbackInvalido(f"Data inválida '{valor}'. Use AAAA-MM-DD.")
+
+
+def _tem_caractere_nulo(valor):
+    if isinstance(valor, str):
+        return '\x00' in valor
+    if isinstance(valor, dict):
+        return any(_tem_caractere_nulo(chave) or _tem_caractere_nulo(item) for chave, item in valor.items())
+    if isinstance(valor, list):
+        return any(_tem_caractere_nulo(item) for item in valor)
+    return False
+
+
+def validar_linha(linha):
+    """Valida uma linha do arquivo com as regras do formulário e devolve os campos do feedback."""
+    if isinstance(linha, FeedbackInvalido):
+        raise linha
+    if not isinstance(linha, dict):
+        raise FeedbackInvalido('Linha malformada: esperado um objeto com os campos do feedback.')
+    if _tem_caractere_nulo(linha):
+        raise FeedbackInvalido('A linha contém caracteres nulos; confira a codificação do arquivo.')
+
+    employee_id = str(linha.get('employee_id') or '').strip()
+    email = str(linha.get('email') or '').strip().lower()
+    if not employee_id and not email:
+        raise FeedbackInvalido('Informe employee_id ou email do funcionário.')
+    if employee_id and not employee_id.isdigit():
+        raise FeedbackInvalido(f"employee_id inválido '{employee_id}'.")
+
+    descricao = str(linha.get('descricao') or '').strip()
+    if not descricao:
+        raise FeedbackInvalido('A descrição do feedback é obrigatória.')
+
+    kpis = linha.get('kpis') if isinstance(linha.get('kpis'), dict) else {}
+    return {
+        'employee_id': int(employee_id) if employee_id else None,
+        'email': email or None,
+        'descricao': descricao,
+        'tipo_feedback': str(linha.get('tipo_feedback') or '').strip() or None,
+        'pontuacao_geral': validar_pontuacao(linha.get('pontuacao_geral')),
+        'kpis': validar_kpis(_pares_kpi(linha.get('qualidades') or kpis.get('qualidades')),
+                             _pares_kpi(linha.get('defeitos') or kpis.get('defeitos'))),
+        'data_feedback': _data_feedback(linha.get('data_feedback')),
+    }
+
+
+def _funcionarios_do_lote(validos):
+    """Uma query por lote: id e e-mail -> (employee_id, active)."""
+    ids = {dados['employee_id'] for _, dados in validos if dados['employee_id']}
+    emails = {dados['email'] for _, dados in validos if not dados['employee_id']}
+    if not ids and not emails:
+        return {}, {}
+    linhas = db.session.query(Employees.id, Employees.active, User.email)\
+        .join(User, User.id == Employees.user_id)\
+        .filter(db.or_(Employees.id.in_(ids), db.func.lower(User.email).in_(emails)))\
+        .all()
+    por_id = {employee_id: (employee_id, active) for employee_id, active, _ in linhas}
+    por_email = {email.lower(): (employee_id, active) for employee_id, active, email in linhas}
+    return por_id, por_email
+
+
+def importar_feedbacks(linhas, giver_id, tamanho_lote=TAMANHO_LOTE):
+    """
+    Importa os feedbacks de 'linhas' ((número, dict), como ler_linhas) em nome de
+    'giver_id'. Não faz commit; devolve um ResultadoImportacao.
+    """
+    resultado = ResultadoImportacao()
+    linhas = iter(linhas)
+    while True:
+        lote = list(islice(linhas, tamanho_lote))
+        if not lote:
+            break
+
+        validos = []
+        for numero, linha in lote:
+            try:
+                validos.append((numero, validar_linha(linha)))
+            except FeedbackInvalido as erro:
+                resultado.erros.append((numero, str(erro)))
+
+        por_id, por_email = _funcionarios_do_lote(validos)
+        registros = []
+        for numero, dados in validos:
+            referencia = dados.pop('employee_id'), dados.pop('email')
+            funcionario = por_id.get(referencia[0]) if referencia[0] else por_email.get(referencia[1])
+            if funcionario is None:
+                resultado.erros.append((numero, f"Funcionário '{referencia[0] or referencia[1]}' não encontrado."))
+                continue
+            employee_id, active = funcionario
+            if not active:
+                resultado.erros.append((numero, 'Não é possível dar feedback para um funcionário inativo.'))
+                continue
+            registros.append(dict(dados, employee_id=employee_id, giver_id=giver_id))
+
+        if registros:
+            db.session.execute(insert(Feedback), registros)
+            resultado.importados += len(registros)
+            resultado.funcionarios.update(r['employee_id'] for r in registros)
+
+    resultado.erros.sort()
+    if resultado.importados:
+        # INSERT em lote não passa pelo flush do ORM: invalida os KPIs à mão.
+        invalidar_kpis(kpis_afetados({Feedback}))
+        recalcular_medias(employee_ids=resultado.funcionarios)
+    return resultado
@@ -0,0 +1,109 @@
+# app/utils/kpi_paralelo.py
+"""
+Cálculo paralelo dos KPIs do lote (/kpis/api/batch).
+
+Cada KPI roda numa thread de um pool limitado ao tamanho do pool de conexões
+do SQLAlchemy, com sua própria sessão/conexão. No PostgreSQL a requisição
+exporta o snapshot da sua transação (pg_export_snapshot) e cada worker o
+importa (SET TRANSACTION SNAPSHOT), então todos os widgets continuam lendo o
+mesmo estado do banco. Cada widget tem seu timeout; os que estouram voltam
+como erro e o resto do lote é entregue normalmente.
+
+O snapshot recalculado é gravado pelo próprio worker depois de encerrar a
+transação REPEATABLE READ, numa transação nova (READ COMMITTED): dentro do
+snapshot importado, o upsert concorrente de outro lote falharia por serialização.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from flask import current_app
+from sqlalchemy import text
+
+from app.extensions import db
+from app.utils.kpi_snapshots import obter_kpi, iniciar_transacao_consistente, formatar_gerado_em, salvar_snapshots
+from app.utils.replica import DESTINO_LEITURA, destino_leitura
+
+
+def _executor(app):
+    """Pool de threads da aplicação, criado na primeira chamada."""
+    executor = app.extensions.get('kpi_executor')
+    if executor is None:
+        tamanho_pool = getattr(db.engine.pool, 'size', lambda: None)()
+        max_workers = app.config.get('KPI_POOL_WORKERS', 4)
+        if tamanho_pool:
+            # Deixa ao menos uma conexão livre para a própria requisição.
+            max_workers = max(1, min(max_workers, tamanho_pool - 1))
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='kpi')
+        app.extensions['kpi_executor'] = executor
+    return executor
+
+
+def timeout_do_kpi(nome):
+    timeouts = current_app.config.get('KPI_TIMEOUTS', {})
+    return timeouts.get(nome, current_app.config.get('KPI_TIMEOUT_PADRAO', 10))
+
+
+def _calcular_no_worker(app, nome, forcar, snapshot_id, timeout, destino):
+    with app.app_context():
+        # Lê do mesmo banco da requisição (primário ou réplica), onde o snapshot foi exportado.
+        db.session.info[DESTINO_LEITURA] = destino
+        if db.engine.dialect.name == 'postgresql':
+            db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+            if snapshot_id:
+                db.session.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+            # Cancela a query no servidor se o widget estourar o tempo, liberando a conexão.
+            db.session.execute(text(f"SET LOCAL statement_timeout = {int(timeout * 1000)}"))
+        pendentes = []
+        try:
+            dados, gerado_em, origem = obter_kpi(nome, forcar=forcar, pendentes=pendentes)
+        finally:
+            db.session.rollback()
+        salvar_snapshots(pendentes)
+        return {'dados': dados, 'gerado_em': formatar_gerado_em(gerado_em), 'origem': origem}
+
+
+def obter_kpis_em_paralelo(nomes, forcar=False):
+    """
+    Gera (nome, resultado) na ordem em que os KPIs ficam prontos.
+    Falhas e timeouts viram {'erro': ...} sem interromper os demais.
+    """
+    app = current_app._get_current_object()
+    executor = _executor(app)
+
+    snapshot_id = None
+    destino = destino_leitura()
+    iniciar_transacao_consistente()
+    if db.engine.dialect.name == 'postgresql':
+        snapshot_id = db.session.execute(text("SELECT pg_export_snapshot()")).scalar()
+
+    try:
+        inicio = time.monotonic()
+        prazos, pendentes = {}, {}
+        for nome in nomes:
+            timeout = timeout_do_kpi(nome)
+            future = executor.submit(_calcular_no_worker, app, nome, forcar, snapshot_id, timeout, destino)
+            pendentes[future] = nome
+            prazos[future] = inicio + timeout
+
+        while pendentes:
+            agora = time.monotonic()
+            proximo_prazo = min(prazos[f] for f in pendentes)
+            prontos, _ = wait(list(pendentes), timeout=max(0, proximo_prazo - agora), return_when=FIRST_COMPLETED)
+
+            for future in prontos:
+                nome = pendentes.pop(future)
+                try:
+                    yield nome, future.result()
+                except Exception:
+                    app.logger.exception('Falha ao calcular o KPI %s no lote', nome)
+                    yield nome, {'erro': 'Falha ao calcular o KPI.'}
+
+            agora = time.monotonic()
+            for future in [f for f in pendentes if prazos[f] <= agora]:
+                nome = pendentes.pop(future)
+                future.cancel()
+                app.logger.warning('KPI %s excedeu o timeout de %ss no lote', nome, timeout_do_kpi(nome))
+                yield nome, {'erro': 'Tempo limite excedido.'}
+    finally:
+        # A transação que exportou o snapshot só pode fechar depois que os workers o importaram.
+        db.session.rollback()
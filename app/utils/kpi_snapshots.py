@@ -0,0 +1,283 @@
+# app/utils/kpi_snapshots.py
+"""
+Armazém de snapshots dos KPIs do hub de analytics.
+
+Cada KPI registrado aqui tem uma função de cálculo que devolve dados já
+serializáveis em JSON. Os endpoints leem o snapshot vigente da tabela
+'kpi_snapshots' e só recalculam ao vivo quando não existe snapshot, quando ele
+passou de KPI_SNAPSHOT_MAX_AGE segundos, quando foi invalidado por uma
+escrita nas tabelas de origem (hook after_flush abaixo) ou quando a URL pede
+'?fresh=1'.
+
+O recálculo sobrescreve a linha vigente do KPI (upsert), então a tabela não
+cresce com o tráfego; só o job 'flask kpi atualizar' grava cópias no histórico.
+Parâmetros avulsos (?months=, ?team_id=...) são calculados ao vivo, sem snapshot.
+"""
+from datetime import datetime, timedelta
+
+from flask import current_app, jsonify, request
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.extensions import db
+from app.utils.metricas import registro
+from app.models import KpiSnapshot, Employees, TeamMember, PromotionLog, Feedback, Team
+
+PERIODO_PADRAO = 'padrao'
+
+# nome do KPI -> função de cálculo (recebe os parâmetros do período como kwargs)
+KPI_CALCULOS = {}
+
+# Model de origem -> KPIs que leem essa tabela. Uma escrita em qualquer linha do
+# model invalida apenas os snapshots desses KPIs.
+KPI_DEPENDENCIAS = {
+    Employees: {'vital-metrics', 'employee-journey-sankey', 'performance-distribution', 'performance-by-team'},
+    TeamMember: {'vital-metrics', 'employee-journey-sankey', 'headcount-flow', 'performance-by-team', 'feedback-kpis'},
+    PromotionLog: {'employee-journey-sankey'},
+    Feedback: {'performance-distribution', 'performance-by-team', 'feedback-kpis'},
+    Team: {'performance-by-team', 'feedback-kpis'},
+}
+
+# Refinamento por coluna para UPDATEs: alterar só o salário de um funcionário
+# não deve derrubar o sankey nem a distribuição de performance. Colunas fora
+# deste mapa caem na dependência do model inteiro.
+KPI_DEPENDENCIAS_COLUNAS = {
+    Employees: {
+        'salario': {'vital-metrics'},
+        'cargo': {'employee-journey-sankey'},
+        'media_feedbacks': {'performance-distribution', 'performance-by-team'},
+    },
+    Team: {
+        'descricao': set(),
+        'gestor_id': set(),
+    },
+}
+
+
+def registrar_kpi(nome):
+    """Decorator que registra a função de cálculo de um KPI."""
+    def decorator(func):
+        KPI_CALCULOS[nome] = func
+        return func
+    return decorator
+
+
+def calcular_kpi(nome, **params):
+    """Executa o cálculo ao vivo de um KPI registrado."""
+    return KPI_CALCULOS[nome](**params)
+
+
+def kpis_afetados(models):
+    """KPIs que dependem de pelo menos um dos models informados."""
+    afetados = set()
+    for model in models:
+        afetados |= KPI_DEPENDENCIAS.get(model, set())
+    return afetados
+
+
+def kpis_afetados_por_update(obj):
+    """KPIs afetados por um objeto alterado, olhando só as colunas que mudaram."""
+    model = type(obj)
+    colunas = KPI_DEPENDENCIAS_COLUNAS.get(model)
+    if colunas is None:
+        return KPI_DEPENDENCIAS.get(model, set())
+
+    estado = inspect(obj)
+    afetados = set()
+    for attr in estado.mapper.column_attrs:
+        if not estado.attrs[attr.key].history.has_changes():
+            continue
+        if attr.key not in colunas:
+            return KPI_DEPENDENCIAS.get(model, set())
+        afetados |= colunas[attr.key]
+    return afetados
+
+
+def invalidar_kpis(nomes, connection=None):
+    """
+    Marca como inválidos os snapshots vigentes dos KPIs informados, em todos os
+    períodos. Usa a conexão da sessão para participar da mesma transação da escrita.
+    """
+    if not nomes:
+        return
+    tabela = KpiSnapshot.__table__
+    stmt = tabela.update()\
+        .where(tabela.c.kpi.in_(sorted(nomes)), tabela.c.historico.is_(False), tabela.c.invalidado_em.is_(None))\
+        .values(invalidado_em=datetime.utcnow())
+    # bind_arguments: com réplica configurada, o UPDATE vai para o primário.
+    (connection or db.session.connection(bind_arguments={'clause': stmt})).execute(stmt)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _invalidar_apos_flush(session, flush_context):
+    """Invalida os KPIs que leem as tabelas alteradas neste flush."""
+    afetados = kpis_afetados({type(obj) for obj in session.new} | {type(obj) for obj in session.deleted})
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            afetados |= kpis_afetados_por_update(obj)
+    invalidar_kpis(afetados, connection=session.connection())
+
+
+def snapshot_vigente(nome, periodo=PERIODO_PADRAO):
+    return KpiSnapshot.query.filter_by(kpi=nome, periodo=periodo, historico=False).first()
+
+
+def salvar_snapshot(nome, dados, periodo=PERIODO_PADRAO, commit=True, historico=False, gerado_em=None):
+    """
+    Sobrescreve o snapshot vigente do KPI (INSERT ... ON CONFLICT) e devolve a
+    data do cálculo. Com historico=True grava também uma cópia no histórico.
+    """
+    gerado_em = gerado_em or datetime.utcnow()
+    tabela = KpiSnapshot.__table__
+    valores = {'kpi': nome, 'periodo': periodo, 'dados': dados, 'gerado_em': gerado_em}
+    stmt = pg_insert(tabela).values(**valores, historico=False)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['kpi', 'periodo'],
+        index_where=~tabela.c.historico,
+        set_={'dados': stmt.excluded.dados, 'gerado_em': stmt.excluded.gerado_em, 'invalidado_em': None},
+    )
+    db.session.execute(stmt)
+    if historico:
+        db.session.execute(tabela.insert().values(**valores, historico=True))
+    if commit:
+        db.session.commit()
+    return gerado_em
+
+
+def salvar_snapshots(calculados):
+    """
+    Grava [(nome, dados, gerado_em)] recalculados por um lote, numa transação
+    própria. Deve rodar fora da transação REPEATABLE READ da leitura: lá, o
+    upsert concorrente de outro lote na mesma linha falharia por serialização.
+    Uma falha aqui só vai para o log; os dados já foram calculados e entregues.
+    """
+    if not calculados:
+        return
+    try:
+        # Sempre na mesma ordem, para dois lotes simultâneos não travarem um ao outro.
+        for nome, dados, gerado_em in sorted(calculados, key=lambda calculado: calculado[0]):
+            salvar_snapshot(nome, dados, commit=False, gerado_em=gerado_em)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.warning('Falha ao gravar os snapshots de %s', [c[0] for c in calculados], exc_info=True)
+
+
+def snapshot_expirado(snapshot):
+    if snapshot.invalidado_em is not None:
+        return True
+    max_age = current_app.config.get('KPI_SNAPSHOT_MAX_AGE')
+    if not max_age:
+        return False
+    return datetime.utcnow() - snapshot.gerado_em > timedelta(seconds=max_age)
+
+
+def obter_kpi(nome, forcar=False, pendentes=None, **params):
+    """
+    Devolve (dados, gerado_em, origem) de um KPI.
+    'origem' é 'snapshot' quando veio do armazém e 'live' quando foi recalculado.
+    Com uma lista em 'pendentes' o recálculo não é gravado: (nome, dados, gerado_em)
+    vai para a lista e o chamador grava depois com salvar_snapshots.
+    """
+    if params:
+        # Combinação avulsa de parâmetros: calcula sem gravar snapshot.
+        registro.contar('tower_kpi_consultas_total', kpi=nome, origem='live')
+        return calcular_kpi(nome, **params), datetime.utcnow(), 'live'
+
+    if not forcar:
+        snapshot = snapshot_vigente(nome)
+        if snapshot and not snapshot_expirado(snapshot):
+            registro.contar('tower_kpi_consultas_total', kpi=nome, origem='snapshot')
+            return snapshot.dados, snapshot.gerado_em, 'snapshot'
+
+    dados = calcular_kpi(nome)
+    if pendentes is None:
+        gerado_em = salvar_snapshot(nome, dados)
+    else:
+        gerado_em = datetime.utcnow()
+        pendentes.append((nome, dados, gerado_em))
+    registro.contar('tower_kpi_consultas_total', kpi=nome, origem='live')
+    return dados, gerado_em, 'live'
+
+
+def iniciar_transacao_consistente():
+    """
+    Encerra a transação corrente (ex.: a aberta pelo load_user) e abre outra em
+    REPEATABLE READ no PostgreSQL, para que vários KPIs leiam o mesmo estado do banco.
+    """
+    db.session.commit()
+    if db.engine.dialect.name == 'postgresql':
+        db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+
+def obter_kpis_em_lote(nomes, forcar=False):
+    """
+    Gera (nome, resultado) para cada KPI, todos na mesma sessão e na mesma
+    transação. Cada KPI roda num SAVEPOINT: a falha de um vira {'erro': ...}
+    sem derrubar os outros. Os snapshots recalculados são gravados depois, fora
+    da transação REPEATABLE READ (salvar_snapshots).
+    """
+    iniciar_transacao_consistente()
+    concluido = False
+    pendentes = []
+    try:
+        for nome in nomes:
+            try:
+                with db.session.begin_nested():
+                    dados, gerado_em, origem = obter_kpi(nome, forcar=forcar, pendentes=pendentes)
+            except Exception:
+                current_app.logger.exception('Falha ao calcular o KPI %s no lote', nome)
+                yield nome, {'erro': 'Falha ao calcular o KPI.'}
+                continue
+            yield nome, {'dados': dados, 'gerado_em': formatar_gerado_em(gerado_em), 'origem': origem}
+        db.session.commit()
+        concluido = True
+    finally:
+        if not concluido:
+            db.session.rollback()
+    salvar_snapshots(pendentes)
+
+
+def formatar_gerado_em(gerado_em):
+    return gerado_em.isoformat() + 'Z'
+
+
+def pedido_fresh():
+    return request.args.get('fresh', '').lower() in ('1', 'true', 'sim')
+
+
+def resposta_kpi(nome, **params):
+    """
+    Resposta JSON de um endpoint de KPI. O corpo mantém o formato original do
+    endpoint; a data do cálculo vai nos cabeçalhos X-KPI-Gerado-Em e Last-Modified.
+    """
+    dados, gerado_em, origem = obter_kpi(nome, forcar=pedido_fresh(), **params)
+    response = jsonify(dados)
+    response.headers['X-KPI-Gerado-Em'] = formatar_gerado_em(gerado_em)
+    response.headers['X-KPI-Origem'] = origem
+    response.last_modified = gerado_em
+    response.cache_control.no_cache = True
+    return response
+
+
+def atualizar_snapshots(nomes=None):
+    """
+    Recalcula os snapshots vigentes e grava uma cópia de cada no histórico
+    (job usado pelo comando 'flask kpi atualizar'). Devolve [(nome, gerado_em)].
+    """
+    nomes = nomes or list(KPI_CALCULOS)
+    gerados = []
+    for nome in nomes:
+        dados = calcular_kpi(nome)
+        gerados.append((nome, salvar_snapshot(nome, dados, historico=True)))
+    return gerados
+
+
+def limpar_snapshots_antigos(manter_dias=30):
+    """Remove do histórico os snapshots com mais de 'manter_dias' dias (os vigentes ficam)."""
+    limite = datetime.utcnow() - timedelta(days=manter_dias)
+    removidos = KpiSnapshot.query.filter(KpiSnapshot.historico.is_(True), KpiSnapshot.gerado_em < limite)\
+        .delete(synchronize_session=False)
+    db.session.commit()
+    return removidos
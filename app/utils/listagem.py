@@ -0,0 +1,157 @@
+# app/utils/listagem.py
+"""
+Listagem paginada de funcionários compartilhada por /funcionarios/, /promocoes/,
+/salarios/ e /feedbacks/ (e pela API /funcionarios/api/lista).
+
+Os parâmetros vêm da query string:
+
+    pagina, por_pagina          -> paginação (por_pagina limitado a POR_PAGINA_MAX)
+    ordem, direcao              -> nome | cargo | media_feedbacks | data_entrada, asc | desc
+    status, cargo, team_id, q   -> filtros (status: ativo | inativo | todos; q busca no nome/e-mail)
+
+Cada página consulta só as linhas que exibe (COUNT + SELECT com LIMIT/OFFSET),
+com o usuário já carregado no mesmo SELECT.
+"""
+from flask import abort, render_template, request, url_for
+from sqlalchemy import exists
+from sqlalchemy.orm import contains_eager
+
+from app.extensions import db
+from app.models import User, Employees, Team, TeamMember
+
+POR_PAGINA_PADRAO = 25
+POR_PAGINA_MAX = 100
+
+ORDENACOES = {
+    'nome': User.nome,
+    'cargo': Employees.cargo,
+    'media_feedbacks': Employees.media_feedbacks,
+    'data_entrada': Employees.data_entrada,
+}
+STATUS = ('ativo', 'inativo', 'todos')
+
+
+class ParametrosInvalidos(ValueError):
+    pass
+
+
+def _inteiro(nome, padrao, minimo=1, maximo=None):
+    valor = request.args.get(nome)
+    if valor in (None, ''):
+        return padrao
+    try:
+        valor = int(valor)
+    except ValueError:
+        raise ParametrosInvalidos(f"Parâmetro '{nome}' inválido.")
+    if valor < minimo or (maximo is not None and valor > maximo):
+        raise ParametrosInvalidos(f"Parâmetro '{nome}' fora do intervalo permitido.")
+    return valor
+
+
+def ler_parametros(ordem='nome', direcao='asc', status='todos'):
+    """
+    Lê e valida os parâmetros da listagem na query string. Os argumentos são os
+    padrões da tela. Levanta ParametrosInvalidos para valores fora do esperado.
+    """
+    params = {
+        'pagina': _inteiro('pagina', 1),
+        'por_pagina': _inteiro('por_pagina', POR_PAGINA_PADRAO, maximo=POR_PAGINA_MAX),
+        'ordem': request.args.get('ordem') or ordem,
+        'direcao': request.args.get('direcao') or direcao,
+        'status': request.args.get('status') or status,
+        'cargo': (request.args.get('cargo') or '').strip() or None,
+        'team_id': _inteiro('team_id', None),
+        'q': (request.args.get('q') or '').strip() or None,
+    }
+    if params['ordem'] not in ORDENACOES:
+        raise ParametrosInvalidos(f"Ordenação inválida. Use: {', '.join(ORDENACOES)}.")
+    if params['direcao'] not in ('asc', 'desc'):
+        raise ParametrosInvalidos("Direção inválida. Use 'asc' ou 'desc'.")
+    if params['status'] not in STATUS:
+        raise ParametrosInvalidos(f"Status inválido. Use: {', '.join(STATUS)}.")
+    return params
+
+
+def consulta_funcionarios(params):
+    """Query de Employees (com User já carregado) com os filtros e a ordenação pedidos."""
+    query = Employees.query.join(Employees.user).options(contains_eager(Employees.user))
+
+    if params['status'] != 'todos':
+        query = query.filter(Employees.active == (params['status'] == 'ativo'))
+    if params['cargo']:
+        query = query.filter(Employees.cargo == params['cargo'])
+    if params['team_id']:
+        query = query.filter(exists().where(TeamMember.user_id == Employees.user_id,
+                                            TeamMember.team_id == params['team_id'],
+                                            TeamMember.status == 'ativo'))
+    if params['q']:
+        termo = f"%{params['q']}%"
+        query = query.filter(db.or_(User.nome.ilike(termo), User.email.ilike(termo)))
+
+    coluna = ORDENACOES[params['ordem']]
+    coluna = coluna.desc() if params['direcao'] == 'desc' else coluna.asc()
+    # Desempate pelo id para a paginação ser estável entre as páginas.
+    return query.order_by(coluna.nulls_last(), Employees.id)
+
+
+def paginar_funcionarios(params):
+    """Objeto Pagination do Flask-SQLAlchemy com a página pedida."""
+    return consulta_funcionarios(params).paginate(page=params['pagina'], per_page=params['por_pagina'],
+                                                  error_out=False)
+
+
+def opcoes_filtros():
+    """Valores dos selects de filtro (cargos existentes e times ativos)."""
+    cargos = [c for (c,) in db.session.query(Employees.cargo).distinct().order_by(Employees.cargo)]
+    times = db.session.query(Team.id, Team.nome).filter(Team.status == 'ativo').order_by(Team.nome).all()
+    return {'cargos': cargos, 'times': times}
+
+
+def serializar_funcionario(funcionario):
+    return {
+        'id': funcionario.id,
+        'user_id': funcionario.user_id,
+        'nome': funcionario.user.nome,
+        'email': funcionario.user.email,
+        'profile_picture': funcionario.user.profile_picture,
+        'cargo': funcionario.cargo,
+        'salario': float(funcionario.salario) if funcionario.salario is not None else None,
+        'media_feedbacks': float(funcionario.media_feedbacks) if funcionario.media_feedbacks is not None else None,
+        'data_entrada': funcionario.data_entrada.isoformat() if funcionario.data_entrada else None,
+        'status': funcionario.status,
+        'active': funcionario.active,
+    }
+
+
+def serializar_pagina(paginacao):
+    return {
+        'itens': [serializar_funcionario(f) for f in paginacao.items],
+        'pagina': paginacao.page,
+        'por_pagina': paginacao.per_page,
+        'total': paginacao.total,
+        'paginas': paginacao.pages,
+    }
+
+
+def renderizar_listagem(template, parcial, padroes=None, fixos=None, **contexto):
+    """
+    Renderiza a tela de listagem completa ou, com '?parcial=1', só o trecho da
+    lista (linhas + paginação) que o listagem.js troca sem recarregar a página.
+    'fixos' força parâmetros que a tela não deixa alterar (ex.: status='ativo').
+    """
+    try:
+        params = ler_parametros(**(padroes or {}))
+    except ParametrosInvalidos as erro:
+        abort(400, description=str(erro))
+    params.update(fixos or {})
+    paginacao = paginar_funcionarios(params)
+
+    def url_da_pagina(pagina):
+        args = {k: v for k, v in request.args.items() if k not in ('parcial', 'pagina')}
+        return url_for(request.endpoint, **request.view_args, **args, pagina=pagina)
+
+    contexto.update(funcionarios=paginacao.items, paginacao=paginacao, params=params,
+                    url_da_pagina=url_da_pagina, template_lista=parcial)
+    if request.args.get('parcial'):
+        return render_template(parcial, **contexto)
+    return render_template(template, filtros=opcoes_filtros(), **contexto)
@@ -0,0 +1,69 @@
+# app/utils/media_feedbacks.py
+"""
+Média de feedbacks desnormalizada em 'employees'.
+
+'feedbacks_soma' e 'feedbacks_total' acumulam as pontuações gerais recebidas.
+Cada escrita em Feedback aplica só o delta (nota nova menos nota antiga) num
+único UPDATE, na mesma transação do feedback, e 'media_feedbacks' é derivada
+deles no mesmo statement: o custo não cresce com o histórico do funcionário.
+'flask feedbacks recalcular-medias' reconstrói tudo a partir da tabela feedbacks.
+"""
+from decimal import Decimal
+
+from sqlalchemy import case, func, select
+
+from app.extensions import db
+from app.models import Employees, Feedback
+from app.utils.kpi_snapshots import KPI_DEPENDENCIAS_COLUNAS, invalidar_kpis
+from app.utils.usuarios import marcar_funcionarios_alterados
+
+
+def _decimal(valor):
+    return Decimal(str(valor))
+
+
+def _media(soma, total):
+    # '* 1.0' evita a divisão inteira do SQLite; no PostgreSQL o resultado já é numeric.
+    return case((total > 0, func.round(soma * 1.0 / total, 2)), else_=0)
+
+
+def ajustar_media(employee_id, anterior=None, nova=None):
+    """
+    Aplica a troca de uma pontuação na média do funcionário: inclusão (anterior=None),
+    edição (as duas) ou exclusão (nova=None). Pontuações None não entram na média,
+    como no avg(). Não faz commit.
+    """
+    delta_soma = (_decimal(nova) if nova is not None else 0) - (_decimal(anterior) if anterior is not None else 0)
+    delta_total = (nova is not None) - (anterior is not None)
+    if not delta_soma and not delta_total:
+        return
+
+    funcionarios = Employees.__table__
+    soma = funcionarios.c.feedbacks_soma + delta_soma
+    total = funcionarios.c.feedbacks_total + delta_total
+    db.session.execute(
+        funcionarios.update().where(funcionarios.c.id == employee_id)
+        .values(feedbacks_soma=soma, feedbacks_total=total, media_feedbacks=_media(soma, total))
+    )
+    # O UPDATE não passa pelo flush do ORM: invalida os KPIs e o usuário em cache que leem a média.
+    invalidar_kpis(KPI_DEPENDENCIAS_COLUNAS[Employees]['media_feedbacks'])
+    marcar_funcionarios_alterados([employee_id])
+
+
+def recalcular_medias(employee_ids=None):
+    """Reconstrói soma, total e média a partir dos feedbacks. Não faz commit; devolve as linhas atualizadas."""
+    funcionarios = Employees.__table__
+    feedbacks = Feedback.__table__
+    do_funcionario = feedbacks.c.employee_id == funcionarios.c.id
+
+    soma = func.coalesce(select(func.sum(feedbacks.c.pontuacao_geral)).where(do_funcionario).scalar_subquery(), 0)
+    total = select(func.count(feedbacks.c.pontuacao_geral)).where(do_funcionario).scalar_subquery()
+    stmt = funcionarios.update().values(feedbacks_soma=soma, feedbacks_total=total,
+                                        media_feedbacks=_media(soma, total))
+    if employee_ids is not None:
+        stmt = stmt.where(funcionarios.c.id.in_(employee_ids))
+
+    atualizados = db.session.execute(stmt).rowcount
+    invalidar_kpis(KPI_DEPENDENCIAS_COLUNAS[Employees]['media_feedbacks'])
+    marcar_funcionarios_alterados(employee_ids)
+    return atualizados
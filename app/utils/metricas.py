@@ -0,0 +1,534 @@
+# app/utils/metricas.py
+"""
+Métricas no formato de exposição do Prometheus (/metrics).
+
+Cada worker do gunicorn acumula em memória seus contadores e histogramas e,
+a cada INTERVALO_GRAVACAO segundos (thread do próprio worker), grava o estado
+num arquivo só dele em METRICAS_DIR (metricas_<pid>.json, troca atômica). O
+/metrics, atendido por qualquer worker, grava o próprio estado, lê os arquivos
+de todos e soma: contadores e histogramas de todos os processos (inclusive os
+que já terminaram, para as séries não voltarem atrás) e gauges só dos vivos.
+Os arquivos de workers que já terminaram são somados, no scrape, num só
+(metricas_encerrados.json), e o número de arquivos lidos não cresce a cada
+reinício de worker. Outros módulos podem pôr dados próprios no mesmo arquivo
+(RegistroMetricas.anexar), somados entre os processos da mesma forma; é
+assim que o /admin/perf junta os tempos por rota.
+
+Sem METRICAS_DIR (servidor de desenvolvimento) vale a memória do processo; o
+gunicorn.conf.py zera o diretório ao subir e, se a variável não vier
+definida, usa um diretório temporário próprio.
+
+Séries:
+
+    tower_http_requisicoes_total{endpoint,metodo,status}
+    tower_http_duracao_segundos{endpoint}             histograma
+    tower_http_excecoes_total{endpoint}
+    tower_db_pool_*{engine}                           ocupação, overflow, espera e timeouts
+    tower_cache_consultas_total{cache,resultado}      acertos/faltas dos CacheLRU nomeados
+    tower_kpi_consultas_total{kpi,origem}             snapshot ou recálculo (live)
+
+'flask metricas verificar' valida a saída (ver validar_exposicao).
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, got_request_exception, request
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem gunicorn, sem diretório compartilhado
+    fcntl = None
+
+from app.utils.cache import CACHES_NOMEADOS
+from app.utils.conexoes import PoolMonitorado
+
+INTERVALO_GRAVACAO = 1
+ARQUIVO_ENCERRADOS = 'metricas_encerrados.json'
+ARQUIVO_TRAVA = 'metricas.lock'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICAS = {
+    'tower_http_requisicoes_total': ('counter', 'Requisições atendidas por endpoint, método e status.'),
+    'tower_http_duracao_segundos': ('histogram', 'Duração das requisições até o início da resposta.'),
+    'tower_http_excecoes_total': ('counter', 'Exceções não tratadas nas views.'),
+    'tower_db_pool_tamanho': ('gauge', 'pool_size do engine.'),
+    'tower_db_pool_capacidade': ('gauge', 'pool_size + max_overflow do engine.'),
+    'tower_db_pool_em_uso': ('gauge', 'Conexões em uso (checked out).'),
+    'tower_db_pool_overflow': ('gauge', 'Conexões abertas além do pool_size.'),
+    'tower_db_pool_checkouts_total': ('counter', 'Conexões obtidas do pool.'),
+    'tower_db_pool_espera_segundos_total': ('counter', 'Tempo total gasto obtendo conexões do pool.'),
+    'tower_db_pool_timeouts_total': ('counter', 'Checkouts que estouraram o pool_timeout.'),
+    'tower_cache_consultas_total': ('counter', 'Consultas aos caches em memória, por resultado.'),
+    'tower_kpi_consultas_total': ('counter', 'KPIs servidos do snapshot ou recalculados.'),
+}
+
+
+def _chave(nome, labels):
+    return nome, tuple(sorted(labels.items()))
+
+
+def _processo_vivo(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _gravar_json(destino, dados):
+    # Um temporário por thread: o scrape e a thread de gravação podem gravar juntos.
+    temporario = f'{destino}.{threading.get_ident()}.tmp'
+    with open(temporario, 'w', encoding='utf-8') as arquivo:
+        json.dump(dados, arquivo)
+    os.replace(temporario, destino)
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._contadores = {}
+        self._histogramas = {}
+        # Funções chamadas na coleta; devolvem (tipo, nome, labels, valor) com o estado atual do processo.
+        self.coletores = []
+        self.diretorio = None
+        self._gravador = None
+        # nome -> (coletar, somar, zerar) e o instante do último zeramento aplicado de cada um.
+        self._anexos = {}
+        self._zerados = {}
+
+    def _verificar_fork(self):
+        # Um worker recém-criado não herda os números do processo pai.
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._contadores.clear()
+            self._histogramas.clear()
+            self._gravador = None
+
+    def contar(self, nome, valor=1, **labels):
+        with self._lock:
+            self._verificar_fork()
+            chave = _chave(nome, labels)
+            self._contadores[chave] = self._contadores.get(chave, 0) + valor
+
+    def observar(self, nome, valor, **labels):
+        with self._lock:
+            self._verificar_fork()
+            chave = _chave(nome, labels)
+            histograma = self._histogramas.get(chave)
+            if histograma is None:
+                histograma = self._histogramas[chave] = [[0] * len(BUCKETS), 0.0, 0]
+            for posicao, limite in enumerate(BUCKETS):
+                if valor <= limite:
+                    histograma[0][posicao] += 1
+                    break
+            histograma[1] += valor
+            histograma[2] += 1
+
+    # --- Estado do processo e arquivos ----------------------------------------
+
+    def estado(self):
+        """Estado serializável deste processo."""
+        contadores, gauges = [], []
+        for coletor in self.coletores:
+            for tipo, nome, labels, valor in coletor():
+                (gauges if tipo == 'gauge' else contadores).append([nome, labels, valor])
+        with self._lock:
+            self._verificar_fork()
+            contadores += [[nome, dict(labels), valor] for (nome, labels), valor in self._contadores.items()]
+            histogramas = [[nome, dict(labels), list(contagens), soma, total]
+                           for (nome, labels), (contagens, soma, total) in self._histogramas.items()]
+        return {'pid': os.getpid(), 'contadores': contadores, 'gauges': gauges, 'histogramas': histogramas,
+                'anexos': self._estado_anexos()}
+
+    # --- Anexos ----------------------------------------------------------------
+
+    def anexar(self, nome, coletar, somar, zerar):
+        """
+        Dados extras no arquivo do processo: coletar() devolve o estado local
+        (serializável em JSON), somar(lista) junta os de vários processos e
+        zerar() apaga o local.
+        """
+        self._anexos[nome] = (coletar, somar, zerar)
+        self._zerados[nome] = time.time()
+
+    def _marca_zerar(self, nome):
+        return os.path.join(self.diretorio, f'zerar_{nome}')
+
+    def _estado_anexos(self):
+        anexos = {}
+        for nome, (coletar, _, zerar) in self._anexos.items():
+            if self.diretorio:
+                # Outro worker pediu para zerar depois do nosso último zeramento.
+                try:
+                    pedido = os.stat(self._marca_zerar(nome)).st_mtime
+                except OSError:
+                    pedido = 0
+                if pedido > self._zerados[nome]:
+                    zerar()
+                    self._zerados[nome] = pedido
+            anexos[nome] = coletar()
+        return anexos
+
+    def anexo(self, nome):
+        """Soma do anexo em todos os processos."""
+        _, somar, _ = self._anexos[nome]
+        return somar([estado['anexos'][nome] for estado in self.estados() if nome in estado.get('anexos', {})])
+
+    def zerar_anexo(self, nome):
+        """Zera o anexo aqui e nos workers que já terminaram; os vivos zeram o seu na próxima gravação."""
+        _, _, zerar = self._anexos[nome]
+        zerar()
+        if not self.diretorio:
+            return
+        with self._travar():
+            with open(self._marca_zerar(nome), 'w'):
+                pass
+            self._zerados[nome] = os.stat(self._marca_zerar(nome)).st_mtime
+            caminho_encerrados = os.path.join(self.diretorio, ARQUIVO_ENCERRADOS)
+            try:
+                with open(caminho_encerrados, encoding='utf-8') as arquivo:
+                    encerrados = json.load(arquivo)
+            except (OSError, ValueError):
+                encerrados = None
+            if encerrados and encerrados.get('anexos', {}).pop(nome, None) is not None:
+                _gravar_json(caminho_encerrados, encerrados)
+        self.gravar()
+
+    def _arquivo(self, pid):
+        return os.path.join(self.diretorio, f'metricas_{pid}.json')
+
+    def gravar(self):
+        if not self.diretorio:
+            return
+        _gravar_json(self._arquivo(os.getpid()), self.estado())
+
+    def garantir_gravador(self):
+        """Thread que grava o estado periodicamente (uma por processo, criada no primeiro uso)."""
+        if not self.diretorio:
+            return
+        with self._lock:
+            self._verificar_fork()
+            if self._gravador is not None:
+                return
+            self._gravador = threading.Thread(target=self._gravar_periodicamente, name='metricas', daemon=True)
+            self._gravador.start()
+
+    def _gravar_periodicamente(self):
+        pid = os.getpid()
+        while self._pid == pid:
+            time.sleep(INTERVALO_GRAVACAO)
+            try:
+                self.gravar()
+            except OSError:
+                pass
+
+    def estados(self):
+        """Estados de todos os processos: os arquivos do diretório, ou só a memória deste processo."""
+        if not self.diretorio:
+            return [self.estado()]
+        self.gravar()
+        with self._travar():
+            lidos = []
+            for caminho in glob.glob(os.path.join(self.diretorio, 'metricas_*.json')):
+                try:
+                    with open(caminho, encoding='utf-8') as arquivo:
+                        lidos.append((caminho, json.load(arquivo)))
+                except (OSError, ValueError):
+                    continue
+            return self._compactar_encerrados(lidos)
+
+    @contextmanager
+    def _travar(self):
+        # Um scrape por vez: outro worker não pode ler a compactação pela metade.
+        with open(os.path.join(self.diretorio, ARQUIVO_TRAVA), 'a') as trava:
+            if fcntl:
+                fcntl.flock(trava, fcntl.LOCK_EX)
+            yield
+
+    def _compactar_encerrados(self, lidos):
+        """
+        Soma os contadores e histogramas dos workers que terminaram em
+        ARQUIVO_ENCERRADOS e apaga os arquivos deles (gauges de processo morto
+        não contam). Chamado com a trava do diretório.
+        """
+        caminho_encerrados = os.path.join(self.diretorio, ARQUIVO_ENCERRADOS)
+        mortos = {caminho: estado for caminho, estado in lidos
+                  if caminho != caminho_encerrados and not _processo_vivo(estado['pid'])}
+        if not mortos:
+            return [estado for _, estado in lidos]
+
+        anterior = [estado for caminho, estado in lidos if caminho == caminho_encerrados]
+        contadores, _, histogramas = _somar(anterior + list(mortos.values()))
+        acumulado = {
+            'pid': None,
+            'contadores': [[nome, dict(labels), valor] for (nome, labels), valor in contadores.items()],
+            'gauges': [],
+            'histogramas': [[nome, dict(labels), contagens, soma, total]
+                            for (nome, labels), (contagens, soma, total) in histogramas.items()],
+            'anexos': {},
+        }
+        for nome, (_, somar, _) in self._anexos.items():
+            partes = [estado['anexos'][nome] for estado in anterior + list(mortos.values())
+                      if nome in estado.get('anexos', {})]
+            if partes:
+                acumulado['anexos'][nome] = somar(partes)
+        _gravar_json(caminho_encerrados, acumulado)
+        for caminho in mortos:
+            os.remove(caminho)
+        return [acumulado] + [estado for caminho, estado in lidos
+                              if caminho != caminho_encerrados and caminho not in mortos]
+
+
+registro = RegistroMetricas()
+atexit.register(lambda: registro.gravar() if registro.diretorio else None)
+
+
+def limpar_diretorio(diretorio=None):
+    """Apaga os arquivos de métricas (ao subir o servidor, antes dos workers)."""
+    diretorio = diretorio or os.environ.get('METRICAS_DIR')
+    if not diretorio:
+        return
+    os.makedirs(diretorio, exist_ok=True)
+    for caminho in glob.glob(os.path.join(diretorio, 'metricas_*.json*')):
+        os.remove(caminho)
+
+
+# --- Coletores ------------------------------------------------------------------
+
+def coletor_pools(engines):
+    def coletar():
+        for nome, engine in engines.items():
+            pool, labels = engine.pool, {'engine': nome or 'default'}
+            if not hasattr(pool, 'checkedout'):
+                continue
+            yield 'gauge', 'tower_db_pool_em_uso', labels, pool.checkedout()
+            if hasattr(pool, 'overflow'):
+                yield 'gauge', 'tower_db_pool_tamanho', labels, pool.size()
+                yield 'gauge', 'tower_db_pool_capacidade', labels, pool.size() + max(0, pool._max_overflow)
+                yield 'gauge', 'tower_db_pool_overflow', labels, max(0, pool.overflow())
+            if isinstance(pool, PoolMonitorado):
+                yield 'counter', 'tower_db_pool_checkouts_total', labels, pool.checkouts
+                yield 'counter', 'tower_db_pool_espera_segundos_total', labels, pool.espera_total
+                yield 'counter', 'tower_db_pool_timeouts_total', labels, pool.timeouts
+    return coletar
+
+
+def coletar_caches():
+    for cache in CACHES_NOMEADOS:
+        yield 'counter', 'tower_cache_consultas_total', {'cache': cache.nome, 'resultado': 'acerto'}, cache.acertos
+        yield 'counter', 'tower_cache_consultas_total', {'cache': cache.nome, 'resultado': 'falta'}, cache.faltas
+
+
+# --- Flask ----------------------------------------------------------------------
+
+# Não entram nas séries HTTP: o próprio scrape e os arquivos estáticos.
+ENDPOINTS_IGNORADOS = {'metricas.metricas', 'static'}
+
+
+def _endpoint():
+    # 404 e afins ficam num rótulo só, para a cardinalidade não crescer com URLs arbitrárias.
+    return request.endpoint or '(sem rota)'
+
+
+def iniciar_metricas(app, engines):
+    """Instrumenta todas as requisições do app e registra os coletores de pool e cache."""
+    if not app.config.get('METRICAS_ATIVAS', True):
+        return
+    registro.diretorio = app.config.get('METRICAS_DIR') or None
+    if registro.diretorio:
+        os.makedirs(registro.diretorio, exist_ok=True)
+    registro.coletores = [coletor_pools(dict(engines)), coletar_caches]
+
+    @app.before_request
+    def _iniciar_cronometro():
+        g._metricas_inicio = time.perf_counter()
+
+    @app.after_request
+    def _registrar_requisicao(response):
+        inicio = g.pop('_metricas_inicio', None)
+        endpoint = _endpoint()
+        if inicio is None or endpoint in ENDPOINTS_IGNORADOS:
+            return response
+        registro.contar('tower_http_requisicoes_total', endpoint=endpoint, metodo=request.method,
+                        status=str(response.status_code))
+        registro.observar('tower_http_duracao_segundos', time.perf_counter() - inicio, endpoint=endpoint)
+        registro.garantir_gravador()
+        return response
+
+    def _registrar_excecao(sender, exception, **extra):
+        registro.contar('tower_http_excecoes_total', endpoint=_endpoint())
+
+    got_request_exception.connect(_registrar_excecao, app, weak=False)
+
+
+# --- Exposição ------------------------------------------------------------------
+
+def _somar(estados):
+    contadores, gauges, histogramas = {}, {}, {}
+    for estado in estados:
+        for nome, labels, valor in estado['contadores']:
+            chave = _chave(nome, labels)
+            contadores[chave] = contadores.get(chave, 0) + valor
+        if _processo_vivo(estado['pid']):
+            for nome, labels, valor in estado['gauges']:
+                chave = _chave(nome, labels)
+                gauges[chave] = gauges.get(chave, 0) + valor
+        for nome, labels, contagens, soma, total in estado['histogramas']:
+            chave = _chave(nome, labels)
+            acumulado = histogramas.setdefault(chave, [[0] * len(BUCKETS), 0.0, 0])
+            acumulado[0] = [a + b for a, b in zip(acumulado[0], contagens)]
+            acumulado[1] += soma
+            acumulado[2] += total
+    return contadores, gauges, histogramas
+
+
+def _escapar(valor):
+    return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, extra=()):
+    pares = [f'{nome}="{_escapar(valor)}"' for nome, valor in (*labels, *extra)]
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def _numero(valor):
+    if math.isinf(valor):
+        return '+Inf' if valor > 0 else '-Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def gerar_exposicao(estados):
+    """Texto no formato de exposição 0.0.4 do Prometheus."""
+    contadores, gauges, histogramas = _somar(estados)
+    series = {**contadores, **gauges}
+    linhas = []
+    for nome, (tipo, ajuda) in METRICAS.items():
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        if tipo == 'histogram':
+            for (_, labels), (contagens, soma, total) in sorted(i for i in histogramas.items() if i[0][0] == nome):
+                acumulado = 0
+                for limite, contagem in zip(BUCKETS, contagens):
+                    acumulado += contagem
+                    linhas.append(f'{nome}_bucket{_labels(labels, [("le", _numero(float(limite)))])} {acumulado}')
+                linhas.append(f'{nome}_bucket{_labels(labels, [("le", "+Inf")])} {total}')
+                linhas.append(f'{nome}_sum{_labels(labels)} {_numero(float(soma))}')
+                linhas.append(f'{nome}_count{_labels(labels)} {total}')
+        else:
+            for (_, labels), valor in sorted(i for i in series.items() if i[0][0] == nome):
+                linhas.append(f'{nome}{_labels(labels)} {_numero(valor)}')
+    return '\n'.join(linhas) + '\n'
+
+
+# --- Validação (scraper) --------------------------------------------------------
+
+_AMOSTRA = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})? (\S+)(?: -?\d+)?$')
+_LABEL = re.compile(r'\s*([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"\s*(?:,|$)')
+_SUFIXOS = {'histogram': ('_bucket', '_sum', '_count'), 'summary': ('_sum', '_count', '')}
+
+
+def _ler_labels(texto):
+    labels, posicao = {}, 0
+    while posicao < len(texto):
+        encontrado = _LABEL.match(texto, posicao)
+        if not encontrado:
+            raise ValueError(f'labels malformados: {{{texto}}}')
+        if encontrado.group(1) in labels:
+            raise ValueError(f'label repetido: {encontrado.group(1)}')
+        labels[encontrado.group(1)] = encontrado.group(2)
+        posicao = encontrado.end()
+    return labels
+
+
+def _float(texto):
+    try:
+        return float({'+Inf': 'inf', '-Inf': '-inf', 'NaN': 'nan'}.get(texto, texto))
+    except ValueError:
+        raise ValueError(f"valor inválido '{texto}'")
+
+
+def validar_exposicao(texto):
+    """
+    Confere um texto de /metrics como um scraper faria. Devolve (erros, famílias, séries):
+    sintaxe das linhas, TYPE antes das amostras, séries repetidas, contadores
+    negativos e histogramas (buckets crescentes, +Inf igual a _count, _sum presente).
+    """
+    erros, tipos, vistas, buckets, contagens, somas = [], {}, set(), {}, {}, set()
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        if not linha.strip():
+            continue
+        if linha.startswith('#'):
+            partes = linha.split(None, 3)
+            if len(partes) >= 4 and partes[1] == 'TYPE':
+                if partes[2] in tipos:
+                    erros.append(f'linha {numero}: TYPE repetido para {partes[2]}')
+                tipos[partes[2]] = partes[3]
+            continue
+
+        encontrado = _AMOSTRA.match(linha)
+        if not encontrado:
+            erros.append(f'linha {numero}: amostra malformada: {linha}')
+            continue
+        nome, texto_labels, texto_valor = encontrado.groups()
+        try:
+            labels = _ler_labels(texto_labels or '')
+            valor = _float(texto_valor)
+        except ValueError as erro:
+            erros.append(f'linha {numero}: {erro}')
+            continue
+
+        familia, sufixo = nome, ''
+        if nome not in tipos:
+            for tipo_familia, sufixos in _SUFIXOS.items():
+                for candidato in sufixos:
+                    if candidato and nome.endswith(candidato) and tipos.get(nome[:-len(candidato)]) == tipo_familia:
+                        familia, sufixo = nome[:-len(candidato)], candidato
+        tipo = tipos.get(familia)
+        if tipo is None:
+            erros.append(f'linha {numero}: {nome} sem # TYPE antes')
+            continue
+
+        serie = (nome, tuple(sorted(labels.items())))
+        if serie in vistas:
+            erros.append(f'linha {numero}: série repetida {nome}{{{texto_labels or ""}}}')
+        vistas.add(serie)
+
+        if tipo == 'counter' and not valor >= 0:
+            erros.append(f'linha {numero}: contador {nome} negativo ou inválido ({texto_valor})')
+        if tipo == 'histogram':
+            base = tuple(sorted((k, v) for k, v in labels.items() if k != 'le'))
+            if sufixo == '_bucket':
+                if 'le' not in labels:
+                    erros.append(f'linha {numero}: bucket sem label le')
+                    continue
+                buckets.setdefault((familia, base), []).append((_float(labels['le']), valor))
+            elif sufixo == '_count':
+                contagens[(familia, base)] = valor
+            elif sufixo == '_sum':
+                somas.add((familia, base))
+
+    for (familia, base), pontos in buckets.items():
+        rotulo = f'{familia}{dict(base)}'
+        if [le for le, _ in pontos] != sorted(le for le, _ in pontos):
+            erros.append(f'{rotulo}: buckets fora de ordem')
+        if any(b[1] < a[1] for a, b in zip(pontos, pontos[1:])):
+            erros.append(f'{rotulo}: buckets não cumulativos')
+        if not pontos or not math.isinf(pontos[-1][0]):
+            erros.append(f'{rotulo}: falta o bucket le="+Inf"')
+        elif contagens.get((familia, base)) != pontos[-1][1]:
+            erros.append(f'{rotulo}: bucket +Inf diferente de _count')
+        if (familia, base) not in somas:
+            erros.append(f'{rotulo}: falta _sum')
+    return erros, len(tipos), len(vistas)
@@ -0,0 +1,180 @@
+# app/utils/orcamento_rotas.py
+"""
+Orçamento de queries das telas de listagem (tests/test_orcamento_rotas.py e
+flask perf verificar-rotas) e EXPLAIN das queries de cada rota (flask perf explicar).
+
+Cada rota é renderizada pelo test client, logada como um usuário existente, e
+o número de statements SQL é comparado com um limite fixo: com o eager loading
+certo o total não depende da quantidade de linhas, então um N+1 no template
+estoura o limite assim que a base tem volume (ver 'flask perf semear').
+"""
+import json
+
+from flask import g, url_for
+from sqlalchemy import text
+
+from app.extensions import db
+from app.models import Employees, Team, Jornada
+from app.utils.sql_counter import contar_queries
+from app.utils.replica import lag_replica, replica_configurada
+from app.utils.usuarios import cache_usuarios
+
+# (endpoint, {parâmetro da URL: model cujo primeiro id é usado}, limite de queries)
+# O limite inclui a query do load_user (medido com o cache de usuários vazio). As listagens paginadas (app/utils/listagem.py)
+# fazem COUNT + página + os dois selects de filtro.
+ORCAMENTO_ROTAS = [
+    ('funcionarios.lista_funcionarios', {}, 5),
+    ('funcionarios.api_lista_funcionarios', {}, 3),
+    ('funcionarios.api_search', {}, 2),
+    ('times.times_list', {}, 3),
+    ('times.detalhes_time', {'time_id': Team}, 3),
+    ('times.adicionar_membro', {'time_id': Team}, 2),
+    ('milestones.list_milestones', {}, 2),
+    ('milestones.add_milestone', {}, 2),
+    ('feedbacks.dashboard_feedbacks', {}, 5),
+    ('feedbacks.ver_feedbacks_funcionario', {'employee_id': Employees}, 3),
+    ('promocoes.lista_funcionarios', {}, 5),
+    ('salarios.index', {}, 5),
+    # Usuário, funcionário, série do gráfico e a página da tabela (LIMIT/OFFSET).
+    ('salarios.painel_financeiro', {'employee_id': Employees}, 4),
+    ('jornadas.timeline', {}, 2),
+    ('jornadas.adicionar_jornada', {}, 2),
+    ('exportacoes.index', {}, 2),
+    # Usuário + tipo conferido no banco por exigir_admin.
+    ('admin.pool', {}, 2),
+    ('admin.perf', {}, 2),
+]
+
+
+# Rotas sem orçamento que também entram no 'flask perf explicar':
+# (endpoint, {parâmetro da URL: model}, query string)
+ROTAS_EXPLAIN_EXTRAS = [
+    ('funcionarios.lista_funcionarios', {}, {'ordem': 'media_feedbacks', 'direcao': 'desc', 'status': 'ativo'}),
+    ('funcionarios.api_search', {}, {'q': 'silva'}),
+    ('jornadas.api_dados_jornada', {}, {}),
+    ('jornadas.api_dados_jornada', {}, {'employee_id': 1, 'tipo': 'Individual'}),
+    ('jornadas.api_comentarios_jornada', {'jornada_id': Jornada}, {}),
+    ('kpi.api_vital_metrics', {}, {'fresh': 1}),
+    ('kpi.api_employee_journey_sankey', {}, {'fresh': 1}),
+    ('kpi.api_performance_distribution', {}, {'fresh': 1}),
+    ('kpi.api_headcount_flow', {}, {'fresh': 1}),
+    ('kpi.api_performance_by_team', {}, {'fresh': 1}),
+    ('kpi.api_feedback_kpis', {}, {'fresh': 1}),
+]
+
+
+def _montar_url(app, endpoint, parametros, query_string=None):
+    valores = {}
+    for nome, model in parametros.items():
+        primeiro = db.session.query(model.id).order_by(model.id).limit(1).scalar()
+        if primeiro is None:
+            return None
+        valores[nome] = primeiro
+    with app.test_request_context():
+        return url_for(endpoint, **valores, **(query_string or {}))
+
+
+def _requisitar(app, usuario_id, rotas):
+    """Faz GET em cada rota logado como 'usuario_id'; gera (endpoint, url, resposta, contador)."""
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['_user_id'] = str(usuario_id)
+        sessao['_fresh'] = True
+
+    for endpoint, parametros, query_string in rotas:
+        url = _montar_url(app, endpoint, parametros, query_string)
+        # O CLI já tem um app context ativo, que o test client reaproveita: zera a
+        # sessão e o usuário em cache para cada requisição medir do zero.
+        db.session.remove()
+        g.pop('_login_user', None)
+        cache_usuarios.invalidar()
+        # Mede o atraso da réplica fora da contagem (a medição é cacheada por alguns segundos).
+        if replica_configurada():
+            lag_replica()
+        if url is None:
+            yield endpoint, None, None, None
+            continue
+        with contar_queries(*db.engines.values()) as contador:
+            try:
+                resposta = cliente.get(url)
+            except Exception:
+                # Com TESTING/PROPAGATE_EXCEPTIONS a exceção sobe; conta como 500.
+                app.logger.exception('Falha ao requisitar %s', url)
+                resposta = app.response_class(status=500)
+        yield endpoint, url, resposta, contador
+
+
+def medir_rota(app, usuario_id, endpoint, parametros):
+    """(url, status, total de queries) de um GET na rota; url None se faltam dados para montá-la."""
+    _, url, resposta, contador = next(_requisitar(app, usuario_id, [(endpoint, parametros, None)]))
+    if url is None:
+        return None, None, None
+    return url, resposta.status_code, contador.total
+
+
+def medir_rotas(app, usuario_id):
+    """Gera (endpoint, url, status, total de queries, limite) para cada rota do orçamento."""
+    for endpoint, parametros, limite in ORCAMENTO_ROTAS:
+        yield (endpoint, *medir_rota(app, usuario_id, endpoint, parametros), limite)
+
+
+def _seq_scans(plano):
+    """Nós 'Seq Scan' de um plano do EXPLAIN (FORMAT JSON), recursivamente."""
+    if plano.get('Node Type') == 'Seq Scan':
+        yield plano
+    for filho in plano.get('Plans', []):
+        yield from _seq_scans(filho)
+
+
+def _linhas_da_tabela(relacao, cache):
+    if relacao not in cache:
+        cache[relacao] = db.session.execute(
+            text("SELECT reltuples FROM pg_class WHERE relname = :relacao"), {'relacao': relacao}).scalar() or 0
+    return cache[relacao]
+
+
+def explicar_rotas(app, usuario_id):
+    """
+    Repete cada SELECT emitido pelas rotas com EXPLAIN (FORMAT JSON) e gera
+    (url, statement, seq_scans) por query. Cada Seq Scan vem como dict com
+    'tabela', 'filtro', 'linhas' (estimativa de saída) e 'linhas_tabela'. Só PostgreSQL.
+    """
+    rotas = [(endpoint, parametros, None) for endpoint, parametros, _ in ORCAMENTO_ROTAS]
+    rotas += ROTAS_EXPLAIN_EXTRAS
+    tamanhos = {}
+    for endpoint, url, resposta, contador in _requisitar(app, usuario_id, rotas):
+        if url is None:
+            continue
+        vistos = set()
+        for statement, parametros in contador.execucoes:
+            if not statement.lstrip().upper().startswith(('SELECT', 'WITH')) or statement in vistos:
+                continue
+            vistos.add(statement)
+            raw = db.engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parametros)
+                plano = cursor.fetchone()[0]
+            finally:
+                raw.rollback()
+                raw.close()
+            if isinstance(plano, str):
+                plano = json.loads(plano)
+            scans = [{
+                'tabela': no.get('Relation Name'),
+                'filtro': no.get('Filter'),
+                'linhas': no.get('Plan Rows'),
+                'linhas_tabela': _linhas_da_tabela(no.get('Relation Name'), tamanhos),
+            } for no in _seq_scans(plano[0]['Plan'])]
+            yield url, statement, scans
+
+
+def seq_scan_evitavel(scan, min_linhas=1000, seletividade=0.1):
+    """
+    Seq Scan que um índice evitaria: tabela com pelo menos 'min_linhas' linhas e
+    filtro que descarta a maior parte delas. Varreduras sem filtro (COUNT e
+    agregados sobre a tabela toda) ou com filtro pouco seletivo são o plano certo.
+    """
+    if not scan['filtro'] or scan['linhas_tabela'] < min_linhas:
+        return False
+    return scan['linhas'] < scan['linhas_tabela'] * seletividade
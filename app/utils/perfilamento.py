@@ -0,0 +1,297 @@
+# app/utils/perfilamento.py
+"""
+Perfilamento de SQL por requisição (opt-in: PERFILAMENTO_SQL=1).
+
+Listeners fixos nos engines cronometram cada statement e o anotam num
+ContadorQueries guardado em g durante a requisição. No after_request:
+
+- o cabeçalho Server-Timing leva o tempo de banco (com o número de queries),
+  a query mais lenta, a renderização dos templates e o total da view;
+- o endpoint soma a requisição em histogramas de faixas de 5% (tempo total,
+  banco e renderização) e de número de queries, de onde /admin/perf calcula
+  p50/p95 por rota.
+
+Statements acima de PERF_QUERY_LENTA_MS vão para o log de queries lentas
+(PERF_LOG_QUERIES_LENTAS) com a impressão digital do SQL normalizado:
+parâmetros e literais viram '?' e listas de IN/VALUES colapsam, então
+execuções da mesma query com valores diferentes caem no mesmo grupo. Todos os
+workers escrevem no mesmo arquivo, só acrescentando linhas (WatchedFileHandler):
+a rotação fica com o logrotate, e cada processo reabre o arquivo quando ele é
+trocado. Com PERF_LOG_QUERIES_LENTAS=- o log vai para o stderr, que o gunicorn
+já coleta.
+
+Os histogramas vão no arquivo de métricas de cada worker (anexo 'perf' do
+registro de app/utils/metricas.py) e /admin/perf soma os de todos os workers,
+inclusive os que já terminaram. Em respostas em streaming (exportações, SSE) o
+tempo medido vai até o início do corpo.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import sys
+import threading
+import time
+from logging.handlers import WatchedFileHandler
+
+from flask import (before_render_template, current_app, g, has_app_context, has_request_context, request,
+                   template_rendered)
+from sqlalchemy import event
+
+from app.utils.metricas import registro
+from app.utils.sql_counter import ContadorQueries
+
+logger_queries_lentas = logging.getLogger('app.queries_lentas')
+
+# Ordem das seções em /admin/perf; os demais blueprints vêm depois.
+BLUEPRINTS_PRINCIPAIS = ('auth', 'funcionarios', 'times', 'feedbacks', 'salarios', 'kpi', 'milestones', 'jornadas')
+
+_NORMALIZACOES = [
+    (re.compile(r'/\*.*?\*/|--[^\n]*', re.S), ' '),
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'%\(\w+\)s|%s|(?<!:):\w+|\$\d+'), '?'),
+    (re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(?)'),
+    (re.compile(r'\(\?\)(?:\s*,\s*\(\?\))+'), '(?)'),
+    (re.compile(r'ARRAY\[\s*\?(?:\s*,\s*\?)*\s*\]'), 'ARRAY[?]'),
+    (re.compile(r'\s+'), ' '),
+]
+
+
+def normalizar_sql(statement):
+    """SQL sem valores, para agrupar execuções da mesma query."""
+    for padrao, substituto in _NORMALIZACOES:
+        statement = padrao.sub(substituto, statement)
+    return statement.strip()
+
+
+def impressao_digital(sql_normalizado):
+    return hashlib.md5(sql_normalizado.encode('utf-8')).hexdigest()[:12]
+
+
+# Largura relativa das faixas dos histogramas: o percentil sai com até 5% de erro.
+RAZAO_FAIXAS = 1.05
+_MENOR_MS = 0.001
+
+
+def _faixa(ms):
+    return math.ceil(math.log(max(ms, _MENOR_MS), RAZAO_FAIXAS))
+
+
+def _valor_faixa(faixa):
+    """Limite superior da faixa, em ms."""
+    return RAZAO_FAIXAS ** faixa
+
+
+def percentil(histograma, p):
+    """Percentil por posição (nearest-rank) de um histograma [[valor, contagem], ...]."""
+    total = sum(contagem for _, contagem in histograma)
+    if not total:
+        return None
+    alvo, acumulado = max(1, math.ceil(p / 100 * total)), 0
+    for valor, contagem in sorted(histograma):
+        acumulado += contagem
+        if acumulado >= alvo:
+            return valor
+
+
+class EstatisticasRotas:
+    """Histogramas de cada endpoint e a query mais lenta já vista nele (neste processo)."""
+
+    COLUNAS = ('total', 'banco', 'render', 'queries')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rotas = {}
+
+    def registrar(self, endpoint, total_ms, banco_ms, queries, render_ms, mais_lenta=None):
+        with self._lock:
+            rota = self._rotas.get(endpoint)
+            if rota is None:
+                rota = self._rotas[endpoint] = {coluna: {} for coluna in self.COLUNAS}
+                rota['mais_lenta'] = None
+            for coluna, chave in (('total', _faixa(total_ms)), ('banco', _faixa(banco_ms)),
+                                  ('render', _faixa(render_ms)), ('queries', queries)):
+                rota[coluna][chave] = rota[coluna].get(chave, 0) + 1
+            if mais_lenta and mais_lenta[0] > (rota['mais_lenta'] or (0,))[0]:
+                rota['mais_lenta'] = list(mais_lenta)
+
+    @classmethod
+    def _serializar(cls, rotas):
+        return {
+            endpoint: {**{coluna: list(map(list, rota[coluna].items())) for coluna in cls.COLUNAS},
+                       'mais_lenta': rota['mais_lenta']}
+            for endpoint, rota in rotas.items()
+        }
+
+    def estado(self):
+        """{endpoint: {coluna: [[chave, contagem], ...], 'mais_lenta': ...}}, serializável em JSON."""
+        with self._lock:
+            return self._serializar(self._rotas)
+
+    @classmethod
+    def somar(cls, estados):
+        """Junta os estados de vários processos (mesmo formato de estado())."""
+        somado = {}
+        for estado in estados:
+            for endpoint, rota in estado.items():
+                destino = somado.setdefault(endpoint, {**{coluna: {} for coluna in cls.COLUNAS}, 'mais_lenta': None})
+                for coluna in cls.COLUNAS:
+                    for chave, contagem in rota[coluna]:
+                        destino[coluna][chave] = destino[coluna].get(chave, 0) + contagem
+                if rota['mais_lenta'] and rota['mais_lenta'][0] > (destino['mais_lenta'] or (0,))[0]:
+                    destino['mais_lenta'] = rota['mais_lenta']
+        return cls._serializar(somado)
+
+    @staticmethod
+    def resumo(estado):
+        """{blueprint: [linha por endpoint]} de um estado (somado), com os blueprints principais primeiro."""
+        por_blueprint = {}
+        for endpoint, rota in estado.items():
+            total, banco, render = ([[_valor_faixa(faixa), contagem] for faixa, contagem in rota[coluna]]
+                                    for coluna in ('total', 'banco', 'render'))
+            blueprint = endpoint.rsplit('.', 1)[0] if '.' in endpoint else '(app)'
+            por_blueprint.setdefault(blueprint, []).append({
+                'endpoint': endpoint,
+                'requisicoes': sum(contagem for _, contagem in rota['total']),
+                'total_p50': percentil(total, 50), 'total_p95': percentil(total, 95),
+                'banco_p50': percentil(banco, 50), 'banco_p95': percentil(banco, 95),
+                'queries_p50': percentil(rota['queries'], 50), 'queries_max': max(q for q, _ in rota['queries']),
+                'render_p95': percentil(render, 95),
+                'mais_lenta': rota['mais_lenta'],
+            })
+
+        ordem = {nome: posicao for posicao, nome in enumerate(BLUEPRINTS_PRINCIPAIS)}
+        return {
+            blueprint: sorted(linhas, key=lambda linha: -linha['total_p95'])
+            for blueprint, linhas in sorted(por_blueprint.items(),
+                                            key=lambda item: (ordem.get(item[0], len(ordem)), item[0]))
+        }
+
+    def limpar(self):
+        with self._lock:
+            self._rotas.clear()
+
+
+estatisticas_rotas = EstatisticasRotas()
+
+
+def resumo_rotas():
+    """Resumo de /admin/perf somando todos os workers."""
+    return EstatisticasRotas.resumo(registro.anexo('perf'))
+
+
+def limpar_rotas():
+    registro.zerar_anexo('perf')
+
+
+# --- Engine ---------------------------------------------------------------------
+
+def _antes_do_statement(conn, cursor, statement, parameters, context, executemany):
+    # No contexto da execução, e não na conexão: um statement que falha (statement_timeout) não deixa resto.
+    if context is not None:
+        context._perf_inicio = time.perf_counter()
+
+
+def _depois_do_statement(conn, cursor, statement, parameters, context, executemany):
+    inicio = getattr(context, '_perf_inicio', None)
+    if inicio is None:
+        return
+    segundos = time.perf_counter() - inicio
+
+    if not has_app_context():
+        return
+    contador = g.get('_perf_sql')
+    if contador is not None:
+        contador.registrar(statement, parameters)
+        contador.registrar_duracao(statement, segundos)
+
+    if segundos * 1000 >= current_app.config.get('PERF_QUERY_LENTA_MS', 200):
+        sql = normalizar_sql(statement)
+        endpoint = request.endpoint if has_request_context() else '-'
+        logger_queries_lentas.warning('%.1fms fp=%s endpoint=%s sql=%s',
+                                      segundos * 1000, impressao_digital(sql), endpoint, sql)
+
+
+def _configurar_log(caminho):
+    if caminho == '-':
+        if any(getattr(handler, 'stream', None) is sys.stderr for handler in logger_queries_lentas.handlers):
+            return
+        handler = logging.StreamHandler(sys.stderr)
+    else:
+        caminho = os.path.abspath(caminho)
+        if any(getattr(handler, 'baseFilename', None) == caminho for handler in logger_queries_lentas.handlers):
+            return
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        handler = WatchedFileHandler(caminho, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s pid=%(process)d %(message)s'))
+    logger_queries_lentas.addHandler(handler)
+    logger_queries_lentas.setLevel(logging.WARNING)
+
+
+# --- Requisição -----------------------------------------------------------------
+
+def _inicio_render(sender, template, context, **extra):
+    if '_perf_sql' in g:
+        g._perf_render_inicio = time.perf_counter()
+
+
+def _fim_render(sender, template, context, **extra):
+    inicio = g.pop('_perf_render_inicio', None)
+    if inicio is not None:
+        g._perf_render += time.perf_counter() - inicio
+
+
+def _server_timing(total_ms, contador, render_ms):
+    partes = [f'sql;dur={contador.tempo_total * 1000:.2f};desc="{contador.total} queries"']
+    mais_lenta = contador.mais_lenta
+    if mais_lenta:
+        fp = impressao_digital(normalizar_sql(mais_lenta[1]))
+        partes.append(f'sql-max;dur={mais_lenta[0] * 1000:.2f};desc="{fp}"')
+    partes.append(f'render;dur={render_ms:.2f}')
+    partes.append(f'total;dur={total_ms:.2f}')
+    return ', '.join(partes)
+
+
+def iniciar_perfilamento(app, engines):
+    """Liga o perfilamento se PERFILAMENTO_SQL estiver ativo."""
+    if not app.config.get('PERFILAMENTO_SQL'):
+        return
+
+    registro.anexar('perf', estatisticas_rotas.estado, EstatisticasRotas.somar, estatisticas_rotas.limpar)
+    if app.config.get('PERF_LOG_QUERIES_LENTAS'):
+        _configurar_log(app.config['PERF_LOG_QUERIES_LENTAS'])
+
+    for engine in engines:
+        if event.contains(engine, 'after_cursor_execute', _depois_do_statement):
+            continue
+        event.listen(engine, 'before_cursor_execute', _antes_do_statement)
+        event.listen(engine, 'after_cursor_execute', _depois_do_statement)
+
+    before_render_template.connect(_inicio_render, app)
+    template_rendered.connect(_fim_render, app)
+
+    @app.before_request
+    def _iniciar_medicao():
+        g._perf_inicio = time.perf_counter()
+        g._perf_sql = ContadorQueries()
+        g._perf_render = 0.0
+
+    @app.after_request
+    def _registrar_medicao(response):
+        contador = g.pop('_perf_sql', None)
+        if contador is None:
+            return response
+        total_ms = (time.perf_counter() - g._perf_inicio) * 1000
+        render_ms = g._perf_render * 1000
+        response.headers.add('Server-Timing', _server_timing(total_ms, contador, render_ms))
+
+        if request.endpoint and request.endpoint != 'static':
+            mais_lenta = contador.mais_lenta
+            if mais_lenta:
+                sql = normalizar_sql(mais_lenta[1])
+                mais_lenta = (mais_lenta[0] * 1000, impressao_digital(sql), sql)
+            estatisticas_rotas.registrar(request.endpoint, total_ms, contador.tempo_total * 1000,
+                                         contador.total, render_ms, mais_lenta)
+        return response
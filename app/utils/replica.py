@@ -0,0 +1,123 @@
+# app/utils/replica.py
+"""
+Roteamento de leituras para a réplica (bind 'replica', DATABASE_REPLICA_URL).
+
+db.session é uma SessaoRoteada: numa requisição GET a uma rota somente-leitura
+(ou a um blueprint de REPLICA_BLUEPRINTS, como a API de KPIs) as leituras vão
+para a réplica. Vão para o primário:
+
+- flushes do ORM e statements de escrita (INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE)
+  e, depois da primeira escrita, todas as leituras da mesma sessão;
+- requisições com outros métodos e as rotas de formulário (GET + POST);
+- as requisições do mesmo usuário até REPLICA_LAG_TOLERADO segundos depois de
+  um POST (ler a própria escrita), marcadas na sessão do Flask;
+- tudo, enquanto a réplica estiver atrasada mais que REPLICA_LAG_TOLERADO ou
+  fora do ar (o atraso é medido a cada LAG_TTL segundos por processo).
+
+Sem a réplica configurada, tudo vai para o primário. Para testar localmente
+basta apontar DATABASE_REPLICA_URL para outro banco (uma cópia do primário, ou
+outro arquivo SQLite): a réplica só é lida, nunca escrita.
+"""
+import time
+
+from flask import current_app, g, has_request_context, request, session as sessao_flask
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.utils.cache import CacheLRU
+
+REPLICA = 'replica'
+METODOS_LEITURA = frozenset({'GET', 'HEAD', 'OPTIONS'})
+# Chave em session.info que fixa o destino das leituras fora de requisição (threads do lote de KPIs).
+DESTINO_LEITURA = 'destino_leitura'
+_ESCREVEU = 'escreveu_no_primario'
+_ULTIMA_ESCRITA = '_ultima_escrita'
+
+LAG_TTL = 5
+_cache_lag = CacheLRU(maximo=1, ttl=LAG_TTL)
+
+# Em dia quando não há WAL recebido por aplicar; no primário (ou num banco comum) as funções devolvem NULL.
+_SQL_LAG = text(
+    "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+
+def _engines():
+    return current_app.extensions['sqlalchemy'].engines
+
+
+def replica_configurada():
+    return REPLICA in _engines()
+
+
+def lag_replica():
+    """Atraso da réplica em segundos (0 fora do PostgreSQL); None se não respondeu."""
+    def medir():
+        engine = _engines()[REPLICA]
+        if engine.dialect.name != 'postgresql':
+            return 0.0
+        try:
+            with engine.connect() as conexao:
+                return float(conexao.execute(_SQL_LAG).scalar() or 0)
+        except DBAPIError:
+            current_app.logger.warning('Réplica de leitura indisponível; usando o primário', exc_info=True)
+            return None
+    return _cache_lag.obter(REPLICA, medir)
+
+
+def replica_em_dia():
+    if not replica_configurada():
+        return False
+    lag = lag_replica()
+    return lag is not None and lag <= current_app.config.get('REPLICA_LAG_TOLERADO', 5)
+
+
+def _decidir_destino():
+    if request.method not in METODOS_LEITURA or not replica_configurada():
+        return None
+    regra = request.url_rule
+    somente_leitura = regra is not None and regra.methods <= METODOS_LEITURA
+    if not somente_leitura and request.blueprint not in current_app.config.get('REPLICA_BLUEPRINTS', ()):
+        return None
+    ultima_escrita = sessao_flask.get(_ULTIMA_ESCRITA)
+    if ultima_escrita and time.time() - ultima_escrita < current_app.config.get('REPLICA_LAG_TOLERADO', 5):
+        return None
+    return REPLICA if replica_em_dia() else None
+
+
+def destino_leitura():
+    """'replica' ou None (primário) para as leituras da requisição corrente, decidido uma vez por requisição."""
+    if not has_request_context():
+        return None
+    if '_destino_leitura' not in g:
+        g._destino_leitura = _decidir_destino()
+    return g._destino_leitura
+
+
+def _e_escrita(clause):
+    return isinstance(clause, UpdateBase) or getattr(clause, '_for_update_arg', None) is not None
+
+
+class SessaoRoteada(Session):
+    """Session do Flask-SQLAlchemy que manda as leituras elegíveis para a réplica."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if self._flushing or _e_escrita(clause):
+            self.info[_ESCREVEU] = True
+        elif bind is None and not self.info.get(_ESCREVEU):
+            destino = self.info[DESTINO_LEITURA] if DESTINO_LEITURA in self.info else destino_leitura()
+            if destino == REPLICA and REPLICA in self._db.engines:
+                return self._db.engines[REPLICA]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def iniciar_replica(app):
+    """Marca, na sessão do usuário, o horário de cada requisição de escrita."""
+    @app.after_request
+    def _marcar_escrita(response):
+        if request.method not in METODOS_LEITURA and replica_configurada():
+            sessao_flask[_ULTIMA_ESCRITA] = time.time()
+        return response
@@ -0,0 +1,62 @@
+# app/utils/sql_counter.py
+"""
+Contador de statements SQL emitidos por um trecho de código.
+
+    with contar_queries(db.engine) as contador:
+        calcular_vital_metrics()
+    contador.total  # -> 1
+
+'execucoes' guarda (statement, parâmetros) de cada execução, para poder
+repetir as queries com EXPLAIN (flask perf explicar). Com réplica configurada,
+passe todos os engines: contar_queries(*db.engines.values()).
+
+O perfilamento por requisição (app/utils/perfilamento.py) usa o mesmo
+ContadorQueries, alimentado com a duração de cada statement.
+"""
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+
+class ContadorQueries:
+    def __init__(self):
+        self.statements = []
+        self.execucoes = []
+        # (segundos, statement), quando cronometrado.
+        self.duracoes = []
+
+    @property
+    def total(self):
+        return len(self.statements)
+
+    def registrar(self, statement, parameters):
+        self.statements.append(statement)
+        self.execucoes.append((statement, parameters))
+
+    def registrar_duracao(self, statement, segundos):
+        self.duracoes.append((segundos, statement))
+
+    @property
+    def tempo_total(self):
+        return sum(segundos for segundos, _ in self.duracoes)
+
+    @property
+    def mais_lenta(self):
+        """(segundos, statement) da execução mais demorada, ou None."""
+        return max(self.duracoes, key=lambda duracao: duracao[0], default=None)
+
+
+@contextmanager
+def contar_queries(*engines):
+    contador = ContadorQueries()
+
+    def _registrar(conn, cursor, statement, parameters, context, executemany):
+        contador.registrar(statement, parameters)
+
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', _registrar)
+    try:
+        yield contador
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', _registrar)
@@ -0,0 +1,137 @@
+# app/utils/usuarios.py
+"""
+Carregamento do usuário logado (user_loader do Flask-Login) com cache.
+
+Cada requisição autenticada resolvia o usuário com um SELECT, e os templates
+ainda seguiam current_user.funcionario com outro. Aqui o loader devolve um
+UsuarioLogado: cópia imutável dos campos de identidade do usuário e do seu
+cadastro de funcionário, lidos juntos numa única query e guardados num
+CacheLRU (USUARIO_CACHE_TTL segundos). Com o cache quente, as APIs de alta
+frequência (KPIs, timeline, reações) autenticam sem ir ao banco.
+
+O Flask-Login já guarda o usuário resolvido em g durante a requisição, então o
+loader roda no máximo uma vez por requisição. Quem precisar da entidade do ORM
+(para alterar o usuário) usa db.session.get(User, current_user.id).
+
+Invalidação: commits que alteram User ou Employees pelo ORM (hooks da sessão)
+e os UPDATEs em lote que chamam marcar_funcionarios_alterados(). Ela só vale
+no processo que fez o commit: os outros workers do gunicorn servem o valor
+antigo até o TTL vencer, por isso ele é curto (5s por padrão), o bastante para
+as rajadas de APIs de uma mesma tela. A área administrativa não depende dessa
+janela: exigir_admin confere o tipo no banco (tipo_atual).
+"""
+from flask import current_app
+from flask_login import UserMixin
+from sqlalchemy import event, select
+
+from app.extensions import db
+from app.models import User, Employees
+from app.utils.cache import CacheLRU
+
+cache_usuarios = CacheLRU(maximo=4096, nome='usuarios')
+
+_USUARIOS_PENDENTES = 'usuarios_pendentes'
+_FUNCIONARIOS_PENDENTES = 'funcionarios_pendentes'
+# Marcador de "todos os funcionários" (ex.: recalcular_medias sem filtro).
+TODOS = None
+
+
+class _Imutavel:
+    __slots__ = ()
+
+    def __init__(self, **campos):
+        for nome in self.__slots__:
+            object.__setattr__(self, nome, campos.get(nome))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError(f'{type(self).__name__} é somente leitura.')
+
+
+class FuncionarioResumo(_Imutavel):
+    __slots__ = ('id', 'cargo', 'status', 'active', 'data_entrada', 'media_feedbacks')
+
+
+class UsuarioLogado(_Imutavel, UserMixin):
+    __slots__ = ('id', 'nome', 'email', 'tipo', 'profile_picture', 'active', 'funcionario')
+
+    def __repr__(self):
+        return f'<UsuarioLogado {self.email}>'
+
+
+def _ler_identidade(user_id):
+    linha = db.session.execute(
+        select(User.id, User.nome, User.email, User.tipo, User.profile_picture, User.active,
+               Employees.id.label('employee_id'), Employees.cargo, Employees.status,
+               Employees.active.label('employee_active'), Employees.data_entrada, Employees.media_feedbacks)
+        .outerjoin(Employees, Employees.user_id == User.id)
+        .where(User.id == user_id)
+    ).first()
+    if linha is None:
+        return None
+
+    funcionario = None
+    if linha.employee_id is not None:
+        funcionario = FuncionarioResumo(id=linha.employee_id, cargo=linha.cargo, status=linha.status,
+                                        active=linha.employee_active, data_entrada=linha.data_entrada,
+                                        media_feedbacks=linha.media_feedbacks)
+    return UsuarioLogado(id=linha.id, nome=linha.nome, email=linha.email, tipo=linha.tipo,
+                         profile_picture=linha.profile_picture, active=linha.active, funcionario=funcionario)
+
+
+def carregar_usuario(user_id):
+    """UsuarioLogado do id (ou None se não existir), do cache quando possível."""
+    ttl = current_app.config.get('USUARIO_CACHE_TTL', 5)
+    return cache_usuarios.obter(user_id, lambda: _ler_identidade(user_id), ttl=ttl)
+
+
+def tipo_atual(user_id):
+    """Tipo do usuário lido do banco, sem cache; None se ele não existe ou está inativo."""
+    linha = db.session.execute(select(User.tipo, User.active).where(User.id == user_id)).first()
+    if linha is None or linha.active is False:
+        return None
+    return linha.tipo
+
+
+def marcar_funcionarios_alterados(employee_ids=TODOS, session=None):
+    """
+    Para escritas que não passam pelo flush do ORM (UPDATE em lote): os usuários
+    desses funcionários saem do cache no commit. Sem ids, todos saem.
+    """
+    info = (session or db.session()).info
+    if employee_ids is TODOS:
+        info[_FUNCIONARIOS_PENDENTES] = TODOS
+    elif info.get(_FUNCIONARIOS_PENDENTES, set()) is not TODOS:
+        info.setdefault(_FUNCIONARIOS_PENDENTES, set()).update(employee_ids)
+
+
+# --- Invalidação ----------------------------------------------------------------
+
+@event.listens_for(db.session, 'after_flush')
+def _anotar_usuarios_alterados(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault(_USUARIOS_PENDENTES, set()).add(obj.id)
+        elif isinstance(obj, Employees):
+            session.info.setdefault(_USUARIOS_PENDENTES, set()).add(obj.user_id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidar_apos_commit(session):
+    usuarios = session.info.pop(_USUARIOS_PENDENTES, None)
+    if usuarios:
+        cache_usuarios.invalidar(*usuarios)
+
+    if _FUNCIONARIOS_PENDENTES in session.info:
+        funcionarios = session.info.pop(_FUNCIONARIOS_PENDENTES)
+        if funcionarios is TODOS:
+            cache_usuarios.invalidar()
+        elif funcionarios:
+            cache_usuarios.invalidar_se(
+                lambda usuario: usuario is not None and usuario.funcionario is not None
+                and usuario.funcionario.id in funcionarios)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _descartar_pendentes(session):
+    session.info.pop(_USUARIOS_PENDENTES, None)
+    session.info.pop(_FUNCIONARIOS_PENDENTES, None)
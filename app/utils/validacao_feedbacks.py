@@ -0,0 +1,58 @@
+# app/utils/validacao_feedbacks.py
+"""
+Regras de validação de um feedback, compartilhadas pelos formulários de
+dar/editar feedback e pela importação em lote (app/utils/importacao_feedbacks.py).
+"""
+
+
+class FeedbackInvalido(ValueError):
+    pass
+
+
+def validar_pontuacao(valor):
+    """Pontuação geral como float entre 0 e 5."""
+    try:
+        pontuacao = float(valor)
+        if not (0 <= pontuacao <= 5):
+            raise ValueError
+    except (ValueError, TypeError):
+        raise FeedbackInvalido('A pontuação geral deve ser um número entre 0 e 5.')
+    return pontuacao
+
+
+def _validar_niveis(pares, rotulo):
+    niveis = {}
+    for nome, nivel in pares:
+        nome = (nome or '').strip()
+        nivel_str = str(nivel).strip() if nivel is not None else ''
+        # Como no formulário, linhas sem nome ou sem nível são ignoradas.
+        if not nome or not nivel_str:
+            continue
+        try:
+            nivel = float(nivel_str)
+        except (ValueError, TypeError):
+            raise FeedbackInvalido(f"Nível inválido para {rotulo} '{nome}'. Deve ser um número.")
+        if not (0 <= nivel <= 5):
+            raise FeedbackInvalido(f"Nível inválido para {rotulo} '{nome}'. Deve ser entre 0 e 5.")
+        niveis[nome] = nivel
+    return niveis
+
+
+def validar_kpis(qualidades, defeitos):
+    """
+    Monta o JSON de KPIs a partir de pares (nome, nível) de qualidades e defeitos.
+    Devolve None quando nenhum KPI foi informado.
+    """
+    kpis = {
+        'qualidades': _validar_niveis(qualidades, 'a qualidade'),
+        'defeitos': _validar_niveis(defeitos, 'o defeito'),
+    }
+    if not kpis['qualidades'] and not kpis['defeitos']:
+        return None
+    return kpis
+
+
+def kpis_do_formulario(form):
+    """KPIs dos campos dinâmicos kpi_qualidade_*/kpi_defeito_* do formulário de feedback."""
+    return validar_kpis(zip(form.getlist('kpi_qualidade_nome[]'), form.getlist('kpi_qualidade_nivel[]')),
+                        zip(form.getlist('kpi_defeito_nome[]'), form.getlist('kpi_defeito_nivel[]')))
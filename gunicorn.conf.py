@@ -0,0 +1,38 @@
+# gunicorn.conf.py
+"""
+Configuração lida pelo gunicorn na raiz do projeto. Workers e threads vêm de
+WEB_CONCURRENCY / WEB_THREADS, os mesmos valores que dimensionam o pool do banco.
+
+Workers gthread: o stream SSE da timeline (/jornada/api/stream) ocupa uma
+thread por cliente enquanto a aba fica aberta. Com o worker sync ele prenderia
+o processo inteiro até o arbiter matá-lo no timeout; com threads, o worker
+segue atendendo e mandando heartbeat. SSE_MAX_CLIENTES (metade das threads,
+por padrão) limita quantas threads os streams podem ocupar.
+
+O /metrics soma os números de todos os workers pelos arquivos de METRICAS_DIR.
+Sem a variável, o arbiter define um diretório temporário só dele antes de
+criar os workers (que herdam o ambiente) e o apaga ao sair.
+"""
+import os
+import shutil
+import tempfile
+
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', 1))
+threads = int(os.environ.get('WEB_THREADS', 8))
+
+METRICAS_DIR_PADRAO = os.path.join(tempfile.gettempdir(), f'tower_metricas_{os.getpid()}')
+os.environ.setdefault('METRICAS_DIR', METRICAS_DIR_PADRAO)
+
+
+def on_starting(server):
+    # Importado aqui: app.config lê METRICAS_DIR ao ser importado, e o padrão acima precisa vir antes.
+    from app.utils.metricas import limpar_diretorio
+
+    # Métricas de uma execução anterior não se somam às desta (METRICAS_DIR).
+    limpar_diretorio()
+
+
+def on_exit(server):
+    if os.environ.get('METRICAS_DIR') == METRICAS_DIR_PADRAO:
+        shutil.rmtree(METRICAS_DIR_PADRAO, ignore_errors=True)
@@ -0,0 +1,11 @@
+-- Armazém de snapshots dos KPIs do hub de analytics (/kpis/api/*).
+CREATE TABLE IF NOT EXISTS kpi_snapshots (
+    id SERIAL PRIMARY KEY,
+    kpi VARCHAR(80) NOT NULL,
+    periodo VARCHAR(120) NOT NULL DEFAULT 'padrao',
+    dados JSONB NOT NULL,
+    gerado_em TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_kpi_snapshots_kpi_periodo_gerado_em
+    ON kpi_snapshots (kpi, periodo, gerado_em);
@@ -0,0 +1,2 @@
+-- Marca de invalidação dos snapshots de KPI (preenchida pelo hook after_flush).
+ALTER TABLE kpi_snapshots ADD COLUMN IF NOT EXISTS invalidado_em TIMESTAMP;
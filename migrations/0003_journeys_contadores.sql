@@ -0,0 +1,22 @@
+-- Contadores desnormalizados de reações/comentários em 'journeys' e unicidade das reações.
+ALTER TABLE journeys ADD COLUMN IF NOT EXISTS reacoes_aplauso INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE journeys ADD COLUMN IF NOT EXISTS reacoes_foguete INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE journeys ADD COLUMN IF NOT EXISTS reacoes_trofeu INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE journeys ADD COLUMN IF NOT EXISTS comentarios_total INTEGER NOT NULL DEFAULT 0;
+
+-- Remove reações duplicadas criadas por cliques concorrentes antes de criar o índice único.
+DELETE FROM journey_reactions r
+USING journey_reactions d
+WHERE r.user_id = d.user_id
+  AND r.jornada_id = d.jornada_id
+  AND r.tipo_reacao = d.tipo_reacao
+  AND r.id > d.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_journey_reactions_user_jornada_tipo
+    ON journey_reactions (user_id, jornada_id, tipo_reacao);
+
+UPDATE journeys j SET
+    reacoes_aplauso = (SELECT count(*) FROM journey_reactions r WHERE r.jornada_id = j.id AND r.tipo_reacao = 'aplauso'),
+    reacoes_foguete = (SELECT count(*) FROM journey_reactions r WHERE r.jornada_id = j.id AND r.tipo_reacao = 'foguete'),
+    reacoes_trofeu = (SELECT count(*) FROM journey_reactions r WHERE r.jornada_id = j.id AND r.tipo_reacao = 'trofeu'),
+    comentarios_total = (SELECT count(*) FROM journey_comments c WHERE c.jornada_id = j.id);
@@ -0,0 +1,18 @@
+-- Índices trigram para a busca de funcionários (/funcionarios/api/search).
+-- Se o servidor não tiver a extensão pg_trgm (ou o usuário não puder criá-la), a
+-- migração segue sem os índices e a busca cai para ILIKE sem índice.
+DO $$
+BEGIN
+    CREATE EXTENSION IF NOT EXISTS pg_trgm;
+EXCEPTION WHEN OTHERS THEN
+    RAISE NOTICE 'pg_trgm indisponível (%); busca de funcionários sem índice trigram.', SQLERRM;
+END $$;
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm') THEN
+        CREATE INDEX IF NOT EXISTS ix_users_nome_trgm ON users USING gin (nome gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING gin (email gin_trgm_ops);
+        CREATE INDEX IF NOT EXISTS ix_employees_cargo_trgm ON employees USING gin (cargo gin_trgm_ops);
+    END IF;
+END $$;
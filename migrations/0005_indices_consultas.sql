@@ -0,0 +1,40 @@
+-- Índices para os predicados mais usados pelas telas, APIs e KPIs
+-- (conferidos com 'flask perf explicar' sobre a massa de 'flask perf semear').
+
+-- Listagens ordenadas por nome (LIMIT/OFFSET) e filtros de funcionário.
+CREATE INDEX IF NOT EXISTS ix_users_nome ON users (nome);
+CREATE INDEX IF NOT EXISTS ix_employees_status ON employees (status);
+CREATE INDEX IF NOT EXISTS ix_employees_cargo ON employees (cargo);
+CREATE INDEX IF NOT EXISTS ix_employees_ativos_media_feedbacks
+    ON employees (media_feedbacks DESC NULLS LAST, id) WHERE active;
+CREATE INDEX IF NOT EXISTS ix_employees_ativos_data_entrada
+    ON employees (data_entrada) WHERE active;
+-- Reconciliação de vínculos de desligados (app/utils/equipes.py).
+CREATE INDEX IF NOT EXISTS ix_employees_inativos_user_id
+    ON employees (user_id) WHERE NOT active;
+
+-- Vínculos de time: membros ativos por time, vínculos por usuário, saídas (headcount-flow).
+CREATE INDEX IF NOT EXISTS ix_team_members_user_id_status ON team_members (user_id, status);
+CREATE INDEX IF NOT EXISTS ix_team_members_ativos_team_id
+    ON team_members (team_id) WHERE status = 'ativo';
+CREATE INDEX IF NOT EXISTS ix_team_members_data_entrada ON team_members (data_entrada);
+CREATE INDEX IF NOT EXISTS ix_team_members_data_saida
+    ON team_members (data_saida) WHERE data_saida IS NOT NULL;
+
+-- Históricos por funcionário e por data.
+CREATE INDEX IF NOT EXISTS ix_promotions_logs_employee_id ON promotions_logs (employee_id);
+CREATE INDEX IF NOT EXISTS ix_promotions_logs_data_promocao ON promotions_logs (data_promocao);
+CREATE INDEX IF NOT EXISTS ix_feedbacks_employee_id_data_feedback
+    ON feedbacks (employee_id, data_feedback DESC);
+CREATE INDEX IF NOT EXISTS ix_salary_adjustments_logs_employee_id_data_ajuste
+    ON salary_adjustments_logs (employee_id, data_ajuste);
+CREATE INDEX IF NOT EXISTS ix_milestones_data_marco ON milestones (data_marco DESC);
+
+-- Timeline: keyset (data_jornada DESC, id DESC), filtros, reações e comentários por jornada.
+CREATE INDEX IF NOT EXISTS ix_journeys_data_jornada_id ON journeys (data_jornada DESC, id DESC);
+CREATE INDEX IF NOT EXISTS ix_journeys_employee_id ON journeys (employee_id);
+CREATE INDEX IF NOT EXISTS ix_journeys_team_id ON journeys (team_id);
+CREATE INDEX IF NOT EXISTS ix_journey_reactions_jornada_id_user_id
+    ON journey_reactions (jornada_id, user_id);
+CREATE INDEX IF NOT EXISTS ix_journey_comments_jornada_id_data_id
+    ON journey_comments (jornada_id, data_comentario, id);
@@ -0,0 +1,10 @@
+-- Soma e quantidade das pontuações de feedback em 'employees', para a média incremental.
+ALTER TABLE employees ADD COLUMN IF NOT EXISTS feedbacks_soma NUMERIC(12, 2) NOT NULL DEFAULT 0;
+ALTER TABLE employees ADD COLUMN IF NOT EXISTS feedbacks_total INTEGER NOT NULL DEFAULT 0;
+
+UPDATE employees e SET
+    feedbacks_soma = coalesce((SELECT sum(f.pontuacao_geral) FROM feedbacks f WHERE f.employee_id = e.id), 0),
+    feedbacks_total = (SELECT count(f.pontuacao_geral) FROM feedbacks f WHERE f.employee_id = e.id);
+
+UPDATE employees SET
+    media_feedbacks = CASE WHEN feedbacks_total > 0 THEN round(feedbacks_soma / feedbacks_total, 2) ELSE 0 END;
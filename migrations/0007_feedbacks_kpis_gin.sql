@@ -0,0 +1,4 @@
+-- Índices do KPI de qualidades/defeitos (/kpis/api/feedback-kpis): GIN jsonb_ops em
+-- feedbacks.kpis para o operador ?| e B-tree na data para a janela de tempo.
+CREATE INDEX IF NOT EXISTS ix_feedbacks_kpis ON feedbacks USING gin (kpis);
+CREATE INDEX IF NOT EXISTS ix_feedbacks_data_feedback ON feedbacks (data_feedback);
@@ -0,0 +1,17 @@
+-- Uma linha vigente por (kpi, periodo), sobrescrita a cada recálculo; o histórico
+-- fica só com as cópias gravadas pelo job 'flask kpi atualizar'.
+ALTER TABLE kpi_snapshots ADD COLUMN IF NOT EXISTS historico BOOLEAN NOT NULL DEFAULT false;
+
+-- Snapshots de parâmetros avulsos (?months=, ?team_id=...) deixam de ser gravados.
+DELETE FROM kpi_snapshots WHERE periodo <> 'padrao';
+
+-- O mais recente de cada KPI continua vigente; os anteriores viram histórico.
+UPDATE kpi_snapshots s SET historico = true
+WHERE EXISTS (
+    SELECT 1 FROM kpi_snapshots r
+    WHERE r.kpi = s.kpi AND r.periodo = s.periodo
+      AND (r.gerado_em, r.id) > (s.gerado_em, s.id)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_kpi_snapshots_vigente
+    ON kpi_snapshots (kpi, periodo) WHERE NOT historico;
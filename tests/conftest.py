@@ -0,0 +1,37 @@
+# tests/conftest.py
+"""
+Os testes de orçamento de queries rodam contra o PostgreSQL de DATABASE_URL
+(use um banco só para testes). As tabelas são criadas e, se o banco estiver
+vazio, populadas com a massa sintética de 'flask perf semear'. Sem
+DATABASE_URL os testes que dependem do banco são pulados.
+
+    DATABASE_URL=postgresql://.../tower_testes python -m pytest
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DB_PERFIL', 'test')
+
+FUNCIONARIOS_SINTETICOS = 300
+TIMES_SINTETICOS = 10
+
+
+@pytest.fixture(scope='session')
+def aplicacao():
+    if not os.environ.get('DATABASE_URL'):
+        pytest.skip('DATABASE_URL não configurada')
+
+    from app import create_app
+    from app.extensions import db
+    from app.models import User
+    from app.utils.dados_sinteticos import semear
+
+    app = create_app()
+    with app.app_context():
+        db.create_all(bind_key=None)
+        if db.session.query(User.id).first() is None:
+            semear(funcionarios=FUNCIONARIOS_SINTETICOS, times=TIMES_SINTETICOS)
+    return app
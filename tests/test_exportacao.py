@@ -0,0 +1,40 @@
+# tests/test_exportacao.py
+"""Escritores de CSV/XLSX com textos vindos dos usuários (não usa o banco)."""
+import csv
+import io
+import zipfile
+from decimal import Decimal
+from xml.etree import ElementTree
+
+import pytest
+
+from app.utils.exportacao import gerar_csv, gerar_xlsx
+
+NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def _ler_csv(linhas):
+    texto = b''.join(gerar_csv(iter(linhas))).decode('utf-8-sig')
+    return list(csv.reader(io.StringIO(texto)))
+
+
+@pytest.mark.parametrize('valor', ['=HYPERLINK("http://x","clique")', '+1+1', '-2+3', '@SUM(A1)',
+                                   '\t=1+1', '\r=1+1'])
+def test_csv_neutraliza_formulas(valor):
+    _, linha = _ler_csv([['Motivo'], [valor]])
+    assert linha == ["'" + valor]
+
+
+def test_csv_mantem_numeros_e_textos_comuns():
+    _, linha = _ler_csv([['Nome', 'Salário', 'Ajuste'], ['Ana - RH', Decimal('-150.00'), -3]])
+    assert linha == ['Ana - RH', '-150.00', '-3']
+
+
+def test_xlsx_remove_caracteres_de_controle():
+    linhas = [['Nome', 'Descrição'], ['Ana\x00\x01', 'linha 1\nlinha 2\tfim\x1f\x0b']]
+    conteudo = b''.join(gerar_xlsx(iter(linhas)))
+
+    with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+        planilha = ElementTree.fromstring(arquivo.read('xl/worksheets/sheet1.xml'))
+    textos = [t.text for t in planilha.iterfind('.//s:t', NS)]
+    assert textos == ['Nome', 'Descrição', 'Ana', 'linha 1\nlinha 2\tfim']
@@ -0,0 +1,50 @@
+# tests/test_jornadas_comentarios.py
+"""Comentários da timeline: o evento do stream não pode derrubar a escrita."""
+import pytest
+
+TEXTO_LONGO = 'comentário longo ' * 600  # ~10 KB, acima do limite do NOTIFY
+
+
+@pytest.fixture(scope='module')
+def cliente(aplicacao):
+    from app.extensions import db
+    from app.models import User
+
+    with aplicacao.app_context():
+        usuario_id = db.session.query(User.id).filter_by(tipo='Admin').order_by(User.id).limit(1).scalar()
+    cliente = aplicacao.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['_user_id'] = str(usuario_id)
+        sessao['_fresh'] = True
+    return cliente
+
+
+@pytest.fixture(scope='module')
+def jornada_id(aplicacao):
+    from app.extensions import db
+    from app.models import Jornada
+
+    with aplicacao.app_context():
+        return db.session.query(Jornada.id).order_by(Jornada.id).limit(1).scalar()
+
+
+def test_comentario_acima_de_8kb(aplicacao, cliente, jornada_id):
+    assert len(TEXTO_LONGO.encode('utf-8')) > 8000
+
+    resposta = cliente.post('/jornada/api/comentar', json={'jornada_id': jornada_id, 'comentario': TEXTO_LONGO})
+
+    assert resposta.status_code == 200, resposta.get_data(as_text=True)
+    comentario = resposta.get_json()['comentario']
+    salvo = cliente.get(f"/jornada/api/comentario/{comentario['id']}")
+    assert salvo.status_code == 200
+    assert salvo.get_json()['texto'] == TEXTO_LONGO
+
+
+def test_evento_grande_e_descartado_sem_abortar_a_transacao(aplicacao):
+    from app.extensions import db
+    from app.utils.eventos import barramento
+
+    with aplicacao.app_context():
+        barramento.publicar('comentario', {'texto': TEXTO_LONGO})
+        db.session.commit()
+        assert db.session.execute(db.text('SELECT 1')).scalar() == 1
@@ -0,0 +1,17 @@
+# tests/test_kpi_queries.py
+"""Orçamento de queries dos cálculos de KPI (KPI_ORCAMENTO_QUERIES)."""
+import pytest
+
+from app.routes.kpi import KPI_ORCAMENTO_QUERIES, medir_queries_kpi
+from app.utils.kpi_snapshots import KPI_CALCULOS
+
+
+def test_todo_kpi_tem_orcamento():
+    assert set(KPI_CALCULOS) == set(KPI_ORCAMENTO_QUERIES)
+
+
+@pytest.mark.parametrize('nome', list(KPI_ORCAMENTO_QUERIES))
+def test_kpi_dentro_do_orcamento(aplicacao, nome):
+    with aplicacao.app_context():
+        total = medir_queries_kpi(nome)
+    assert total <= KPI_ORCAMENTO_QUERIES[nome], f'{nome} emitiu {total} queries'
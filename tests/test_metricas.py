@@ -0,0 +1,80 @@
+# tests/test_metricas.py
+"""Scrape de /metrics validado como o Prometheus faria (não usa o banco)."""
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.utils.metricas import ARQUIVO_ENCERRADOS, registro, validar_exposicao
+
+
+@pytest.fixture(scope='module')
+def app_metricas():
+    from app import create_app
+
+    app = create_app()
+    app.config['TESTING'] = True
+    return app
+
+
+def _pid_encerrado():
+    processo = subprocess.Popen([sys.executable, '-c', 'pass'])
+    processo.wait()
+    return processo.pid
+
+
+def _estado_worker(pid, requisicoes, em_uso):
+    return {
+        'pid': pid,
+        'contadores': [['tower_http_requisicoes_total', {'endpoint': 'kpi.api_batch', 'metodo': 'GET', 'status': '200'},
+                        requisicoes]],
+        'gauges': [['tower_db_pool_em_uso', {'engine': 'default'}, em_uso]],
+        'histogramas': [['tower_http_duracao_segundos', {'endpoint': 'kpi.api_batch'},
+                         [requisicoes] + [0] * 10, requisicoes * 0.004, requisicoes]],
+    }
+
+
+def _scrape(app):
+    resposta = app.test_client().get('/metrics')
+    assert resposta.status_code == 200
+    assert resposta.content_type.startswith('text/plain')
+    texto = resposta.get_data(as_text=True)
+    erros, familias, _ = validar_exposicao(texto)
+    assert erros == []
+    assert familias > 0
+    return texto
+
+
+def _amostra(texto, prefixo):
+    linhas = [linha for linha in texto.splitlines() if linha.startswith(prefixo)]
+    assert len(linhas) == 1, linhas
+    return float(linhas[0].rsplit(' ', 1)[1])
+
+
+def test_scrape_valido(app_metricas, monkeypatch):
+    monkeypatch.setattr(registro, 'diretorio', None)
+    app_metricas.test_client().get('/rota-que-nao-existe')
+    texto = _scrape(app_metricas)
+    assert 'tower_http_requisicoes_total{endpoint="(sem rota)",metodo="GET",status="404"}' in texto
+
+
+def test_soma_os_arquivos_dos_workers(app_metricas, monkeypatch, tmp_path):
+    monkeypatch.setattr(registro, 'diretorio', str(tmp_path))
+    vivo, encerrado = os.getppid(), _pid_encerrado()
+    for pid, requisicoes, em_uso in ((vivo, 3, 2), (encerrado, 5, 7)):
+        (tmp_path / f'metricas_{pid}.json').write_text(json.dumps(_estado_worker(pid, requisicoes, em_uso)))
+
+    texto = _scrape(app_metricas)
+
+    lote = 'tower_http_requisicoes_total{endpoint="kpi.api_batch",metodo="GET",status="200"}'
+    assert _amostra(texto, lote) == 8
+    assert _amostra(texto, 'tower_http_duracao_segundos_count{endpoint="kpi.api_batch"}') == 8
+    # Gauge só do worker vivo (mais o deste processo, que também grava seu arquivo).
+    assert _amostra(texto, 'tower_db_pool_em_uso{engine="default"}') == 2
+
+    # O worker encerrado foi compactado e o próximo scrape soma o mesmo total.
+    assert not (tmp_path / f'metricas_{encerrado}.json').exists()
+    assert (tmp_path / ARQUIVO_ENCERRADOS).exists()
+    assert _amostra(_scrape(app_metricas), lote) == 8
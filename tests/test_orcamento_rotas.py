@@ -0,0 +1,24 @@
+# tests/test_orcamento_rotas.py
+"""Orçamento de queries das telas (ORCAMENTO_ROTAS), na massa sintética do conftest."""
+import pytest
+
+from app.utils.orcamento_rotas import ORCAMENTO_ROTAS, medir_rota
+
+
+@pytest.fixture(scope='module')
+def usuario_id(aplicacao):
+    from app.extensions import db
+    from app.models import User
+
+    with aplicacao.app_context():
+        return db.session.query(User.id).filter_by(tipo='Admin').order_by(User.id).limit(1).scalar()
+
+
+@pytest.mark.parametrize('endpoint, parametros, limite', ORCAMENTO_ROTAS, ids=[rota[0] for rota in ORCAMENTO_ROTAS])
+def test_rota_dentro_do_orcamento(aplicacao, usuario_id, endpoint, parametros, limite):
+    with aplicacao.app_context():
+        url, status, total = medir_rota(aplicacao, usuario_id, endpoint, parametros)
+    if url is None:
+        pytest.skip(f'sem dados para montar a URL de {endpoint}')
+    assert status == 200, f'{url} respondeu {status}'
+    assert total <= limite, f'{url} emitiu {total} queries (limite {limite})'